@@ -1,21 +1,82 @@
-from flask import Flask, render_template, jsonify, send_from_directory, send_file, make_response, request
+from flask import Flask, Request, render_template, jsonify, send_from_directory, send_file, request, g, Response
 from pathlib import Path
 import json
 import os
-import subprocess
-import sys
+import threading
 import time
 from werkzeug.utils import secure_filename
+import thumbnails
+import http_cache
+import file_hashes
+import manifests
+import search_index
+import metrics
+import preprocess
+import scheduler
+from result_store import get_store
+from job_manager import JobManager
+from work_queue import get_queue
+
+class UploadRequest(Request):
+    """Hochgeladene Dateien von /api/upload beim Empfang direkt in DATA_DIR schreiben und dabei hashen"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if self.endpoint != "upload_file":
+            # Andere Endpunkte mit Multipart-Body wie von Werkzeug vorgesehen
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+        return file_hashes.UploadStream(DATA_DIR)
+
 
 app = Flask(__name__)
+app.request_class = UploadRequest
 # Erhöhe Timeout für große Dateien
 app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 0
 app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500 MB max
 
 # Datenverzeichnis - verwende lokales data-Verzeichnis
-DATA_DIR = Path(__file__).parent / "data"
+DATA_DIR = Path(os.environ.get("FLATSCOUTS_DATA_DIR", Path(__file__).parent / "data"))
 # Lokales Datenverzeichnis für JSON-Dateien (gleich wie DATA_DIR)
-LOCAL_DATA_DIR = Path(__file__).parent / "data"
+LOCAL_DATA_DIR = DATA_DIR
+
+# Jobverwaltung: Split- und Parse-Läufe laufen nacheinander in einem persistenten Worker-Prozess
+job_manager = JobManager(
+    base_dir=Path(__file__).parent,
+    log_dir=Path(__file__).parent / "logs",
+    scripts={
+        "split": Path(__file__).parent / "split_document.py",
+        "parse": Path(__file__).parent / "parse_segments.py",
+    }
+)
+
+# Blockgröße für Dateiantworten über wsgi.file_wrapper (wenn der Server nicht sendfile nutzt)
+FILE_WRAPPER_BLOCK_SIZE = 256 * 1024
+
+# Serialisiert Duplikatprüfung und Namenswahl gleichzeitiger Uploads
+upload_lock = threading.Lock()
+
+@app.before_request
+def start_request_timer():
+    """Startzeit jeder Anfrage für die Zeitmessung pro Endpunkt"""
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    """Erfasst die Dauer jeder Anfrage pro Endpunkt (Routen-Muster statt konkreter URL)"""
+    started = g.get('request_started')
+    if started is not None and request.url_rule is not None:
+        metrics.observe(
+            "http_request",
+            time.perf_counter() - started,
+            endpoint=request.url_rule.rule,
+            method=request.method,
+            status=response.status_code
+        )
+    return response
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus-Endpunkt: Histogramme aller Verarbeitungsschritte (inkl. Split-/Parse-Jobs)"""
+    return Response(metrics.render_prometheus(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/')
 def index():
@@ -62,100 +123,71 @@ def check_pdf_exists(filename):
     
     return False
 
-@app.route('/api/documents')
-def get_documents():
-    """API-Endpunkt: Lädt nur Dokumente die von parse_segments.py verarbeitet wurden"""
-    # Verhindere Caching
-    response = make_response(jsonify([]))
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    
+def document_manifest(store, manifest, filename, segments):
+    """
+    Manifest eines Dokuments für /api/documents (Seitenzahl, Seitengrößen, Segment -> Seiten).
+    Fehlt es oder ist es veraltet (z.B. Dokumente von vor der Einführung), wird es nachberechnet.
+    """
+    pdf_path = DATA_DIR / filename
+    try:
+        if not pdf_path.exists():
+            return None
+        if not manifests.is_current(manifest, pdf_path):
+            manifest = manifests.refresh(store, pdf_path, segments)
+        return {**manifest, "segments": manifests.segment_map(segments)}
+    except Exception as e:
+        print(f"Manifest für {filename} nicht verfügbar: {e}")
+        return None
+
+def build_documents():
+    """Stellt die Dokumentenliste für /api/documents aus dem Ergebnis-Speicher zusammen"""
     daten = []
+    store = get_store()
+    stored_manifests = store.all_manifests()
     
-    # Versuche zuerst split_results.json zu laden (von split_document.py erstellt)
-    split_results_path = DATA_DIR / "split_results.json"
-    if not split_results_path.exists():
-        split_results_path = LOCAL_DATA_DIR / "split_results.json"
-    
-    if split_results_path.exists():
+    # Zuerst Split-Ergebnisse (von split_document.py), sonst geparste Segmente (von parse_segments.py).
+    # Text und Markdown werden für die Liste nicht benötigt und daher nicht geladen.
+    sources = [
+        ("Split-Results", "split_results", store.all_split),
+        ("Parsed-Segments", "parsed_segments", lambda: store.all_parsed(include_content=False)),
+    ]
+    for quelle, label, load in sources:
         try:
-            with open(split_results_path, "r", encoding="utf-8") as f:
-                split_results = json.load(f)
-                
-                # split_results ist ein Dictionary (Dateiname -> Liste von Segmenten)
-                if isinstance(split_results, dict):
-                    for dateiname, segments in split_results.items():
-                        exists = check_pdf_exists(dateiname)
-                        print(f"Prüfe PDF (split_results): {dateiname} -> Existiert: {exists}")
-                        
-                        if not exists:
-                            normalized_search = normalize_filename(dateiname)
-                            existing_pdfs = list(DATA_DIR.glob("*.pdf")) + list(DATA_DIR.glob("*.PDF"))
-                            for existing_pdf in existing_pdfs:
-                                normalized_existing = normalize_filename(existing_pdf.name)
-                                if normalized_existing == normalized_search:
-                                    print(f"Gefunden via Normalisierung: {existing_pdf.name} -> {dateiname}")
-                                    exists = True
-                                    break
-                        
-                        if exists:
-                            daten.append({
-                                "quelle": "Split-Results",
-                                "datei": dateiname,
-                                "daten": {"segments": segments}
-                            })
-                        else:
-                            print(f"PDF nicht gefunden, überspringe: {dateiname} (Pfad: {DATA_DIR / dateiname})")
+            results = load()
         except Exception as e:
-            print(f"Fehler beim Laden von split_results.json: {e}")
+            print(f"Fehler beim Laden von {label}: {e}")
+            continue
+        
+        for dateiname, segments in results.items():
+            exists = check_pdf_exists(dateiname)
+            print(f"Prüfe PDF ({label}): {dateiname} -> Existiert: {exists}")
+            
+            if exists:
+                daten.append({
+                    "quelle": quelle,
+                    "datei": dateiname,
+                    "daten": {"segments": segments},
+                    # Struktur für das Layout im Viewer, bevor das PDF geladen ist
+                    "manifest": document_manifest(store, stored_manifests.get(dateiname), dateiname, segments)
+                })
+            else:
+                print(f"PDF nicht gefunden, überspringe: {dateiname} (Pfad: {DATA_DIR / dateiname})")
+        
+        if daten:
+            break
     
-    # Falls keine Daten aus split_results.json, versuche parsed_segments.json (von parse_segments.py)
     if not daten:
-        parsed_segments_path = DATA_DIR / "parsed_segments.json"
-        if not parsed_segments_path.exists():
-            parsed_segments_path = LOCAL_DATA_DIR / "parsed_segments.json"
-        
-        if parsed_segments_path.exists():
-            try:
-                with open(parsed_segments_path, "r", encoding="utf-8") as f:
-                    parsed_segments = json.load(f)
-                    
-                    # parsed_segments ist ein Dictionary (Dateiname -> Segmente)
-                    if isinstance(parsed_segments, dict):
-                        for dateiname, segments in parsed_segments.items():
-                            exists = check_pdf_exists(dateiname)
-                            print(f"Prüfe PDF (parsed_segments): {dateiname} -> Existiert: {exists}")
-                            
-                            if not exists:
-                                normalized_search = normalize_filename(dateiname)
-                                existing_pdfs = list(DATA_DIR.glob("*.pdf")) + list(DATA_DIR.glob("*.PDF"))
-                                for existing_pdf in existing_pdfs:
-                                    normalized_existing = normalize_filename(existing_pdf.name)
-                                    if normalized_existing == normalized_search:
-                                        print(f"Gefunden via Normalisierung: {existing_pdf.name} -> {dateiname}")
-                                        exists = True
-                                        break
-                            
-                            if exists:
-                                daten.append({
-                                    "quelle": "Parsed-Segments",
-                                    "datei": dateiname,
-                                    "daten": {"segments": segments}
-                                })
-                            else:
-                                print(f"PDF nicht gefunden, überspringe: {dateiname} (Pfad: {DATA_DIR / dateiname})")
-            except Exception as e:
-                print(f"Fehler beim Laden von parsed_segments.json: {e}")
-        else:
-            print("Weder split_results.json noch parsed_segments.json gefunden - keine verarbeiteten Dokumente")
+        print("Keine Split- oder Parse-Ergebnisse gefunden - keine verarbeiteten Dokumente")
     
-    # Erstelle Response mit Cache-Control Headern
-    response = make_response(jsonify(daten))
-    response.headers['Cache-Control'] = 'no-cache, no-store, must-revalidate'
-    response.headers['Pragma'] = 'no-cache'
-    response.headers['Expires'] = '0'
-    return response
+    return daten
+
+@app.route('/api/documents')
+def get_documents():
+    """API-Endpunkt: Lädt nur Dokumente die von parse_segments.py verarbeitet wurden"""
+    # Die Antwort hängt vom Ergebnis-Speicher und den vorhandenen PDFs ab (Name, Größe, mtime)
+    signature = (get_store().revision(), http_cache.listing_signature(DATA_DIR))
+    # ETag + If-None-Match statt no-store: unveränderte Daten werden mit 304 beantwortet
+    return http_cache.cached_json_response("documents", signature, build_documents)
 
 @app.route('/api/json/<json_type>')
 def get_json_data(json_type):
@@ -163,9 +195,24 @@ def get_json_data(json_type):
     json_files = {
         'kategorisierte_dokumente': 'kategorisierte_dokumente.json',
         'dokumente_nach_quelle': 'dokumente_nach_quelle.json',
-        'split_results': 'split_results.json',
-        'parsed_segments': 'parsed_segments.json'
+        'extracted_fields': 'extracted_fields.json'
+    }
+    
+    # Split- und Parse-Ergebnisse kommen aus dem Ergebnis-Speicher (gleiches Format wie die alten JSON-Dateien)
+    store_loaders = {
+        'split_results': lambda store: store.all_split(),
+        'parsed_segments': lambda store: store.all_parsed()
     }
+    if json_type in store_loaders:
+        store = get_store()
+        try:
+            return http_cache.cached_json_response(
+                f"json:{json_type}",
+                store.revision(),
+                lambda: store_loaders[json_type](store)
+            )
+        except Exception as e:
+            return jsonify({"error": f"Fehler beim Laden der Ergebnisse: {str(e)}"}), 500
     
     if json_type not in json_files:
         return jsonify({"error": "Ungültiger JSON-Typ"}), 400
@@ -178,10 +225,16 @@ def get_json_data(json_type):
     if not json_path.exists():
         return jsonify({"error": f"JSON-Datei nicht gefunden: {json_files[json_type]}"}), 404
     
-    try:
+    def load_json():
         with open(json_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return jsonify(data)
+            return json.load(f)
+    
+    try:
+        return http_cache.cached_json_response(
+            f"json:{json_type}",
+            http_cache.file_signature(json_path),
+            load_json
+        )
     except Exception as e:
         return jsonify({"error": f"Fehler beim Laden der JSON-Datei: {str(e)}"}), 500
 
@@ -244,8 +297,17 @@ def delete_file(filename):
         if not filename.lower().endswith('.pdf'):
             return jsonify({"error": "Nur PDF-Dateien können gelöscht werden"}), 400
         
-        # Lösche die Datei
+        # Lösche die Datei und ihre gecachten Vorschaubilder
         file_path.unlink()
+        thumbnails.remove_document(file_path)
+        preprocess.remove_document(file_path)
+        file_hashes.forget(filename)
+        # Ergebnisse und Suchtreffer des gelöschten Dokuments entfernen
+        get_store().delete_document(filename)
+        search_index.remove_document(filename)
+        # Offene Aufgaben verteilter Worker für diese Datei verwerfen
+        get_queue().remove_document(filename)
+        scheduler.clear_priority(filename)
         
         return jsonify({
             "success": True,
@@ -259,10 +321,13 @@ def delete_file(filename):
 @app.route('/api/upload', methods=['POST'])
 def upload_file():
     """API-Endpunkt: Lädt PDF-Dateien hoch"""
-    if 'file' not in request.files:
+    # Multipart-Body einlesen: die Datei wird dabei direkt in DATA_DIR geschrieben und gehasht
+    with metrics.timer("upload_store"):
+        files = request.files
+    if 'file' not in files:
         return jsonify({"error": "Keine Datei ausgewählt"}), 400
     
-    file = request.files['file']
+    file = files['file']
     
     if file.filename == '':
         return jsonify({"error": "Keine Datei ausgewählt"}), 400
@@ -271,179 +336,162 @@ def upload_file():
     if not file.filename.lower().endswith('.pdf'):
         return jsonify({"error": "Nur PDF-Dateien werden unterstützt"}), 400
     
+    auto_process = request.form.get('auto_process', '').lower() in ('1', 'true', 'yes', 'on')
+    # Neue Version eines vorhandenen Dokuments: Datei gleichen Namens ersetzen statt umbenennen,
+    # beim Parsen werden dann nur geänderte Seiten neu geparst
+    replace = request.form.get('replace', '').lower() in ('1', 'true', 'yes', 'on')
+    
     try:
         # Sichere den Dateinamen
         filename = secure_filename(file.filename)
         
-        # Stelle sicher, dass das data-Verzeichnis existiert
-        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        # Die Datei wurde beim Empfang bereits in DATA_DIR geschrieben und gehasht (UploadRequest)
+        temp_path, sha256, size = file.stream.detach()
         
-        # Speichere die Datei
-        file_path = DATA_DIR / filename
+        try:
+            with upload_lock:
+                # Byte-identisches Dokument bereits vorhanden? Dann keine Kopie speichern
+                duplicate_of = file_hashes.find_duplicate(sha256, size)
+                if duplicate_of is not None:
+                    print(f"Upload {filename} ist identisch mit {duplicate_of}, keine Kopie gespeichert")
+                    return jsonify({
+                        "success": True,
+                        "filename": duplicate_of,
+                        "duplicate": True,
+                        "sha256": sha256,
+                        "message": f"Datei bereits vorhanden als {duplicate_of}"
+                    }), 200
+            
+                # Speichere die Datei
+                file_path = DATA_DIR / filename
+            
+                # Wenn Datei bereits existiert, füge einen Zähler hinzu (außer beim Ersetzen)
+                replaced = replace and file_path.exists()
+                counter = 1
+                original_filename = filename
+                while file_path.exists() and not replaced:
+                    name_part = Path(original_filename).stem
+                    ext_part = Path(original_filename).suffix
+                    filename = f"{name_part}_{counter}{ext_part}"
+                    file_path = DATA_DIR / filename
+                    counter += 1
+            
+                os.replace(temp_path, file_path)
+                file_hashes.record(file_path, sha256)
+        finally:
+            # Nach os.replace gibt es die temporäre Datei nicht mehr; bei Duplikat oder Fehler aufräumen
+            temp_path.unlink(missing_ok=True)
+        
+        # Manifest (Seitenzahl, Seitengrößen) sofort berechnen, damit die Oberfläche das Layout kennt
+        try:
+            manifests.refresh(get_store(), file_path, sha256=sha256)
+        except Exception as e:
+            print(f"Manifest für {filename} konnte nicht berechnet werden: {e}")
+        
+        # Frische Uploads aus der Oberfläche vor wartenden großen Dokumenten verarbeiten
+        scheduler.mark_priority(filename)
         
-        # Wenn Datei bereits existiert, füge einen Zähler hinzu
-        counter = 1
-        original_filename = filename
-        while file_path.exists():
-            name_part = Path(original_filename).stem
-            ext_part = Path(original_filename).suffix
-            filename = f"{name_part}_{counter}{ext_part}"
-            file_path = DATA_DIR / filename
-            counter += 1
+        # Seitenbilder im Hintergrund vorab rendern, damit die Segment-Übersicht sofort Bilder hat
+        # (die Übersicht lädt die Größe "preview")
+        if replaced:
+            thumbnails.remove_document(file_path)
+        thumbnails.start_prerender(file_path, sizes=("preview",))
         
-        file.save(str(file_path))
+        # Optional nur dieses Dokument splitten und parsen statt den ganzen Ordner
+        job_ids = []
+        if auto_process:
+            for kind in ("split", "parse"):
+                job, _ = job_manager.submit(kind, (filename,), priority=True)
+                job_ids.append(job.id)
         
         return jsonify({
             "success": True,
             "filename": filename,
-            "message": f"Datei {filename} erfolgreich hochgeladen"
+            "duplicate": False,
+            "replaced": replaced,
+            "sha256": sha256,
+            "job_ids": job_ids,
+            "message": f"Datei {filename} {'ersetzt' if replaced else 'erfolgreich hochgeladen'}"
         }), 200
         
     except Exception as e:
         print(f"Fehler beim Hochladen der Datei: {e}")
         return jsonify({"error": f"Fehler beim Hochladen: {str(e)}"}), 500
 
-@app.route('/api/process', methods=['POST'])
-def process_documents():
-    """API-Endpunkt: Startet split_document.py zur Verarbeitung der Dokumente"""
+def profile_requested():
+    """Profiling-Schalter für Jobs: ?profile=1 oder "profile" im JSON-/Formular-Body"""
+    value = request.args.get('profile') or request.form.get('profile')
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get('profile')
+    return str(value).lower() in ('1', 'true', 'yes', 'on')
+
+def submit_job(kind, started_message):
+    """Reiht einen Job ein und erstellt die API-Antwort (gemeinsam für Split und Parse)"""
+    script_path = job_manager.scripts[kind]
+    if not script_path.exists():
+        return jsonify({"error": f"{script_path.name} nicht gefunden"}), 404
+    
+    # Mit Profiling schreibt der Lauf .pstats, .folded und Speicherprofil nach logs/
+    args = ("--profile",) if profile_requested() else ()
+    
     try:
-        # Pfad zu split_document.py
-        script_path = Path(__file__).parent / "split_document.py"
-        
-        if not script_path.exists():
-            return jsonify({"error": "split_document.py nicht gefunden"}), 404
-        
-        # Starte das Skript als Subprocess
-        # Verwende das Python aus dem venv falls vorhanden
-        venv_python = Path(__file__).parent / "venv" / "Scripts" / "python.exe"
-        python_exe = str(venv_python) if venv_python.exists() else sys.executable
-        
-        # Starte das Skript im Hintergrund
-        # Auf Windows verwenden wir CREATE_NO_WINDOW um kein neues Konsolenfenster zu öffnen
-        # Die Ausgabe wird in Dateien umgeleitet
-        log_dir = Path(__file__).parent / "logs"
-        log_dir.mkdir(exist_ok=True)
-        
-        timestamp = int(time.time())
-        stdout_file = log_dir / f"split_document_{timestamp}.log"
-        stderr_file = log_dir / f"split_document_{timestamp}_error.log"
-        
-        # Öffne Dateien mit UTF-8 Kodierung und lasse sie offen für den Prozess
-        stdout_f = open(stdout_file, "w", encoding="utf-8", buffering=1, errors='replace')
-        stderr_f = open(stderr_file, "w", encoding="utf-8", buffering=1, errors='replace')
-        
-        # Stelle sicher, dass die Umgebungsvariablen UTF-8 verwenden
-        env = os.environ.copy()
-        env['PYTHONIOENCODING'] = 'utf-8'
-        env['PYTHONUTF8'] = '1'
-        
-        # Starte Prozess
-        creation_flags = 0
-        if sys.platform == "win32":
-            # CREATE_NO_WINDOW verhindert ein neues Konsolenfenster
-            creation_flags = subprocess.CREATE_NO_WINDOW
-        
-        process = subprocess.Popen(
-            [python_exe, str(script_path)],
-            stdout=stdout_f,
-            stderr=stderr_f,
-            text=True,
-            encoding='utf-8',
-            errors='replace',
-            cwd=str(Path(__file__).parent),
-            env=env,
-            creationflags=creation_flags
-        )
-        
-        # WICHTIG: Dateien NICHT schließen - der Prozess braucht sie
-        # Sie werden automatisch geschlossen wenn der Prozess endet
-        
-        print(f"Split-Dokument-Prozess gestartet: PID {process.pid}")
-        print(f"Log-Dateien: {stdout_file}, {stderr_file}")
-        print(f"Stdout/Stderr bleiben offen für Prozess {process.pid}")
-        
-        return jsonify({
-            "success": True,
-            "message": "Verarbeitung gestartet",
-            "pid": process.pid
-        }), 200
-        
+        job, created = job_manager.submit(kind, args)
     except Exception as e:
-        print(f"Fehler beim Starten von split_document.py: {e}")
-        return jsonify({"error": f"Fehler beim Starten der Verarbeitung: {str(e)}"}), 500
+        print(f"Fehler beim Einreihen von {script_path.name}: {e}")
+        return jsonify({"error": f"Fehler beim Starten: {str(e)}"}), 500
+    
+    if created:
+        print(f"Job eingereiht: {job.id} ({script_path.name})")
+    else:
+        print(f"Job {job.id} läuft bereits, kein zweiter Lauf gestartet")
+    
+    return jsonify({
+        "success": True,
+        "message": started_message if created else "Läuft bereits",
+        "job_id": job.id,
+        "duplicate": not created,
+        "profile": bool(args)
+    }), 200
+
+@app.route('/api/process', methods=['POST'])
+def process_documents():
+    """API-Endpunkt: Reiht split_document.py zur Verarbeitung der Dokumente ein"""
+    return submit_job("split", "Verarbeitung gestartet")
 
 @app.route('/api/parse-documents', methods=['POST'])
 def parse_documents():
-    """API-Endpunkt: Startet parse_segments.py zur weiteren Verarbeitung der Dokumente"""
-    try:
-        # Pfad zu parse_segments.py
-        script_path = Path(__file__).parent / "parse_segments.py"
-        
-        if not script_path.exists():
-            return jsonify({"error": "parse_segments.py nicht gefunden"}), 404
-        
-        # Starte das Skript als Subprocess
-        # Verwende das Python aus dem venv falls vorhanden
-        venv_python = Path(__file__).parent / "venv" / "Scripts" / "python.exe"
-        python_exe = str(venv_python) if venv_python.exists() else sys.executable
-        
-        # Starte das Skript im Hintergrund
-        log_dir = Path(__file__).parent / "logs"
-        log_dir.mkdir(exist_ok=True)
-        
-        timestamp = int(time.time())
-        stdout_file = log_dir / f"parse_segments_{timestamp}.log"
-        stderr_file = log_dir / f"parse_segments_{timestamp}_error.log"
-        
-        # Öffne Dateien mit UTF-8 Kodierung und lasse sie offen für den Prozess
-        stdout_f = open(stdout_file, "w", encoding="utf-8", buffering=1, errors='replace')
-        stderr_f = open(stderr_file, "w", encoding="utf-8", buffering=1, errors='replace')
-        
-        # Stelle sicher, dass die Umgebungsvariablen UTF-8 verwenden
-        env = os.environ.copy()
-        env['PYTHONIOENCODING'] = 'utf-8'
-        env['PYTHONUTF8'] = '1'
-        
-        # Starte Prozess
-        creation_flags = 0
-        if sys.platform == "win32":
-            # CREATE_NO_WINDOW verhindert ein neues Konsolenfenster
-            creation_flags = subprocess.CREATE_NO_WINDOW
-        
-        process = subprocess.Popen(
-            [python_exe, str(script_path)],
-            stdout=stdout_f,
-            stderr=stderr_f,
-            text=True,
-            encoding='utf-8',
-            errors='replace',
-            cwd=str(Path(__file__).parent),
-            env=env,
-            creationflags=creation_flags
-        )
-        
-        print(f"Parse-Segments-Prozess gestartet: PID {process.pid}")
-        print(f"Log-Dateien: {stdout_file}, {stderr_file}")
-        
-        return jsonify({
-            "success": True,
-            "message": "Parsing gestartet",
-            "pid": process.pid
-        }), 200
-        
-    except Exception as e:
-        print(f"Fehler beim Starten von parse_segments.py: {e}")
-        return jsonify({"error": f"Fehler beim Starten des Parsing: {str(e)}"}), 500
+    """API-Endpunkt: Reiht parse_segments.py zur weiteren Verarbeitung der Dokumente ein"""
+    return submit_job("parse", "Parsing gestartet")
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    """API-Endpunkt: Warteschlangentiefe und Zeitmessungen aller bekannten Jobs"""
+    return jsonify(job_manager.snapshot()), 200
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """API-Endpunkt: Status eines einzelnen Jobs"""
+    job = job_manager.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job nicht gefunden"}), 404
+    return jsonify(job.to_dict()), 200
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """API-Endpunkt: Bricht einen wartenden oder laufenden Job ab"""
+    if job_manager.get(job_id) is None:
+        return jsonify({"error": "Job nicht gefunden"}), 404
+    if not job_manager.cancel(job_id):
+        return jsonify({"error": "Job ist bereits beendet"}), 409
+    return jsonify({
+        "success": True,
+        "message": f"Job {job_id} wird abgebrochen"
+    }), 200
 
 @app.route('/api/process-status', methods=['GET'])
 def process_status():
     """API-Endpunkt: Gibt den aktuellen Status jedes Dokuments zurück"""
     try:
-        # Prüfe ob split_results.json existiert (von split_document.py erstellt)
-        split_results_path = DATA_DIR / "split_results.json"
-        if not split_results_path.exists():
-            split_results_path = LOCAL_DATA_DIR / "split_results.json"
-        
         # Lade Status-Datei für einzelne Dokumente (von split_document.py)
         status_data_file = DATA_DIR / "split_status.json"
         if not status_data_file.exists():
@@ -457,15 +505,10 @@ def process_status():
             except Exception as e:
                 print(f"Fehler beim Laden der Status-Datei: {e}")
         
-        # Prüfe ob split_document.py abgeschlossen ist
-        split_completed = split_results_path.exists()
-        
-        # Prüfe ob parse_segments.py abgeschlossen ist
-        parsed_segments_path = DATA_DIR / "parsed_segments.json"
-        if not parsed_segments_path.exists():
-            parsed_segments_path = LOCAL_DATA_DIR / "parsed_segments.json"
-        
-        parse_completed = parsed_segments_path.exists()
+        # Prüfe ob split_document.py bzw. parse_segments.py abgeschlossen sind (und kein Job mehr aussteht)
+        store = get_store()
+        split_completed = store.has_split() and not job_manager.is_active("split")
+        parse_completed = store.has_parsed() and not job_manager.is_active("parse")
         
         # Lade Parse-Status-Datei falls vorhanden
         parse_status_file = DATA_DIR / "parse_status.json"
@@ -503,22 +546,68 @@ def process_status():
         
         all_completed = split_completed and parse_completed
         
-        return jsonify({
+        # Wird alle 2 Sekunden abgefragt - unveränderter Status kostet nur eine 304-Antwort
+        return http_cache.json_response({
             "completed": all_completed,
             "split_completed": split_completed,
             "parse_completed": parse_completed,
             "status": combined_status,
             "message": "Verarbeitung abgeschlossen" if all_completed else "Verarbeitung läuft noch"
-        }), 200
+        })
             
     except Exception as e:
         print(f"Fehler beim Prüfen des Verarbeitungsstatus: {e}")
         return jsonify({"error": f"Fehler beim Prüfen des Status: {str(e)}"}), 500
 
-@app.route('/api/pdf/<path:filename>')
-def serve_pdf(filename):
-    """Served PDF-Dateien mit Streaming für große Dateien"""
-    # Versuche verschiedene Groß-/Kleinschreibungen
+@app.route('/api/segments/<path:filename>/<segment_name>', methods=['GET'])
+def get_segment_content(filename, segment_name):
+    """API-Endpunkt: Lädt Text und Markdown eines einzelnen geparsten Segments (lazy)"""
+    content = get_store().get_segment_content(Path(filename).name, segment_name)
+    if content is None:
+        return jsonify({"error": "Segment nicht gefunden"}), 404
+    return http_cache.json_response(content)
+
+@app.route('/api/search', methods=['GET'])
+def search_segments():
+    """
+    API-Endpunkt: Volltextsuche über alle geparsten Segmente.
+    
+    Query-Parameter:
+        q: Suchbegriffe (alle müssen vorkommen, Präfixsuche)
+        category: Optional nur Segmente dieser Kategorie
+        file: Optional nur Segmente dieses Dokuments
+        limit: Maximale Anzahl Treffer (Standard 20, höchstens 200)
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Kein Suchbegriff angegeben"}), 400
+    
+    try:
+        limit = min(max(int(request.args.get('limit', 20)), 1), 200)
+    except ValueError:
+        return jsonify({"error": "Ungültiges Limit"}), 400
+    
+    try:
+        started = time.perf_counter()
+        search_index.sync_if_stale()
+        hits = search_index.search(
+            query,
+            category=request.args.get('category') or None,
+            filename=request.args.get('file') or None,
+            limit=limit
+        )
+        return jsonify({
+            "query": query,
+            "count": len(hits),
+            "hits": hits,
+            "took_ms": round((time.perf_counter() - started) * 1000, 2)
+        }), 200
+    except Exception as e:
+        print(f"Fehler bei der Suche nach '{query}': {e}")
+        return jsonify({"error": f"Fehler bei der Suche: {str(e)}"}), 500
+
+def resolve_pdf_path(filename):
+    """Findet den Pfad einer PDF-Datei im data-Ordner (toleriert .pdf/.PDF)"""
     pdf_path = DATA_DIR / filename
     if not pdf_path.exists():
         # Versuche verschiedene Varianten
@@ -527,24 +616,87 @@ def serve_pdf(filename):
             if test_path.exists():
                 pdf_path = test_path
                 break
+    return pdf_path
+
+def file_wrapper_range(response, path):
+    """
+    Liefert eine Range-Antwort (206) über wsgi.file_wrapper statt über Werkzeugs
+    Lese-Schleife: Die Datei wird auf den Anfang des Ausschnitts positioniert und der Server
+    sendet Content-Length Bytes direkt daraus (gunicorn per sendfile() ohne Kopie durch
+    Python, waitress aus seinem Dateipuffer). Ganze Dateien gehen bei send_file bereits
+    diesen Weg; ohne file_wrapper (Entwicklungsserver) bleibt die Antwort unverändert.
+    """
+    file_wrapper = request.environ.get('wsgi.file_wrapper')
+    content_range = response.content_range
+    if response.status_code != 206 or file_wrapper is None or content_range is None:
+        return response
+    
+    range_file = open(path, 'rb')
+    range_file.seek(content_range.start)
+    # Von send_file geöffnete Datei schließen
+    response.response.close()
+    response.response = file_wrapper(range_file, FILE_WRAPPER_BLOCK_SIZE)
+    return response
+
+@app.route('/api/pdf/<path:filename>')
+def serve_pdf(filename):
+    """Served PDF-Dateien mit Streaming für große Dateien"""
+    # Versuche verschiedene Groß-/Kleinschreibungen
+    pdf_path = resolve_pdf_path(filename)
     
     if not pdf_path.exists():
         return jsonify({"error": "PDF nicht gefunden"}), 404
     
     try:
         # Verwende send_file mit Streaming für große Dateien
-        return send_file(
+        response = send_file(
             str(pdf_path),
             mimetype='application/pdf',
             as_attachment=False,
             download_name=pdf_path.name,
             conditional=True  # Unterstützt Range-Requests für besseres Streaming
         )
+        return file_wrapper_range(response, pdf_path)
     except Exception as e:
         print(f"Fehler beim Senden der PDF-Datei {filename}: {e}")
         return jsonify({"error": f"Fehler beim Laden der PDF: {str(e)}"}), 500
 
+@app.route('/api/thumbnail/<path:filename>/<int:page>')
+def serve_thumbnail(filename, page):
+    """
+    Served ein serverseitig gerendertes Seitenbild aus dem Thumbnail-Cache.
+    
+    Query-Parameter:
+        size: "thumb" (Standard) oder "preview"
+        format: "webp" oder "jpeg" (Standard: WebP falls der Browser es akzeptiert)
+    """
+    pdf_path = resolve_pdf_path(Path(filename).name)
+    if not pdf_path.exists():
+        return jsonify({"error": "PDF nicht gefunden"}), 404
+    
+    size = request.args.get('size', 'thumb')
+    fmt = request.args.get('format')
+    if fmt is None:
+        fmt = 'webp' if 'image/webp' in request.headers.get('Accept', '') else 'jpeg'
+    
+    try:
+        image_path = thumbnails.get_page_image(pdf_path, page, size, fmt)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Fehler beim Rendern von Seite {page} aus {filename}: {e}")
+        return jsonify({"error": f"Fehler beim Rendern der Seite: {str(e)}"}), 500
+    
+    response = send_file(
+        str(image_path),
+        mimetype=thumbnails.FORMATS[fmt][1],
+        conditional=True
+    )
+    response.headers['Vary'] = 'Accept'
+    return response
+
 if __name__ == '__main__':
+    # Entwicklungsserver mit Debugger; für den Betrieb serve.py verwenden
     app.run(debug=True, host='0.0.0.0', port=5000)
 
 
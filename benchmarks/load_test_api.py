@@ -0,0 +1,412 @@
+"""
+Lasttest der JSON-API mit vielen Dokumenten und gleichzeitigen Browser-Tabs.
+
+Erzeugt in einem temporären Datenordner Split- und Parse-Ergebnisse (Ergebnis-Speicher),
+Manifeste, split_status.json/parse_status.json und ein PDF pro Dokument, startet serve.py
+und lässt gleichzeitige Tabs /api/documents, /api/process-status,
+/api/json/parsed_segments und /api/pdf abfragen. Jeder Tab lädt zuerst die Seite
+(Dokumentenliste und Parse-Ergebnisse) und fragt danach gemäß --mix zufällig einen der
+Endpunkte ab; wie ein Browser sendet er If-None-Match mit dem zuletzt erhaltenen ETag.
+
+Gemessen werden pro Endpunkt Anfragen/s, Latenz (p50/p95/p99), Antwortgrößen (entpackt
+und übertragen), Anteil der 304-Antworten, die Latenz der ersten (ungecachten) Anfrage
+und der Arbeitsspeicher des Servers. Mit --compare wird ein früherer Bericht verglichen.
+
+Beispiele:
+    python benchmarks/load_test_api.py --documents 5000 --tabs 50 --duration 30
+    python benchmarks/load_test_api.py --interval 2 --mix process-status=1      # nur Polling wie die Oberfläche
+    python benchmarks/load_test_api.py --ramp-up 0                              # alle Tabs laden gleichzeitig
+    python benchmarks/load_test_api.py --compare logs/load_test_api_1700000000.json
+"""
+import argparse
+import json
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCHMARK_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(BENCHMARK_DIR))
+
+from pdf_load_test import CHUNK_SIZE, process_rss_bytes, start_server, summarize_latencies  # noqa: E402
+from run_benchmark import REGRESSION_THRESHOLD, git_revision  # noqa: E402
+
+ENDPOINTS = ("documents", "process-status", "parsed_segments", "pdf")
+DEFAULT_MIX = "process-status=10,documents=1,parsed_segments=1,pdf=4"
+CATEGORIES = ("Mietvertrag", "Rechnung", "Übergabeprotokoll", "Bewerbung")
+RSS_SAMPLE_INTERVAL = 0.2
+
+
+def parse_mix(value: str) -> dict:
+    """"process-status=10,pdf=4" -> Gewichte pro Endpunkt"""
+    mix = {}
+    for item in value.split(","):
+        name, _, weight = item.partition("=")
+        name = name.strip()
+        if name not in ENDPOINTS:
+            raise argparse.ArgumentTypeError(f"Unbekannter Endpunkt: {name} (erlaubt: {', '.join(ENDPOINTS)})")
+        mix[name] = float(weight or 1)
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("Mindestens ein Endpunkt braucht ein Gewicht > 0")
+    return mix
+
+
+# ----------------------------------------------------------------------
+# Testdaten
+# ----------------------------------------------------------------------
+
+def _segment_text(rng: random.Random, words: tuple, size: int) -> str:
+    lines = []
+    length = 0
+    while length < size:
+        line = " ".join(rng.choice(words) for _ in range(12))
+        lines.append(line)
+        length += len(line) + 1
+    return "\n".join(lines)
+
+
+def generate_data(data_dir: Path, documents: int, segments: int, segment_kb: float, pdf_pages: int,
+                  seed: int = 0) -> dict:
+    """
+    Füllt den Datenordner wie nach abgeschlossenem Split und Parse.
+
+    Alle PDFs sind Kopien eines synthetischen Dokuments; die Manifeste werden einmal
+    berechnet und pro Kopie um Größe, Änderungszeit und Segmente ergänzt.
+
+    Returns:
+        Beschreibung der Testdaten (Dokumente, Segmente, Größen, Dauer)
+    """
+    import manifests
+    from result_store import get_store
+    from synthetic_corpus import WORDS, generate_document
+
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    template = data_dir / "_vorlage.pdf"
+    generate_document(template, pdf_pages, "text", seed=seed)
+    template_manifest = manifests.build_manifest(template)
+
+    store = get_store(data_dir)
+    split_status = {}
+    parse_status = {}
+    filenames = []
+    text_size = int(segment_kb * 1024)
+    for index in range(documents):
+        filename = f"dokument_{index + 1:05d}.pdf"
+        pdf_path = data_dir / filename
+        shutil.copyfile(template, pdf_path)
+
+        split_segments = []
+        parsed_segments = []
+        counters = {}
+        for position in range(segments):
+            category = rng.choice(CATEGORIES)
+            counters[category] = counters.get(category, 0) + 1
+            first_page = position * pdf_pages // segments + 1
+            last_page = max(first_page, (position + 1) * pdf_pages // segments)
+            segment = {
+                "name": f"{category}_{counters[category]}",
+                "category": category,
+                "pages": list(range(first_page, last_page + 1)),
+                "confidence_category": round(rng.uniform(0.6, 1.0), 2),
+            }
+            text = _segment_text(rng, WORDS, text_size)
+            split_segments.append(segment)
+            parsed_segments.append({**segment, "parsed": {
+                "text": text,
+                "markdown": f"# {segment['name']}\n\n{text}",
+                "num_pages_parsed": len(segment["pages"]),
+                "tier": "agent",
+            }})
+        store.upsert_split(filename, split_segments)
+        store.upsert_parsed(filename, parsed_segments)
+        stat = pdf_path.stat()
+        store.upsert_manifest(filename, {
+            **template_manifest,
+            "size_bytes": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+            "segments": manifests.segment_map(split_segments),
+        })
+
+        now = time.time()
+        split_status[filename] = {"status": "completed", "message": f"{segments} Segmente", "timestamp": now}
+        parse_status[filename] = {"status": "completed", "message": f"Parsing abgeschlossen für {filename}",
+                                  "timestamp": now}
+        filenames.append(filename)
+    template.unlink()
+
+    for name, status in (("split_status.json", split_status), ("parse_status.json", parse_status)):
+        with open(data_dir / name, "w", encoding="utf-8") as f:
+            json.dump(status, f, indent=2, ensure_ascii=False)
+
+    return {
+        "documents": documents,
+        "segments_per_document": segments,
+        "segment_kb": segment_kb,
+        "pdf_pages": pdf_pages,
+        "pdf_kb": round(template_manifest["size_bytes"] / 1024, 1),
+        "result_store_mb": round(store.db_file.stat().st_size / 1024 / 1024, 1),
+        "generation_seconds": round(time.perf_counter() - started, 2),
+        "filenames": filenames,
+    }
+
+
+# ----------------------------------------------------------------------
+# Tabs
+# ----------------------------------------------------------------------
+
+class EndpointResults:
+    """Messwerte eines Endpunkts über alle Tabs"""
+
+    def __init__(self):
+        self.latencies = []
+        self.body_bytes = 0
+        self.wire_bytes = 0
+        self.max_body_bytes = 0
+        self.not_modified = 0
+        self.errors = 0
+
+
+class Results:
+    """Gemeinsame Messwerte aller Tabs"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {name: EndpointResults() for name in ENDPOINTS}
+
+    def add(self, endpoint: str, latency: float, response):
+        body = len(response.content)
+        # Content-Length ist bei komprimierten Antworten die übertragene Größe
+        wire = int(response.headers.get("Content-Length") or body)
+        with self.lock:
+            entry = self.endpoints[endpoint]
+            entry.latencies.append(latency)
+            entry.body_bytes += body
+            entry.wire_bytes += wire
+            entry.max_body_bytes = max(entry.max_body_bytes, body)
+            if response.status_code == 304:
+                entry.not_modified += 1
+
+    def error(self, endpoint: str):
+        with self.lock:
+            self.endpoints[endpoint].errors += 1
+
+
+class Tab:
+    """Ein Browser-Tab mit eigener Verbindung und eigenem ETag-Cache"""
+
+    def __init__(self, base_url: str, filenames: list, results: Results, use_etags: bool, seed: int):
+        import requests
+
+        self.base_url = base_url
+        self.filenames = filenames
+        self.results = results
+        self.use_etags = use_etags
+        self.rng = random.Random(seed)
+        self.session = requests.Session()
+        self.etags = {}
+
+    def url(self, endpoint: str) -> str:
+        if endpoint == "documents":
+            return f"{self.base_url}/api/documents"
+        if endpoint == "process-status":
+            return f"{self.base_url}/api/process-status"
+        if endpoint == "parsed_segments":
+            return f"{self.base_url}/api/json/parsed_segments"
+        return f"{self.base_url}/api/pdf/{quote(self.rng.choice(self.filenames))}"
+
+    def request(self, endpoint: str):
+        url = self.url(endpoint)
+        headers = {}
+        if endpoint == "pdf":
+            # Erster Abschnitt wie pdf.js beim Öffnen eines Dokuments
+            headers["Range"] = f"bytes=0-{CHUNK_SIZE - 1}"
+        elif self.use_etags and url in self.etags:
+            headers["If-None-Match"] = self.etags[url]
+        started = time.perf_counter()
+        try:
+            response = self.session.get(url, headers=headers, timeout=120)
+            latency = time.perf_counter() - started
+            if response.status_code not in (200, 206, 304):
+                raise ValueError(f"Status {response.status_code}")
+        except Exception as e:
+            self.results.error(endpoint)
+            print(f"{endpoint}: {e}", flush=True)
+            return
+        if response.headers.get("ETag"):
+            self.etags[url] = response.headers["ETag"]
+        self.results.add(endpoint, latency, response)
+
+    def run(self, mix: dict, interval: float, delay: float, stop: threading.Event):
+        if stop.wait(delay):
+            return
+        # Seitenaufruf: Dokumentenliste und Parse-Ergebnisse
+        self.request("documents")
+        self.request("parsed_segments")
+        names = list(mix)
+        weights = [mix[name] for name in names]
+        while not stop.wait(interval):
+            self.request(self.rng.choices(names, weights)[0])
+
+
+def cold_requests(base_url: str) -> dict:
+    """Latenz der ersten Anfrage pro JSON-Endpunkt (Serialisierung ohne Cache)"""
+    import requests
+
+    latencies = {}
+    for endpoint, path in (("documents", "/api/documents"), ("parsed_segments", "/api/json/parsed_segments")):
+        started = time.perf_counter()
+        requests.get(f"{base_url}{path}", timeout=600).raise_for_status()
+        latencies[endpoint] = round((time.perf_counter() - started) * 1000, 1)
+    return latencies
+
+
+# ----------------------------------------------------------------------
+# Bericht
+# ----------------------------------------------------------------------
+
+def endpoint_report(entry: EndpointResults, elapsed: float) -> dict:
+    count = len(entry.latencies)
+    return {
+        "requests": count,
+        "requests_per_second": round(count / elapsed, 1),
+        "latency": summarize_latencies(entry.latencies),
+        "avg_body_kb": round(entry.body_bytes / count / 1024, 1) if count else 0.0,
+        "max_body_kb": round(entry.max_body_bytes / 1024, 1),
+        "avg_wire_kb": round(entry.wire_bytes / count / 1024, 1) if count else 0.0,
+        "not_modified_share": round(entry.not_modified / count, 3) if count else 0.0,
+        "errors": entry.errors,
+    }
+
+
+def compare_reports(previous: dict, current: dict) -> list:
+    """Vergleicht zwei Berichte pro Endpunkt (Latenz p95, Anfragen/s) und beim Speicher"""
+    lines = []
+    checks = [
+        ("server_rss_peak_mb", current.get("server_rss_peak_mb"), previous.get("server_rss_peak_mb"), True),
+    ]
+    for endpoint, data in current["cold_latency_ms"].items():
+        checks.append((f"{endpoint}.cold_ms", data, previous.get("cold_latency_ms", {}).get(endpoint), True))
+    for endpoint, data in current["endpoints"].items():
+        old = previous.get("endpoints", {}).get(endpoint)
+        if not old:
+            continue
+        checks.append((f"{endpoint}.p95_ms", data["latency"]["p95_ms"], old["latency"].get("p95_ms"), True))
+        checks.append((f"{endpoint}.requests_per_second", data["requests_per_second"],
+                       old.get("requests_per_second"), False))
+    for name, new_value, old_value, lower_is_better in checks:
+        if not new_value or not old_value:
+            continue
+        change = (new_value - old_value) / old_value
+        worse = change > REGRESSION_THRESHOLD if lower_is_better else change < -REGRESSION_THRESHOLD
+        marker = "  <-- Verschlechterung" if worse else ""
+        lines.append(f"{name}: {old_value} -> {new_value} ({change:+.0%}){marker}")
+    return lines
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Lasttest der JSON-API mit vielen Dokumenten und Tabs")
+    arg_parser.add_argument("--server", default="auto", help="Server für serve.py (auto, gunicorn, waitress, werkzeug)")
+    arg_parser.add_argument("--threads", type=int, default=16, help="Threads des Servers")
+    arg_parser.add_argument("--documents", type=int, default=5000, help="Anzahl Dokumente")
+    arg_parser.add_argument("--segments", type=int, default=3, help="Segmente pro Dokument")
+    arg_parser.add_argument("--segment-kb", type=float, default=1.5, help="Text pro Segment in KB")
+    arg_parser.add_argument("--pdf-pages", type=int, default=6, help="Seiten pro PDF")
+    arg_parser.add_argument("--tabs", type=int, default=50, help="Gleichzeitige Browser-Tabs")
+    arg_parser.add_argument("--interval", type=float, default=0.5,
+                            help="Sekunden zwischen zwei Anfragen eines Tabs (Oberfläche: 2)")
+    arg_parser.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                            help=f"Gewichte der Endpunkte (Standard: {DEFAULT_MIX})")
+    arg_parser.add_argument("--ramp-up", type=float, default=10,
+                            help="Sekunden, über die die Tabs nacheinander geöffnet werden (0: alle gleichzeitig)")
+    arg_parser.add_argument("--no-etags", action="store_true", help="Kein If-None-Match senden")
+    arg_parser.add_argument("--duration", type=float, default=30, help="Testdauer in Sekunden")
+    arg_parser.add_argument("--seed", type=int, default=0, help="Startwert für reproduzierbare Daten")
+    arg_parser.add_argument("--output", type=Path, default=None,
+                            help="Bericht speichern (Standard: logs/load_test_api_<zeit>.json)")
+    arg_parser.add_argument("--compare", type=Path, default=None, help="Früheren Bericht zum Vergleich")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="flatscouts_api_load_") as temp_dir:
+        data_dir = Path(temp_dir)
+        print(f"Erzeuge Testdaten ({args.documents} Dokumente, {args.segments} Segmente)...", flush=True)
+        data = generate_data(data_dir, args.documents, args.segments, args.segment_kb, args.pdf_pages, args.seed)
+        filenames = data.pop("filenames")
+        print(f"   {data['generation_seconds']} s, Ergebnis-Speicher {data['result_store_mb']} MB", flush=True)
+
+        process, base_url = start_server(data_dir, args.server, args.threads)
+        try:
+            rss_start = process_rss_bytes(process.pid)
+            cold_latency = cold_requests(base_url)
+            print(f"Erste Anfragen: {cold_latency} ms", flush=True)
+
+            results = Results()
+            stop = threading.Event()
+            tabs = [Tab(base_url, filenames, results, not args.no_etags, args.seed + index)
+                    for index in range(args.tabs)]
+            threads = [
+                threading.Thread(target=tab.run, args=(args.mix, args.interval, index * args.ramp_up / args.tabs, stop))
+                for index, tab in enumerate(tabs)
+            ]
+            rss_peak = process_rss_bytes(process.pid)
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            while time.perf_counter() - started < args.duration:
+                time.sleep(RSS_SAMPLE_INTERVAL)
+                rss_peak = max(rss_peak, process_rss_bytes(process.pid))
+            stop.set()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+            rss_end = process_rss_bytes(process.pid)
+        finally:
+            process.terminate()
+            process.wait()
+
+    endpoints = {name: endpoint_report(entry, elapsed) for name, entry in results.endpoints.items()
+                 if entry.latencies or entry.errors}
+    report = {
+        "created_at": time.time(),
+        "git_revision": git_revision(),
+        "server": args.server,
+        "threads": args.threads,
+        "tabs": args.tabs,
+        "interval": args.interval,
+        "ramp_up": args.ramp_up,
+        "mix": args.mix,
+        "etags": not args.no_etags,
+        "data": data,
+        "seconds": round(elapsed, 2),
+        "requests_per_second": round(sum(len(entry.latencies) for entry in results.endpoints.values()) / elapsed, 1),
+        "cold_latency_ms": cold_latency,
+        "endpoints": endpoints,
+        "server_rss_start_mb": round(rss_start / 1024 / 1024, 1),
+        "server_rss_peak_mb": round(rss_peak / 1024 / 1024, 1),
+        "server_rss_end_mb": round(rss_end / 1024 / 1024, 1),
+        "errors": sum(entry.errors for entry in results.endpoints.values()),
+    }
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    output = args.output or REPO_DIR / "logs" / f"load_test_api_{int(report['created_at'])}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Bericht gespeichert in: {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        print(f"\nVergleich mit {args.compare} (Revision {previous.get('git_revision')}):")
+        for line in compare_reports(previous, report):
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
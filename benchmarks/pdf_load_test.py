@@ -0,0 +1,272 @@
+"""
+Lasttest: gleichzeitige PDF-Betrachter gegen serve.py mit großen PDFs.
+
+Startet serve.py mit einem temporären Datenordner und einem großen synthetischen PDF.
+Jeder Betrachter lädt das PDF wie pdf.js in Range-Abschnitten (Standard 64 KB) oder als
+Ganzes; parallel fragt ein Poller /api/process-status ab, wie es die Oberfläche tut.
+Gemessen werden Durchsatz der PDF-Auslieferung, Latenz der Range-Anfragen und vor allem
+die Latenz des JSON-Pollings, solange die Downloads laufen.
+
+Beispiele:
+    python benchmarks/pdf_load_test.py --viewers 20 --duration 20
+    python benchmarks/pdf_load_test.py --server werkzeug --viewers 20   # Vergleich Entwicklungsserver
+    python benchmarks/pdf_load_test.py --full-downloads --target-mb 200
+"""
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from urllib.parse import quote
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCHMARK_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(BENCHMARK_DIR))
+
+import metrics  # noqa: E402
+
+CHUNK_SIZE = 65536  # rangeChunkSize von pdf.js
+POLL_INTERVAL = 0.5  # Sekunden zwischen zwei Status-Abfragen eines Pollers
+STARTUP_TIMEOUT = 60
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def child_pids(pid: int) -> list:
+    """Direkte Kindprozesse (nur Linux)"""
+    children = []
+    try:
+        for task in Path(f"/proc/{pid}/task").iterdir():
+            children += [int(child) for child in (task / "children").read_text().split()]
+    except OSError:
+        pass
+    return children
+
+
+def process_rss_bytes(pid: int) -> int:
+    """
+    Arbeitsspeicher (RSS) eines anderen Prozesses samt Kindprozessen (Linux über /proc,
+    Windows nur mit psutil, sonst 0).
+    Bei gunicorn läuft die Anwendung im Worker, einem Kindprozess von serve.py.
+    """
+    if sys.platform == "win32":
+        try:
+            import psutil
+        except ImportError:
+            return 0
+        try:
+            process = psutil.Process(pid)
+            return process.memory_info().rss + sum(child.memory_info().rss
+                                                   for child in process.children(recursive=True))
+        except psutil.Error:
+            return 0
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+    return rss + sum(process_rss_bytes(child) for child in child_pids(pid))
+
+
+def start_server(data_dir: Path, server: str, threads: int):
+    """
+    Startet serve.py als eigenen Prozess und wartet, bis die API antwortet.
+
+    Returns:
+        Tuple (process, base_url)
+    """
+    import requests
+
+    port = free_port()
+    env = dict(os.environ, FLATSCOUTS_DATA_DIR=str(data_dir), PYTHONUNBUFFERED="1")
+    process = subprocess.Popen(
+        [sys.executable, str(REPO_DIR / "serve.py"), "--host", "127.0.0.1", "--port", str(port),
+         "--threads", str(threads), "--server", server],
+        cwd=REPO_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    deadline = time.time() + STARTUP_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py beendet mit Exit-Code {process.returncode}")
+        try:
+            requests.get(f"{base_url}/api/process-status", timeout=1)
+            return process, base_url
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError("serve.py antwortet nicht")
+
+
+def summarize_latencies(latencies: list) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(metrics.percentile(ordered, 50) * 1000, 1),
+        "p95_ms": round(metrics.percentile(ordered, 95) * 1000, 1),
+        "p99_ms": round(metrics.percentile(ordered, 99) * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1) if ordered else 0.0,
+    }
+
+
+class Results:
+    """Gemeinsame Messwerte aller Threads"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.range_latencies = []
+        self.poll_latencies = []
+        self.bytes_received = 0
+        self.downloads = 0
+        self.errors = 0
+
+    def add(self, attribute: str, latency: float, size: int = 0):
+        with self.lock:
+            getattr(self, attribute).append(latency)
+            self.bytes_received += size
+
+
+def run_viewer(url: str, size: int, reference: Path, args, results: Results, stop: threading.Event,
+               verify: bool):
+    """Lädt das PDF wiederholt, bis die Testdauer abgelaufen ist"""
+    import requests
+
+    session = requests.Session()
+    with open(reference, "rb") as local_file:
+        while not stop.is_set():
+            try:
+                if args.full_downloads:
+                    started = time.perf_counter()
+                    response = session.get(url, timeout=300)
+                    response.raise_for_status()
+                    results.add("range_latencies", time.perf_counter() - started, len(response.content))
+                    if len(response.content) != size:
+                        raise ValueError("unvollständiger Download")
+                else:
+                    for start in range(0, size, args.chunk_size):
+                        if stop.is_set():
+                            break
+                        end = min(start + args.chunk_size, size) - 1
+                        started = time.perf_counter()
+                        response = session.get(url, headers={"Range": f"bytes={start}-{end}"}, timeout=60)
+                        latency = time.perf_counter() - started
+                        if response.status_code != 206 or len(response.content) != end - start + 1:
+                            raise ValueError(f"Range {start}-{end}: Status {response.status_code}")
+                        if verify:
+                            local_file.seek(start)
+                            if local_file.read(end - start + 1) != response.content:
+                                raise ValueError(f"Range {start}-{end}: falscher Inhalt")
+                        results.add("range_latencies", latency, len(response.content))
+                with results.lock:
+                    results.downloads += 1
+                # Nur der erste Durchlauf wird gegen die Datei geprüft
+                verify = False
+            except Exception as e:
+                with results.lock:
+                    results.errors += 1
+                print(f"Betrachter: {e}", flush=True)
+                stop.wait(0.5)
+
+
+def run_poller(base_url: str, results: Results, stop: threading.Event):
+    import requests
+
+    session = requests.Session()
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            session.get(f"{base_url}/api/process-status", timeout=60).raise_for_status()
+            results.add("poll_latencies", time.perf_counter() - started)
+        except Exception:
+            with results.lock:
+                results.errors += 1
+        stop.wait(POLL_INTERVAL)
+
+
+def main():
+    from synthetic_corpus import KINDS, generate_document
+
+    arg_parser = argparse.ArgumentParser(description="Lasttest gleichzeitiger PDF-Betrachter gegen serve.py")
+    arg_parser.add_argument("--server", default="auto", help="Server für serve.py (auto, gunicorn, waitress, werkzeug)")
+    arg_parser.add_argument("--threads", type=int, default=16, help="Threads des Servers")
+    arg_parser.add_argument("--viewers", type=int, default=20, help="Gleichzeitige Betrachter")
+    arg_parser.add_argument("--pollers", type=int, default=5, help="Gleichzeitige Status-Abfragen (Browser-Tabs)")
+    arg_parser.add_argument("--duration", type=float, default=15, help="Testdauer in Sekunden")
+    arg_parser.add_argument("--pages", type=int, default=100, help="Seiten des Test-PDFs")
+    arg_parser.add_argument("--kind", choices=KINDS, default="image", help="Art der Seiten")
+    arg_parser.add_argument("--target-mb", type=float, default=100, help="Ungefähre Größe des Test-PDFs in MB")
+    arg_parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Größe der Range-Abschnitte")
+    arg_parser.add_argument("--full-downloads", action="store_true", help="Ganze Datei statt Range-Abschnitten")
+    arg_parser.add_argument("--output", type=Path, default=None, help="Ergebnis zusätzlich als JSON speichern")
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="flatscouts_pdf_load_") as temp_dir:
+        data_dir = Path(temp_dir)
+        pdf_path = data_dir / "large_document.pdf"
+        print(f"Erzeuge Test-PDF ({args.pages} Seiten, ca. {args.target_mb:.0f} MB)...", flush=True)
+        generate_document(pdf_path, args.pages, args.kind, args.target_mb)
+        size = pdf_path.stat().st_size
+
+        process, base_url = start_server(data_dir, args.server, args.threads)
+        try:
+            url = f"{base_url}/api/pdf/{quote(pdf_path.name)}"
+            results = Results()
+            stop = threading.Event()
+            rss_peak = process_rss_bytes(process.pid)
+            threads = [
+                threading.Thread(target=run_viewer, args=(url, size, pdf_path, args, results, stop, index == 0))
+                for index in range(args.viewers)
+            ] + [
+                threading.Thread(target=run_poller, args=(base_url, results, stop)) for _ in range(args.pollers)
+            ]
+            started = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            while time.perf_counter() - started < args.duration:
+                time.sleep(0.2)
+                rss_peak = max(rss_peak, process_rss_bytes(process.pid))
+            stop.set()
+            for thread in threads:
+                thread.join()
+            elapsed = time.perf_counter() - started
+        finally:
+            process.terminate()
+            process.wait()
+
+    report = {
+        "server": args.server,
+        "threads": args.threads,
+        "viewers": args.viewers,
+        "pollers": args.pollers,
+        "pdf_mb": round(size / 1024 / 1024, 1),
+        "mode": "full" if args.full_downloads else f"range_{args.chunk_size}",
+        "seconds": round(elapsed, 2),
+        "downloads_completed": results.downloads,
+        "pdf_mb_per_second": round(results.bytes_received / 1024 / 1024 / elapsed, 1),
+        "pdf_requests_per_second": round(len(results.range_latencies) / elapsed, 1),
+        "pdf_latency": summarize_latencies(results.range_latencies),
+        "poll_latency": summarize_latencies(results.poll_latencies),
+        "server_rss_peak_mb": round(rss_peak / 1024 / 1024, 1),
+        "errors": results.errors,
+    }
+    print(json.dumps(report, indent=2))
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Gespeichert in: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,293 @@
+"""
+End-to-End-Benchmark: Split -> Parse -> API mit synthetischem Korpus und lokalem API-Stub.
+
+Misst pro Phase Durchsatz (Dokumente/Seiten pro Sekunde), p50/p95 der einzelnen
+Verarbeitungsschritte (aus metrics.py) und den Spitzenwert des Arbeitsspeichers (RSS).
+Der Bericht wird als JSON gespeichert und kann mit einem früheren Lauf verglichen werden.
+
+Beispiele:
+    python benchmarks/run_benchmark.py --documents 20 --pages 10
+    python benchmarks/run_benchmark.py --documents 2 --pages 200 --kind image --target-mb 300
+    python benchmarks/run_benchmark.py --compare logs/benchmark_1700000000.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BENCHMARK_DIR = Path(__file__).resolve().parent
+REPO_DIR = BENCHMARK_DIR.parent
+sys.path.insert(0, str(REPO_DIR))
+sys.path.insert(0, str(BENCHMARK_DIR))
+
+from synthetic_corpus import KINDS, generate_corpus  # noqa: E402
+from stub_service import StubParser, start_split_service_process  # noqa: E402
+
+# Schwellwert für die Markierung von Verschlechterungen beim Vergleich
+REGRESSION_THRESHOLD = 0.10
+RSS_SAMPLE_INTERVAL = 0.05
+
+
+def current_rss_bytes() -> int:
+    """Aktueller Arbeitsspeicher (RSS) dieses Prozesses (Windows: nur mit psutil, sonst 0)"""
+    if sys.platform == "win32":
+        try:
+            import psutil
+        except ImportError:
+            return 0
+        return psutil.Process().memory_info().rss
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Ohne /proc nur der bisherige Höchstwert verfügbar (Linux: KB, macOS: Bytes)
+        import resource  # nur Unix
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+class RssSampler:
+    """Misst in einem Hintergrund-Thread den höchsten RSS-Wert während eines Blocks"""
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss_bytes())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = current_rss_bytes()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss_bytes())
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except Exception:
+        return "unbekannt"
+
+
+def run_logged(action, log_file: Path):
+    """Führt einen Lauf aus; die Ausgabe landet im Log"""
+    with open(log_file, "a", encoding="utf-8") as log, \
+            contextlib.redirect_stdout(log), contextlib.redirect_stderr(log):
+        action()
+
+
+def run_phase(name: str, documents: int, pages: int, action) -> dict:
+    """Misst Dauer, Durchsatz, Zeitmessungen (metrics) und RSS-Spitze einer Phase"""
+    import metrics
+
+    metrics.reset()
+    started = time.perf_counter()
+    with RssSampler() as sampler:
+        extra = action() or {}
+    duration = time.perf_counter() - started
+    summary = metrics.run_summary()
+    endpoints = {}
+    for entry in metrics.snapshot():
+        if "endpoint" in entry["labels"]:
+            endpoints.setdefault(entry["labels"]["endpoint"], metrics.Histogram()).merge(entry)
+    result = {
+        "duration_seconds": round(duration, 3),
+        "documents_per_second": round(documents / duration, 3) if duration else None,
+        "pages_per_second": round(pages / duration, 3) if duration else None,
+        "peak_rss_mb": round(sampler.peak / 1024 / 1024, 1),
+        "stages": summary["stages"],
+        **extra,
+    }
+    if endpoints:
+        result["endpoints"] = {name: histogram.summary() for name, histogram in sorted(endpoints.items())}
+    print(f"  {name}: {duration:.2f}s, {result['documents_per_second']} Dok/s, "
+          f"{result['pages_per_second']} Seiten/s, RSS {result['peak_rss_mb']} MB", flush=True)
+    return result
+
+
+def api_requests(corpus: list, rounds: int, search_terms: list) -> list:
+    """Liste der Anfragen (Methode, URL, Header) für die API-Phase"""
+    requests_list = []
+    names = [Path(doc["path"]).name for doc in corpus]
+    for round_index in range(rounds):
+        requests_list.append(("GET", "/api/documents", {}))
+        requests_list.append(("GET", "/api/json/parsed_segments", {}))
+        requests_list.append(("GET", "/api/process-status", {}))
+        requests_list.append(("GET", f"/api/search?q={search_terms[round_index % len(search_terms)]}", {}))
+        name = names[round_index % len(names)]
+        requests_list.append(("GET", f"/api/pdf/{name}", {"Range": "bytes=0-65535"}))
+        requests_list.append(("GET", f"/api/thumbnail/{name}/1?size=thumb", {}))
+    return requests_list
+
+
+def serve_api(corpus: list, rounds: int, log_file: Path) -> dict:
+    """Fragt die wichtigsten Endpunkte über den Flask-Test-Client ab (ohne Netzwerk)"""
+    import app as app_module
+
+    client = app_module.app.test_client()
+    status_counts = {}
+    response_bytes = 0
+    etags = {}
+    with open(log_file, "a", encoding="utf-8") as log, contextlib.redirect_stdout(log):
+        for method, url, headers in api_requests(corpus, rounds, ["Mietvertrag", "Nebenkosten", "Rechnung IBAN"]):
+            # Wiederholte JSON-Abfragen mit ETag wie der Browser (304 ohne Body)
+            if url in etags:
+                headers = {**headers, "If-None-Match": etags[url]}
+            response = client.open(url, method=method, headers=headers)
+            body = response.get_data()
+            response_bytes += len(body)
+            status_counts[str(response.status_code)] = status_counts.get(str(response.status_code), 0) + 1
+            if response.headers.get("ETag") and url.startswith("/api/") and not url.startswith("/api/pdf"):
+                etags[url] = response.headers["ETag"]
+            response.close()
+    app_module.job_manager.shutdown()
+    return {"requests": sum(status_counts.values()), "status_counts": status_counts, "response_bytes": response_bytes}
+
+
+def compare_reports(previous: dict, current: dict) -> list:
+    """Vergleicht zwei Berichte und liefert Zeilen mit den Abweichungen pro Phase und Schritt"""
+    lines = []
+    for phase, data in current["phases"].items():
+        old = previous.get("phases", {}).get(phase)
+        if not old:
+            continue
+        checks = [("duration_seconds", data["duration_seconds"], old.get("duration_seconds")),
+                  ("peak_rss_mb", data["peak_rss_mb"], old.get("peak_rss_mb"))]
+        for stage, stats in data["stages"].items():
+            old_stats = old.get("stages", {}).get(stage, {})
+            checks.append((f"{stage}.p95_seconds", stats.get("p95_seconds"), old_stats.get("p95_seconds")))
+        for name, new_value, old_value in checks:
+            if not new_value or not old_value:
+                continue
+            change = (new_value - old_value) / old_value
+            marker = "  <-- Verschlechterung" if change > REGRESSION_THRESHOLD else ""
+            lines.append(f"{phase}.{name}: {old_value} -> {new_value} ({change:+.0%}){marker}")
+    return lines
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="End-to-End-Benchmark mit synthetischem Korpus")
+    arg_parser.add_argument("--documents", type=int, default=10, help="Anzahl Dokumente")
+    arg_parser.add_argument("--pages", type=int, default=6, help="Seiten pro Dokument")
+    arg_parser.add_argument("--kind", choices=KINDS, default="text", help="Art der Seiten")
+    arg_parser.add_argument("--target-mb", type=float, default=None, help="Ungefähre Größe pro Dokument in MB")
+    arg_parser.add_argument("--split-latency", type=float, default=0.0, help="Simulierte Split-Latenz pro Seite")
+    arg_parser.add_argument("--parse-latency", type=float, default=0.0, help="Simulierte Parse-Latenz pro Seite")
+    arg_parser.add_argument("--optimize-images", action="store_true", help="Bilder vor dem Upload neu komprimieren")
+    arg_parser.add_argument("--api-rounds", type=int, default=50, help="Anzahl Durchgänge über die API-Endpunkte")
+    arg_parser.add_argument("--output", type=Path, default=None, help="Pfad des JSON-Berichts")
+    arg_parser.add_argument("--compare", type=Path, default=None, help="Früheren Bericht zum Vergleich")
+    arg_parser.add_argument("--keep-data", action="store_true", help="Temporären Datenordner nicht löschen")
+    args = arg_parser.parse_args()
+
+    data_dir = Path(tempfile.mkdtemp(prefix="flatscouts_bench_"))
+    # Muss vor dem Import der App-Module gesetzt sein
+    os.environ["FLATSCOUTS_DATA_DIR"] = str(data_dir)
+    log_file = data_dir / "benchmark.log"
+    stub_process = None
+    report = None
+
+    try:
+        print(f"Erzeuge Korpus in {data_dir}...", flush=True)
+        corpus_started = time.perf_counter()
+        corpus = generate_corpus(data_dir, args.documents, args.pages, args.kind, args.target_mb)
+        corpus_seconds = time.perf_counter() - corpus_started
+        total_pages = sum(doc["pages"] for doc in corpus)
+        total_mb = sum(doc["size_bytes"] for doc in corpus) / 1024 / 1024
+        print(f"  {len(corpus)} Dokument(e), {total_pages} Seiten, {total_mb:.1f} MB in {corpus_seconds:.1f}s", flush=True)
+
+        import split_document
+        import parse_segments
+
+        stub_process, base_url = start_split_service_process(per_page_latency=args.split_latency)
+        split_config = split_document.SplitConfig(
+            data_dir=data_dir,
+            log_dir=data_dir / "logs",
+            base_url=base_url,
+            api_key="stub",
+            poll_interval=0.05,
+            optimize_images=args.optimize_images
+        )
+        parse_config = parse_segments.ParseConfig(
+            data_dir=data_dir,
+            log_dir=data_dir / "logs",
+            optimize_images=args.optimize_images,
+            parser=StubParser(args.parse_latency)
+        )
+
+        phases = {}
+        print("Starte Phasen...", flush=True)
+        phases["split"] = run_phase("split", len(corpus), total_pages,
+                                    lambda: run_logged(lambda: split_document.run(config=split_config), log_file))
+        phases["parse"] = run_phase("parse", len(corpus), total_pages,
+                                    lambda: run_logged(lambda: parse_segments.run(config=parse_config), log_file))
+        phases["api"] = run_phase("api", len(corpus), total_pages,
+                                  lambda: serve_api(corpus, args.api_rounds, log_file))
+
+        report = {
+            "created_at": time.time(),
+            "git_revision": git_revision(),
+            "python": sys.version.split()[0],
+            "corpus": {
+                "documents": len(corpus),
+                "pages": total_pages,
+                "kind": args.kind,
+                "size_mb": round(total_mb, 1),
+                "generation_seconds": round(corpus_seconds, 3),
+            },
+            "settings": {
+                "split_latency": args.split_latency,
+                "parse_latency": args.parse_latency,
+                "api_rounds": args.api_rounds,
+                "optimize_images": args.optimize_images,
+            },
+            "phases": phases,
+        }
+    finally:
+        if stub_process is not None:
+            stub_process.terminate()
+            stub_process.wait()
+        if args.keep_data:
+            print(f"Datenordner behalten: {data_dir}")
+        else:
+            shutil.rmtree(data_dir, ignore_errors=True)
+
+    if report is None:
+        # Lauf ohne Bericht abgebrochen - nichts zu speichern oder zu vergleichen
+        return
+
+    output = args.output or REPO_DIR / "logs" / f"benchmark_{int(report['created_at'])}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"Bericht gespeichert in: {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            previous = json.load(f)
+        print(f"\nVergleich mit {args.compare} (Revision {previous.get('git_revision')}):")
+        for line in compare_reports(previous, report):
+            print(f"  {line}")
+
+
+if __name__ == "__main__":
+    main()
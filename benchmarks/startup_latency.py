@@ -0,0 +1,76 @@
+"""
+Startlatenz von split_document.py und parse_segments.py.
+
+Misst in frischen Interpreterprozessen (Median über mehrere Läufe):
+- import: reines Importieren des Moduls (soll ohne Seiteneffekte und schnell sein)
+- help: Skriptaufruf mit --help (Interpreterstart + Import + Argumente)
+- first_run: Import + erster Zugriff auf die schweren Abhängigkeiten (fitz, requests, LlamaParse)
+
+Als Basis dient ein leerer Interpreterstart (python -c pass), der von allen Werten abgezogen wird.
+
+Beispiel:
+    python benchmarks/startup_latency.py --runs 7
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+
+# Code, der im frischen Prozess ausgeführt wird
+SCENARIOS = {
+    "split_document": {
+        "import": "import split_document",
+        "help": [str(REPO_DIR / "split_document.py"), "--help"],
+        "first_run": "import split_document; import fitz, requests",
+    },
+    "parse_segments": {
+        "import": "import parse_segments",
+        "help": [str(REPO_DIR / "parse_segments.py"), "--help"],
+        "first_run": "import parse_segments; parse_segments.get_parser(parse_segments.ParseConfig(api_key='stub', optimize_images=False))",
+    },
+}
+
+
+def measure(command: list, runs: int) -> float:
+    """Median der Laufzeit eines Prozesses in Sekunden"""
+    durations = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        subprocess.run(command, cwd=REPO_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        durations.append(time.perf_counter() - started)
+    return statistics.median(durations)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Startlatenz der Verarbeitungsskripte messen")
+    arg_parser.add_argument("--runs", type=int, default=5, help="Läufe pro Messung (Median)")
+    arg_parser.add_argument("--output", type=Path, default=None, help="Ergebnis zusätzlich als JSON speichern")
+    args = arg_parser.parse_args()
+
+    baseline = measure([sys.executable, "-c", "pass"], args.runs)
+    print(f"Interpreterstart: {baseline * 1000:.0f} ms (wird abgezogen)")
+
+    results = {"baseline_ms": round(baseline * 1000, 1), "runs": args.runs, "scripts": {}}
+    for script, scenarios in SCENARIOS.items():
+        script_results = {}
+        for name, code in scenarios.items():
+            command = [sys.executable] + (code if isinstance(code, list) else ["-c", code])
+            duration = measure(command, args.runs) - baseline
+            script_results[f"{name}_ms"] = round(duration * 1000, 1)
+        results["scripts"][script] = script_results
+        print(f"{script}: " + ", ".join(f"{name} {value:.0f} ms" for name, value in script_results.items()))
+
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Gespeichert in: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
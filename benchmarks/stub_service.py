@@ -0,0 +1,221 @@
+"""
+Lokaler Stub für die LlamaCloud-APIs, damit Benchmarks ohne Netzwerk und ohne Kosten laufen.
+
+- StubSplitService: HTTP-Server mit /files und /beta/split/jobs wie von split_document.py genutzt
+- StubParser: Ersatz für den LlamaParse-Client in parse_segments.py (parse() mit .pages)
+
+Als eigener Prozess (damit sein Speicher nicht in die Messung einfliesst):
+    python benchmarks/stub_service.py --per-page-latency 0.01
+"""
+import argparse
+import itertools
+import json
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import fitz  # PyMuPDF
+
+CATEGORIES = ("Mietvertrag", "Rechnung", "Bewerbung", "Übergabeprotokoll")
+
+
+def fake_segments(page_count: int, pages_per_segment: int = 3) -> list:
+    """Teilt die Seiten in gleich große Segmente mit wechselnden Kategorien"""
+    segments = []
+    for index, start in enumerate(range(1, page_count + 1, pages_per_segment)):
+        end = min(start + pages_per_segment - 1, page_count)
+        segments.append({
+            "category": CATEGORIES[index % len(CATEGORIES)],
+            "pages": list(range(start, end + 1)),
+            "confidence_category": "high"
+        })
+    return segments
+
+
+class StubSplitService:
+    """
+    Simuliert die Split-API. Jobs sind nach base_latency + per_page_latency * Seiten fertig.
+
+    Verwendung:
+        with StubSplitService(per_page_latency=0.01) as service:
+            config = split_document.SplitConfig(base_url=service.base_url, api_key="stub")
+    """
+
+    def __init__(self, base_latency: float = 0.05, per_page_latency: float = 0.0, pages_per_segment: int = 3):
+        self.base_latency = base_latency
+        self.per_page_latency = per_page_latency
+        self.pages_per_segment = pages_per_segment
+        self.files = {}
+        self.jobs = {}
+        self.request_count = 0
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def start(self):
+        service = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                with service._lock:
+                    service.request_count += 1
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+                if self.path.endswith("/files"):
+                    self._send(200, {"id": service._register_file(body)})
+                elif self.path.endswith("/beta/split/jobs"):
+                    file_id = json.loads(body)["document_input"]["value"]
+                    self._send(200, {"id": service._create_job(file_id)})
+                else:
+                    self._send(404, {"detail": "Not found"})
+
+            def do_GET(self):
+                with service._lock:
+                    service.request_count += 1
+                prefix = "/api/v1/beta/split/jobs/"
+                if self.path.startswith(prefix):
+                    job = service._job_status(self.path[len(prefix):])
+                    self._send(200 if job else 404, job or {"detail": "Not found"})
+                else:
+                    self._send(404, {"detail": "Not found"})
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-split", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _register_file(self, body: bytes) -> str:
+        """Liest die Seitenzahl des hochgeladenen PDFs aus dem Multipart-Body"""
+        start = body.find(b"%PDF")
+        end = body.rfind(b"%%EOF")
+        page_count = 1
+        if start != -1 and end != -1:
+            with fitz.open(stream=body[start:end + 5], filetype="pdf") as doc:
+                page_count = len(doc)
+        with self._lock:
+            file_id = f"file-{next(self._ids)}"
+            self.files[file_id] = page_count
+        return file_id
+
+    def _create_job(self, file_id: str) -> str:
+        with self._lock:
+            page_count = self.files.get(file_id, 1)
+            job_id = f"job-{next(self._ids)}"
+            self.jobs[job_id] = {
+                "ready_at": time.time() + self.base_latency + self.per_page_latency * page_count,
+                "page_count": page_count
+            }
+        return job_id
+
+    def _job_status(self, job_id: str):
+        with self._lock:
+            job = self.jobs.get(job_id)
+        if job is None:
+            return None
+        if time.time() < job["ready_at"]:
+            return {"id": job_id, "status": "processing"}
+        return {
+            "id": job_id,
+            "status": "completed",
+            "result": {"segments": fake_segments(job["page_count"], self.pages_per_segment)}
+        }
+
+
+class _StubPage:
+    def __init__(self, text: str, md: str):
+        self.text = text
+        self.md = md
+
+
+class _StubResult:
+    def __init__(self, pages):
+        self.pages = pages
+
+
+class StubParser:
+    """
+    Ersatz für LlamaParse: liefert die Textebene jeder Seite als Text und Markdown.
+    Optional wird pro Seite eine Latenz simuliert.
+    """
+
+    def __init__(self, per_page_latency: float = 0.0):
+        self.per_page_latency = per_page_latency
+        self.calls = 0
+
+    def parse(self, path: str):
+        self.calls += 1
+        pages = []
+        with fitz.open(path) as doc:
+            for page in doc:
+                text = page.get_text()
+                pages.append(_StubPage(text, f"## Seite {page.number + 1}\n\n{text}"))
+        if self.per_page_latency:
+            time.sleep(self.per_page_latency * len(pages))
+        return _StubResult(pages)
+
+
+def start_split_service_process(base_latency: float = 0.05, per_page_latency: float = 0.0):
+    """
+    Startet den Split-Stub als separaten Prozess.
+
+    Returns:
+        Tuple (Prozess, Basis-URL)
+    """
+    process = subprocess.Popen(
+        [sys.executable, __file__, "--base-latency", str(base_latency), "--per-page-latency", str(per_page_latency)],
+        stdout=subprocess.PIPE,
+        text=True
+    )
+    # Andere Ausgaben (z.B. Warnungen beim Import) bis zur READY-Zeile überspringen
+    for line in process.stdout:
+        if line.startswith("READY "):
+            return process, line.strip().split(" ", 1)[1]
+    process.kill()
+    raise RuntimeError("Stub-Dienst konnte nicht gestartet werden")
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Stub für die Llama-Split-API")
+    arg_parser.add_argument("--base-latency", type=float, default=0.05, help="Grundlatenz pro Job (Sekunden)")
+    arg_parser.add_argument("--per-page-latency", type=float, default=0.0, help="Zusätzliche Latenz pro Seite")
+    args = arg_parser.parse_args()
+
+    service = StubSplitService(args.base_latency, args.per_page_latency).start()
+    print(f"READY {service.base_url}", flush=True)
+    try:
+        service._thread.join()
+    except KeyboardInterrupt:
+        service.stop()
+
+
+if __name__ == "__main__":
+    main()
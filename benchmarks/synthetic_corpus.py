@@ -0,0 +1,121 @@
+"""
+Erzeugt synthetische PDF-Korpora für Benchmarks.
+
+Beispiele:
+    python benchmarks/synthetic_corpus.py out/ --documents 20 --pages 10
+    python benchmarks/synthetic_corpus.py out/ --documents 2 --pages 400 --kind image --target-mb 300
+"""
+import argparse
+import random
+from pathlib import Path
+import fitz  # PyMuPDF
+
+# Wortschatz für deutschsprachige Textseiten (angelehnt an die realen Kategorien)
+WORDS = (
+    "Mietvertrag Mieter Vermieter Wohnung Zimmer Nebenkosten Heizkosten Betriebskosten Kaution "
+    "Rechnung Betrag Zahlung fällig IBAN Konto Datum Übergabeprotokoll Schlüssel Zustand Mängel "
+    "Küche Bad Balkon Keller Bewerbung Einkommen Arbeitgeber Referenz Strasse Hausnummer Ort "
+    "Postleitzahl Monat Jahr Vertragsbeginn Kündigung Frist Unterschrift CHF EUR gemäss vereinbart"
+).split()
+
+KINDS = ("text", "image", "mixed")
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842  # A4 in Punkt
+
+
+def _text_page(doc, rng: random.Random, page_num: int, title: str):
+    """Seite mit Textebene (Überschrift, Absätze und eine kleine Tabelle)"""
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    page.insert_text((50, 60), f"{title} - Seite {page_num}", fontsize=16)
+    y = 100
+    for _ in range(12):
+        line = " ".join(rng.choice(WORDS) for _ in range(12))
+        page.insert_text((50, y), line, fontsize=10)
+        y += 18
+    y += 10
+    for row in range(6):
+        cells = [f"Position {row + 1}", f"{rng.randint(10, 5000)}.{rng.randint(0, 99):02d} CHF", f"{rng.randint(1, 28):02d}.{rng.randint(1, 12):02d}.2024"]
+        for col, cell in enumerate(cells):
+            page.insert_text((50 + col * 170, y), cell, fontsize=10)
+        y += 16
+
+
+def _image_page(doc, rng: random.Random, image_edge: int):
+    """Reine Bildseite ohne Textebene (simuliert einen Scan). Rauschen ist kaum komprimierbar."""
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    samples = rng.randbytes(image_edge * image_edge * 3)
+    pix = fitz.Pixmap(fitz.csRGB, image_edge, image_edge, samples, False)
+    page.insert_image(page.rect, pixmap=pix)
+
+
+def image_edge_for_target(target_mb: float, pages: int, image_ratio: float) -> int:
+    """Kantenlänge der Rauschbilder, damit das Dokument ungefähr target_mb groß wird"""
+    image_pages = max(1, round(pages * image_ratio))
+    bytes_per_image = target_mb * 1024 * 1024 / image_pages
+    return max(16, int((bytes_per_image / 3) ** 0.5))
+
+
+def generate_document(path: Path, pages: int, kind: str = "text", target_mb: float = None,
+                      image_edge: int = 600, seed: int = 0) -> dict:
+    """
+    Erzeugt ein PDF mit der angegebenen Seitenanzahl.
+
+    Args:
+        path: Zielpfad
+        pages: Anzahl Seiten
+        kind: "text" (nur Textebene), "image" (nur Bilder) oder "mixed" (abwechselnd)
+        target_mb: Ungefähre Zielgröße; bestimmt die Bildgröße bei Bildseiten
+        image_edge: Kantenlänge der Bilder in Pixel, falls keine Zielgröße angegeben ist
+        seed: Startwert für reproduzierbare Inhalte
+
+    Returns:
+        Beschreibung des erzeugten Dokuments (Pfad, Seiten, Art, Größe)
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unbekannte Art: {kind}")
+    rng = random.Random(seed)
+    image_ratio = {"text": 0.0, "image": 1.0, "mixed": 0.5}[kind]
+    if target_mb and image_ratio:
+        image_edge = image_edge_for_target(target_mb, pages, image_ratio)
+
+    title = rng.choice(["Mietvertrag", "Rechnung", "Bewerbung", "Übergabeprotokoll"])
+    doc = fitz.open()
+    for page_num in range(1, pages + 1):
+        use_image = kind == "image" or (kind == "mixed" and page_num % 2 == 0)
+        if use_image:
+            _image_page(doc, rng, image_edge)
+        else:
+            _text_page(doc, rng, page_num, title)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    doc.save(str(path), garbage=1, deflate=True)
+    doc.close()
+    return {"path": str(path), "pages": pages, "kind": kind, "size_bytes": path.stat().st_size}
+
+
+def generate_corpus(out_dir: Path, documents: int, pages: int, kind: str = "text",
+                    target_mb: float = None, seed: int = 0) -> list:
+    """Erzeugt mehrere Dokumente im Zielordner und gibt ihre Beschreibungen zurück"""
+    out_dir = Path(out_dir)
+    corpus = []
+    for index in range(documents):
+        path = out_dir / f"synthetic_{kind}_{index + 1:04d}.pdf"
+        corpus.append(generate_document(path, pages, kind, target_mb, seed=seed + index))
+    return corpus
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Synthetisches PDF-Korpus erzeugen")
+    arg_parser.add_argument("out_dir", type=Path, help="Zielordner")
+    arg_parser.add_argument("--documents", type=int, default=10, help="Anzahl Dokumente")
+    arg_parser.add_argument("--pages", type=int, default=5, help="Seiten pro Dokument")
+    arg_parser.add_argument("--kind", choices=KINDS, default="text", help="Art der Seiten")
+    arg_parser.add_argument("--target-mb", type=float, default=None, help="Ungefähre Größe pro Dokument in MB")
+    arg_parser.add_argument("--seed", type=int, default=0, help="Startwert für reproduzierbare Inhalte")
+    args = arg_parser.parse_args()
+
+    corpus = generate_corpus(args.out_dir, args.documents, args.pages, args.kind, args.target_mb, args.seed)
+    total_mb = sum(doc["size_bytes"] for doc in corpus) / 1024 / 1024
+    print(f"{len(corpus)} Dokument(e) erzeugt in {args.out_dir} ({total_mb:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
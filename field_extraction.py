@@ -0,0 +1,442 @@
+"""
+Lokale Extraktion strukturierter Felder aus dem geparsten Markdown (ohne LLM).
+
+Erkennt mit vorkompilierten regulären Ausdrücken und Markdown-Tabellen:
+- Beträge (CHF/EUR, Schweizer und deutsche Schreibweise), IBAN mit Prüfsumme,
+  Daten (12.05.2024, 1. Mai 2024, 2024-05-01) und Adressen (Strasse Nr., PLZ Ort)
+- beschriftete Felder pro Kategorie, z.B. Nettomiete, Nebenkosten, Kaution, Mietbeginn
+  (Mietvertrag) oder Rechnungsbetrag und Fälligkeit (Rechnung)
+- Positionen aus Tabellen (Nebenkosten-Positionen, Rechnungspositionen)
+
+Jeder Wert enthält die Fundstelle (start/end) im Markdown des Segments. Alle Segmente
+werden in einem Durchlauf verarbeitet und nach data/extracted_fields.json geschrieben:
+
+    python field_extraction.py                                # aus dem Ergebnis-Speicher
+    python field_extraction.py --input parsed_segments.json   # aus einer exportierten Datei
+"""
+import argparse
+import datetime
+import json
+import os
+import re
+import time
+from pathlib import Path
+
+# Konfiguration
+DATA_DIR = Path(os.environ.get("FLATSCOUTS_DATA_DIR", Path(__file__).parent / "data"))
+OUTPUT_FILE = DATA_DIR / "extracted_fields.json"
+
+LABEL_WINDOW = 100  # Zeichen nach einer Beschriftung, in denen der Wert gesucht wird
+
+# ----------------------------------------------------------------------
+# Reguläre Ausdrücke
+# ----------------------------------------------------------------------
+
+_CURRENCY = r"(?:CHF|SFr\.?|Fr\.|Franken|EUR|Euro|€)"
+# Die Vorausschau (?=...) am Anfang jedes Musters verwirft unpassende Positionen, bevor die
+# Alternativen probiert werden (entscheidend für den Durchsatz bei tausenden Segmenten).
+
+# 1'850.00, 1’850.–, 1.850,00, 1,850.00, 1 850.00, 1850.-, 1850
+_NUMBER = r"\d{1,3}(?:['’. ]\d{3})+(?:[.,](?:\d{1,2}|-{1,2}|–))?|\d+(?:[.,](?:\d{1,2}|-{1,2}|–))?"
+AMOUNT_RE = re.compile(
+    rf"(?<![\w.,'’])(?=[CSFE€\d])(?:(?P<currency>{_CURRENCY})\s?(?P<number>{_NUMBER})"
+    rf"|(?P<number_before>{_NUMBER})\s?(?P<currency_after>{_CURRENCY}))"
+)
+# Betrag ohne Währung (z.B. in Tabellen mit Währung in der Kopfzeile): nur mit Nachkommastellen
+BARE_AMOUNT_RE = re.compile(
+    r"(?<![\w.,'’])(?=\d)(?:\d{1,3}(?:['’.]\d{3})*[.,](?:\d{2}|-{1,2}|–)|\d+[.,]\d{2})(?![\d.,])"
+)
+
+IBAN_RE = re.compile(r"\b(?=[A-Z]{2}\d)[A-Z]{2}\d{2}(?: ?[A-Z0-9]{4}){2,7}(?: ?[A-Z0-9]{1,4})?\b")
+IBAN_LENGTHS = {
+    "CH": 21, "LI": 21, "DE": 22, "AT": 20, "FR": 27, "IT": 27, "NL": 18, "BE": 16,
+    "LU": 20, "ES": 24, "GB": 22, "PL": 28, "DK": 18,
+}
+
+MONTHS = {
+    "januar": 1, "jänner": 1, "februar": 2, "märz": 3, "maerz": 3, "april": 4, "mai": 5, "juni": 6,
+    "juli": 7, "august": 8, "september": 9, "oktober": 10, "november": 11, "dezember": 12,
+}
+DATE_RE = re.compile(
+    r"(?<![\d.])(?=\d)(?:(?P<day>\d{1,2})\.\s?(?P<month>\d{1,2})\.\s?(?P<year>(?:19|20)?\d{2})(?![\d])"
+    rf"|(?P<day_named>\d{{1,2}})\.\s?(?P<month_name>(?i:{'|'.join(MONTHS)}))\s+(?P<year_named>(?:19|20)\d{{2}})\b"
+    r"|(?P<iso_year>(?:19|20)\d{2})-(?P<iso_month>\d{2})-(?P<iso_day>\d{2})\b)"
+)
+
+_STREET = (
+    r"[A-ZÄÖÜ][\w.\-]*(?:strasse|straße|str\.|weg|gasse|platz|allee|ring|rain|quai|damm)"
+    r"|[A-ZÄÖÜ][\w\-]+ (?:Strasse|Straße|Str\.|Weg|Gasse|Platz|Allee|Ring)"
+)
+ADDRESS_RE = re.compile(
+    rf"(?<![\w])(?P<street>{_STREET})\s+(?P<number>\d{{1,4}}[a-zA-Z]?)\b[,\s]+"
+    r"(?P<zip>(?:CH-|D-|A-)?\d{4,5})\s+(?P<city>[A-ZÄÖÜ][\w\-]*\.?(?:(?<=\.) [A-ZÄÖÜ][\w\-]+)?)"
+)
+# Hausnummer gefolgt von PLZ und Ort: nur davor wird nach der Strasse gesucht
+ADDRESS_HINT_RE = re.compile(r"(?<![\w])(?=\d)\d{1,4}[a-zA-Z]?[,\s]+(?:CH-|D-|A-)?\d{4,5}\s+[A-ZÄÖÜ]")
+ADDRESS_LOOKBEHIND = 60  # Maximale Länge von Strassenname und Abstand vor der Hausnummer
+
+# Beschriftete Beträge und Daten (Reihenfolge: spezifischere Beschriftungen zuerst)
+AMOUNT_LABELS = {
+    "rent_net": r"Nettomiete|Netto-?Mietzins|Mietzins netto|Grundmiete|Kaltmiete",
+    "nebenkosten": r"Akonto Nebenkosten|Nebenkosten(?:-?akonto|-?pauschale|vorauszahlung)?|Heiz- und Nebenkosten"
+                   r"|Betriebskosten(?:vorauszahlung)?",
+    "rent_gross": r"Bruttomiete|Brutto-?Mietzins|Mietzins brutto|Gesamtmiete|Warmmiete|Monatsmiete|Mietzins",
+    "deposit": r"Mietkaution|Kaution|Mietzinsdepot|Sicherheitsleistung|Depot",
+    "total": r"Gesamtbetrag|Rechnungsbetrag|Totalbetrag|Total|Zu zahlen|Zahlbetrag|Endbetrag",
+    "income": r"Nettoeinkommen|Bruttoeinkommen|Jahreseinkommen|Monatseinkommen|Einkommen|Jahreslohn|Monatslohn"
+              r"|Gehalt|Lohn",
+}
+DATE_LABELS = {
+    "start_date": r"Mietbeginn|Vertragsbeginn|Beginn des Mietverhältnisses|Mietantritt|Einzugsdatum",
+    "end_date": r"Vertragsende|Mietende|Auszugsdatum|Kündigung per",
+    "due_date": r"zahlbar bis|fällig am|fällig bis|Fälligkeit|Zahlungsfrist",
+    "invoice_date": r"Rechnungsdatum",
+    "handover_date": r"Übergabedatum|Wohnungsübergabe|Übergabe am|Abnahme am",
+}
+
+
+def _label_re(labels: dict) -> re.Pattern:
+    """
+    Eine Gruppe pro Feld, für kleingeschriebenen Text (etwa doppelt so schnell wie
+    re.IGNORECASE); Vorausschau auf die Anfangsbuchstaben aller Beschriftungen
+    """
+    first = "".join(sorted({alternative[0].lower() for pattern in labels.values()
+                            for alternative in pattern.split("|") if alternative[:1].isalpha()}))
+    groups = "|".join(rf"(?P<{name}>{pattern.lower()})" for name, pattern in labels.items())
+    return re.compile(rf"\b(?=[{first}])(?:{groups})\b")
+
+
+# Ein Durchlauf für Betrags- und Datumsbeschriftungen
+LABEL_RE = _label_re({**AMOUNT_LABELS, **DATE_LABELS})
+
+NEBENKOSTEN_CONTEXT_RE = re.compile(r"Nebenkosten|Betriebskosten|Heizkosten|Kostenart", re.IGNORECASE)
+NEBENKOSTEN_ITEM_RE = re.compile(
+    r"Heiz|Warmwasser|Wasser|Abwasser|Kehricht|Müll|Abfall|Hauswart|Treppenhaus|Lift|Aufzug|Strom|Garten"
+    r"|Versicherung|Grundsteuer|Kabel|Reinigung|Verwaltung|Schornstein|Kaminfeger|Nebenkosten|Betriebskosten",
+    re.IGNORECASE
+)
+TABLE_SEPARATOR_RE = re.compile(r"^\|?\s*:?-{3,}")
+LINE_RE = re.compile(r"^.*$", re.MULTILINE)
+
+# Felder pro Kategorie (zusätzlich zu den allgemeinen Listen amounts, ibans, dates, addresses)
+CATEGORY_FIELDS = {
+    "Mietvertrag": ("rent_net", "nebenkosten", "rent_gross", "deposit", "start_date", "end_date",
+                    "address", "iban", "nebenkosten_items"),
+    "Rechnung": ("total", "due_date", "invoice_date", "iban", "address", "line_items", "nebenkosten_items"),
+    "Übergabeprotokoll": ("handover_date", "address"),
+    "Bewerbung": ("income", "address"),
+}
+DEFAULT_FIELDS = ("total", "iban", "address")
+
+# ----------------------------------------------------------------------
+# Einzelne Werte
+# ----------------------------------------------------------------------
+
+
+def parse_number(raw: str) -> float:
+    """Zahl aus Schweizer/deutscher/englischer Schreibweise (1'850.–, 1.850,00, 1,850.00)"""
+    number = raw.replace("'", "").replace("’", "").replace(" ", "").rstrip("-–").rstrip(".,")
+    if "," in number and "." in number:
+        if number.rfind(",") > number.rfind("."):
+            number = number.replace(".", "").replace(",", ".")
+        else:
+            number = number.replace(",", "")
+    elif "," in number or "." in number:
+        separator = "," if "," in number else "."
+        head, _, tail = number.rpartition(separator)
+        if len(tail) == 3 and head:
+            # Tausendertrennzeichen (1.850 bzw. 1,850)
+            number = head.replace(separator, "") + tail
+        else:
+            number = head.replace(separator, "") + "." + tail
+    return round(float(number), 2)
+
+
+def _currency(raw: str) -> str:
+    return "EUR" if raw in ("EUR", "Euro", "€") else "CHF"
+
+
+def _amount(match: re.Match, offset: int = 0) -> dict:
+    if match.re is BARE_AMOUNT_RE:
+        raw_number, currency = match.group(0), None
+    else:
+        raw_number = match.group("number") or match.group("number_before")
+        currency = _currency(match.group("currency") or match.group("currency_after"))
+    return {
+        "value": parse_number(raw_number),
+        "currency": currency,
+        "raw": match.group(0),
+        "start": match.start() + offset,
+        "end": match.end() + offset,
+    }
+
+
+def _date(match: re.Match):
+    """ISO-Datum eines Treffers von DATE_RE oder None, falls es kein gültiges Datum ist"""
+    try:
+        if match.group("day"):
+            year = int(match.group("year"))
+            year += 2000 if year < 100 else 0
+            value = datetime.date(year, int(match.group("month")), int(match.group("day")))
+        elif match.group("day_named"):
+            value = datetime.date(int(match.group("year_named")), MONTHS[match.group("month_name").lower()],
+                                  int(match.group("day_named")))
+        else:
+            value = datetime.date(int(match.group("iso_year")), int(match.group("iso_month")),
+                                  int(match.group("iso_day")))
+    except ValueError:
+        return None
+    return {"value": value.isoformat(), "raw": match.group(0), "start": match.start(), "end": match.end()}
+
+
+def iban_valid(iban: str) -> bool:
+    """Prüfziffer nach ISO 13616 (Modulo 97)"""
+    if not 15 <= len(iban) <= 34:
+        return False
+    rearranged = iban[4:] + iban[:4]
+    return int("".join(str(int(char, 36)) for char in rearranged)) % 97 == 1
+
+
+def _iban(match: re.Match):
+    raw = match.group(0)
+    compact = raw.replace(" ", "")
+    length = IBAN_LENGTHS.get(compact[:2], len(compact))
+    if len(compact) < length:
+        return None
+    compact = compact[:length]
+    # Ende der Fundstelle nach der erwarteten Länge (nachfolgende Zeichen gehören nicht dazu)
+    end = match.start()
+    seen = 0
+    while seen < length:
+        seen += raw[end - match.start()] != " "
+        end += 1
+    if not iban_valid(compact):
+        return None
+    return {"value": compact, "country": compact[:2], "raw": raw[:end - match.start()],
+            "start": match.start(), "end": end}
+
+
+def _address(match: re.Match) -> dict:
+    return {
+        "value": {
+            "street": match.group("street"),
+            "number": match.group("number"),
+            "zip": re.sub(r"^[A-Z]-", "", match.group("zip")),
+            "city": match.group("city"),
+        },
+        "raw": match.group(0),
+        "start": match.start(),
+        "end": match.end(),
+    }
+
+
+def _addresses(content: str) -> list:
+    addresses = []
+    searched_until = 0
+    for hint in ADDRESS_HINT_RE.finditer(content):
+        start = max(hint.start() - ADDRESS_LOOKBEHIND, searched_until)
+        match = ADDRESS_RE.search(content, start, hint.end() + ADDRESS_LOOKBEHIND)
+        if match and match.end() > searched_until:
+            addresses.append(_address(match))
+            searched_until = match.end()
+    return addresses
+
+
+def _lowercase(content: str) -> str:
+    """Kleinschreibung mit unveränderten Positionen (z.B. "İ" wird sonst zu zwei Zeichen)"""
+    lowered = content.lower()
+    if len(lowered) != len(content):
+        lowered = "".join(char.lower()[:1] for char in content)
+    return lowered
+
+
+def _labelled(content: str, wanted: set) -> dict:
+    """Erster Wert nach den gesuchten Beschriftungen (gleiche Zeile, höchstens LABEL_WINDOW Zeichen)"""
+    found = {}
+    for label in LABEL_RE.finditer(_lowercase(content)):
+        name = label.lastgroup
+        if name not in wanted or name in found:
+            continue
+        line_end = content.find("\n", label.end())
+        window_end = min(label.end() + LABEL_WINDOW, len(content) if line_end < 0 else line_end)
+        value_of = _amount_after if name in AMOUNT_LABELS else _date_after
+        value = value_of(content, label.end(), window_end)
+        if value is not None:
+            found[name] = {**value, "label": content[label.start():label.end()], "label_start": label.start()}
+            if len(found) == len(wanted):
+                break
+    return found
+
+
+def _amount_after(content: str, start: int, end: int):
+    match = AMOUNT_RE.search(content, start, end) or BARE_AMOUNT_RE.search(content, start, end)
+    return _amount(match) if match else None
+
+
+def _date_after(content: str, start: int, end: int):
+    for match in DATE_RE.finditer(content, start, end):
+        value = _date(match)
+        if value is not None:
+            return value
+    return None
+
+
+# ----------------------------------------------------------------------
+# Tabellen
+# ----------------------------------------------------------------------
+
+
+def table_items(content: str) -> list:
+    """
+    Zeilen aus Markdown-Tabellen mit Betrag: Bezeichnung, Betrag und Fundstelle der Zeile.
+    "nebenkosten" ist gesetzt, wenn Tabelle (Kopfzeile, Text davor) oder Bezeichnung auf
+    Nebenkosten hindeuten.
+    """
+    items = []
+    table_start = None
+    table_context = False
+    for line in LINE_RE.finditer(content):
+        row = line.group(0).strip()
+        if not (row.startswith("|") and row.endswith("|") and len(row) > 1):
+            table_start = None
+            continue
+        if table_start is None:
+            table_start = line.start()
+            # Kopfzeile und der Text unmittelbar vor der Tabelle
+            table_context = bool(NEBENKOSTEN_CONTEXT_RE.search(content, max(table_start - 200, 0), line.end()))
+            continue
+        if TABLE_SEPARATOR_RE.match(row):
+            continue
+
+        cells = row.strip("|").split("|")
+        amount = None
+        label = None
+        offset = line.start() + line.group(0).index("|") + 1
+        for cell in cells:
+            text = cell.strip()
+            match = AMOUNT_RE.search(cell) or BARE_AMOUNT_RE.search(cell)
+            if match:
+                # Letzter Betrag der Zeile (Spalte Betrag/Total steht meist rechts)
+                amount = _amount(match, offset)
+            elif text and label is None and not text.isdigit():
+                label = text
+            offset += len(cell) + 1
+        if amount is None or label is None:
+            continue
+        items.append({
+            "label": label,
+            "amount": amount,
+            "nebenkosten": table_context or bool(NEBENKOSTEN_ITEM_RE.search(label)),
+            "start": line.start(),
+            "end": line.end(),
+        })
+    return items
+
+
+# ----------------------------------------------------------------------
+# Segmente
+# ----------------------------------------------------------------------
+
+
+def extract_fields(content: str, category: str = None) -> dict:
+    """
+    Extrahiert alle Felder aus dem Markdown (oder Text) eines Segments.
+
+    Returns:
+        Dictionary mit "fields" (Felder der Kategorie, siehe CATEGORY_FIELDS) sowie den
+        allgemeinen Listen "amounts", "ibans", "dates" und "addresses"
+    """
+    wanted = CATEGORY_FIELDS.get(category, DEFAULT_FIELDS)
+    amounts = [_amount(match) for match in AMOUNT_RE.finditer(content)]
+    ibans = [iban for iban in map(_iban, IBAN_RE.finditer(content)) if iban]
+    dates = [date for date in map(_date, DATE_RE.finditer(content)) if date]
+    addresses = _addresses(content)
+    items = table_items(content) if "|" in content and ("line_items" in wanted or "nebenkosten_items" in wanted) else []
+    labels = {name for name in wanted if name in AMOUNT_LABELS or name in DATE_LABELS}
+
+    available = {
+        **(_labelled(content, labels) if labels else {}),
+        "iban": ibans[0] if ibans else None,
+        "address": addresses[0] if addresses else None,
+        "line_items": items,
+        "nebenkosten_items": [item for item in items if item["nebenkosten"]],
+    }
+    fields = {}
+    for name in wanted:
+        value = available.get(name)
+        if value:
+            fields[name] = value
+    return {"fields": fields, "amounts": amounts, "ibans": ibans, "dates": dates, "addresses": addresses}
+
+
+def extract_segment(segment: dict) -> dict:
+    """Felder eines geparsten Segments (Fundstellen beziehen sich auf "source")"""
+    parsed = segment.get("parsed") or {}
+    source = "markdown" if parsed.get("markdown") else "text"
+    result = {
+        "name": segment.get("name"),
+        "category": segment.get("category"),
+        "pages": segment.get("pages") or [],
+        "source": source,
+    }
+    if "error" in parsed:
+        return {**result, "error": parsed["error"]}
+    return {**result, **extract_fields(parsed.get(source) or "", segment.get("category"))}
+
+
+def extract_all(parsed_results: dict) -> dict:
+    """Felder aller Segmente (Dateiname -> Liste pro Segment) in einem Durchlauf"""
+    return {filename: [extract_segment(segment) for segment in segments]
+            for filename, segments in parsed_results.items()}
+
+
+def write_output(results: dict, output_file: Path):
+    output_file = Path(output_file)
+    output_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = output_file.with_name(f"{output_file.name}.{os.getpid()}.tmp")
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    os.replace(temp_file, output_file)
+
+
+def run(data_dir: Path = None, input_file: Path = None, output_file: Path = None) -> dict:
+    """
+    Extrahiert die Felder aller geparsten Segmente und schreibt extracted_fields.json.
+
+    Args:
+        input_file: parsed_segments.json (Standard: Ergebnis-Speicher des Datenordners)
+        output_file: Zieldatei (Standard: extracted_fields.json im Datenordner)
+    """
+    data_dir = Path(data_dir or DATA_DIR)
+    if input_file:
+        with open(input_file, "r", encoding="utf-8") as f:
+            parsed_results = json.load(f)
+    else:
+        from result_store import get_store
+        parsed_results = get_store(data_dir).all_parsed()
+
+    started = time.perf_counter()
+    results = extract_all(parsed_results)
+    seconds = time.perf_counter() - started
+    segments = sum(len(items) for items in results.values())
+
+    output_file = Path(output_file or data_dir / OUTPUT_FILE.name)
+    write_output(results, output_file)
+    rate = segments / seconds if seconds else 0
+    print(f"Felder extrahiert: {segments} Segment(e) in {seconds:.2f} s ({rate:.0f} Segmente/s) -> {output_file}",
+          flush=True)
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Felder (Beträge, IBAN, Daten, Adressen) lokal extrahieren")
+    arg_parser.add_argument("--input", type=Path, default=None,
+                            help="parsed_segments.json statt des Ergebnis-Speichers verwenden")
+    arg_parser.add_argument("--output", type=Path, default=None, help="Zieldatei (Standard: data/extracted_fields.json)")
+    arg_parser.add_argument("--data-dir", type=Path, default=DATA_DIR, help="Datenordner")
+    args = arg_parser.parse_args()
+    run(args.data_dir, args.input, args.output)
+
+
+if __name__ == "__main__":
+    main()
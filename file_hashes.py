@@ -0,0 +1,155 @@
+"""SHA-256-Index der PDFs im data-Ordner zur Erkennung byte-identischer Uploads"""
+import hashlib
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+
+# Konfiguration
+DATA_DIR = Path(os.environ.get("FLATSCOUTS_DATA_DIR", Path(__file__).parent / "data"))
+INDEX_FILE = DATA_DIR / "file_hashes.json"
+CHUNK_SIZE = 1024 * 1024  # 1 MB
+
+_index_lock = threading.Lock()
+
+
+def sha256_file(path: Path) -> str:
+    """Berechnet den SHA-256 einer Datei blockweise"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class UploadStream:
+    """
+    Ziel einer hochgeladenen Datei beim Einlesen des Multipart-Bodies (Werkzeug ruft write()
+    mit jedem empfangenen Block auf). Die Daten landen direkt in einer temporären Datei im
+    Zielordner und werden dabei gehasht - kein zweiter Zwischenspeicher, kein zweites Lesen.
+
+    Wird die Datei nicht mit detach() übernommen, löscht close() (am Ende der Anfrage) sie.
+    """
+
+    def __init__(self, target_dir: Path):
+        target_dir.mkdir(parents=True, exist_ok=True)
+        self.path = target_dir / f".upload_{uuid.uuid4().hex}.part"
+        self._file = open(self.path, "w+b")
+        self._digest = hashlib.sha256()
+        self._kept = False
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self._digest.update(data)
+        self.size += len(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        # read, seek, tell usw. wie bei einer normalen Datei
+        return getattr(self._file, name)
+
+    def detach(self):
+        """
+        Schließt die Datei und übergibt sie dem Aufrufer (wird dann nicht mehr gelöscht).
+
+        Returns:
+            Tuple (temporärer Pfad, SHA-256, Größe in Bytes)
+        """
+        self._file.close()
+        self._kept = True
+        return self.path, self._digest.hexdigest(), self.size
+
+    def close(self):
+        self._file.close()
+        if not self._kept:
+            self.path.unlink(missing_ok=True)
+
+
+def _load_index() -> dict:
+    if INDEX_FILE.exists():
+        try:
+            with open(INDEX_FILE, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Fehler beim Laden des Hash-Index: {e}")
+    return {}
+
+
+def _save_index(index: dict):
+    temp_file = INDEX_FILE.with_name(INDEX_FILE.name + ".tmp")
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=2, ensure_ascii=False)
+    os.replace(temp_file, INDEX_FILE)
+
+
+def _indexed_hash(index: dict, pdf_path: Path) -> str:
+    """Liefert den Hash aus dem Index oder berechnet ihn neu, falls die Datei sich geändert hat"""
+    stat = pdf_path.stat()
+    entry = index.get(pdf_path.name)
+    if entry and entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns:
+        return entry["sha256"]
+    sha256 = sha256_file(pdf_path)
+    index[pdf_path.name] = {"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    return sha256
+
+
+def get_hash(pdf_path: Path) -> str:
+    """SHA-256 eines PDFs im data-Ordner (aus dem Index, falls aktuell)"""
+    with _index_lock:
+        index = _load_index()
+        before = index.get(pdf_path.name)
+        sha256 = _indexed_hash(index, pdf_path)
+        # Nur schreiben, wenn der Eintrag neu berechnet wurde
+        if index.get(pdf_path.name) is not before:
+            _save_index(index)
+        return sha256
+
+
+def find_duplicate(sha256: str, size: int):
+    """
+    Sucht ein byte-identisches PDF im data-Ordner.
+    Nur Dateien gleicher Größe werden (falls nötig) gehasht.
+
+    Returns:
+        Dateiname des vorhandenen PDFs oder None
+    """
+    with _index_lock:
+        index = _load_index()
+        changed = False
+        match = None
+        pdf_files = list(dict.fromkeys(list(DATA_DIR.glob("*.pdf")) + list(DATA_DIR.glob("*.PDF"))))
+        for pdf_file in pdf_files:
+            if pdf_file.stat().st_size != size:
+                continue
+            before = index.get(pdf_file.name)
+            if _indexed_hash(index, pdf_file) == sha256:
+                match = pdf_file.name
+            changed = changed or index.get(pdf_file.name) is not before
+            if match:
+                break
+        # Einträge gelöschter Dateien entfernen
+        for filename in list(index):
+            if not (DATA_DIR / filename).exists():
+                del index[filename]
+                changed = True
+        if changed:
+            _save_index(index)
+        return match
+
+
+def record(pdf_path: Path, sha256: str):
+    """Trägt eine neu gespeicherte Datei in den Index ein"""
+    stat = pdf_path.stat()
+    with _index_lock:
+        index = _load_index()
+        index[pdf_path.name] = {"sha256": sha256, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        _save_index(index)
+
+
+def forget(filename: str):
+    """Entfernt eine gelöschte Datei aus dem Index"""
+    with _index_lock:
+        index = _load_index()
+        if index.pop(filename, None) is not None:
+            _save_index(index)
@@ -0,0 +1,141 @@
+"""ETags, bedingte GET-Anfragen und Kompression für JSON-Antworten der API"""
+import gzip
+import hashlib
+import os
+import threading
+from flask import current_app, make_response, request
+
+# Brotli ist optional - ohne das Paket wird nur gzip angeboten
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Antworten unterhalb dieser Größe werden nicht komprimiert (Bytes)
+COMPRESS_MIN_BYTES = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+_cache_lock = threading.Lock()
+# Cache-Schlüssel -> {"signature", "body", "etag", "encoded": {Kodierung: Bytes}}
+_cache = {}
+
+
+def file_signature(*paths):
+    """
+    Signatur aus Änderungszeit und Größe der angegebenen Dateien bzw. Verzeichnisse.
+    Ändert sich eine Datei, ändert sich die Signatur und der Cache-Eintrag wird neu gebaut.
+    """
+    signature = []
+    for path in paths:
+        try:
+            stat = path.stat()
+            signature.append((str(path), stat.st_mtime_ns, stat.st_size))
+        except OSError:
+            signature.append((str(path), None, None))
+    return tuple(signature)
+
+
+def listing_signature(directory, suffix: str = ".pdf"):
+    """
+    Signatur aus Name, Änderungszeit und Größe aller Dateien mit der Endung (ohne Groß-/Kleinschreibung).
+
+    Anders als file_signature(directory) unabhängig von der mtime des Verzeichnisses, die sich
+    bei jeder SQLite-Verbindung (-wal/-shm) und jedem atomaren Schreiben einer Status-Datei ändert.
+    """
+    signature = []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.name.lower().endswith(suffix) and entry.is_file():
+                    stat = entry.stat()
+                    signature.append((entry.name, stat.st_mtime_ns, stat.st_size))
+    except OSError:
+        pass
+    return tuple(sorted(signature))
+
+
+def _serialize(data) -> bytes:
+    """Serialisiert wie jsonify, damit sich die Antwort inhaltlich nicht ändert"""
+    return current_app.json.dumps(data).encode("utf-8")
+
+
+def _make_entry(body: bytes) -> dict:
+    return {
+        "body": body,
+        "etag": hashlib.sha256(body).hexdigest()[:32],
+        "encoded": {},
+    }
+
+
+def _choose_encoding(body: bytes):
+    """Wählt die Kodierung anhand von Accept-Encoding und Größe der Antwort"""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted["br"]:
+        return "br"
+    if accepted["gzip"]:
+        return "gzip"
+    return None
+
+
+def _encode(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def _build_response(entry: dict, status: int = 200, cache=True):
+    """Erstellt die Antwort inkl. 304-Behandlung und (gecachter) Kompression"""
+    body = entry["body"]
+    encoding = _choose_encoding(body)
+    # Starker Validator pro Repräsentation: komprimierte Varianten sind andere Bytes
+    etag = f"{entry['etag']}-{encoding}" if encoding else entry["etag"]
+    if etag in request.if_none_match:
+        response = make_response("", 304)
+    else:
+        if encoding is not None:
+            encoded = entry["encoded"].get(encoding)
+            if encoded is None:
+                encoded = _encode(body, encoding)
+                if cache:
+                    with _cache_lock:
+                        entry["encoded"][encoding] = encoded
+            body = encoded
+        response = make_response(body, status)
+        response.mimetype = "application/json"
+        if encoding is not None:
+            response.headers['Content-Encoding'] = encoding
+
+    response.set_etag(etag)
+    response.headers['Vary'] = 'Accept-Encoding'
+    # Browser darf speichern, muss aber per If-None-Match revalidieren
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def json_response(data, status: int = 200):
+    """JSON-Antwort mit Inhalts-ETag und Kompression, ohne serverseitigen Cache"""
+    return _build_response(_make_entry(_serialize(data)), status, cache=False)
+
+
+def cached_json_response(cache_key: str, signature, build):
+    """
+    JSON-Antwort, deren serialisierte und komprimierte Varianten gecacht werden,
+    bis sich die Signatur (z.B. file_signature der Quelldateien) ändert.
+
+    Args:
+        cache_key: Eindeutiger Name des Cache-Eintrags
+        signature: Vergleichbarer Wert, der die Quelldaten beschreibt
+        build: Funktion ohne Argumente, die die zu serialisierenden Daten liefert
+    """
+    with _cache_lock:
+        entry = _cache.get(cache_key)
+    if entry is None or entry["signature"] != signature:
+        entry = _make_entry(_serialize(build()))
+        entry["signature"] = signature
+        with _cache_lock:
+            _cache[cache_key] = entry
+    return _build_response(entry)
+
@@ -0,0 +1,346 @@
+"""In-Process-Jobverwaltung für Split- und Parse-Läufe mit persistentem Worker-Prozess"""
+import itertools
+import multiprocessing
+import importlib
+import os
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from pathlib import Path
+import metrics
+
+# Maximale Anzahl abgeschlossener Jobs, die für /api/jobs aufbewahrt werden
+MAX_FINISHED_JOBS = 100
+
+# Intervall, in dem der Dispatcher auf Abbruchwünsche prüft (Sekunden)
+POLL_INTERVAL = 0.5
+
+ACTIVE_STATES = ("queued", "running")
+
+
+def _worker_main(conn, cwd):
+    """
+    Hauptschleife des persistenten Worker-Prozesses.
+
+    Importiert die Skripte als Module und ruft main(argv) auf. Module, schwere
+    Abhängigkeiten wie fitz und llama_cloud_services sowie der LlamaParse-Client bleiben
+    nach dem ersten Lauf geladen, sodass Folgeläufe keinen kalten Start mehr bezahlen.
+    """
+    os.chdir(cwd)
+    os.environ['PYTHONIOENCODING'] = 'utf-8'
+    os.environ['PYTHONUTF8'] = '1'
+    if cwd not in sys.path:
+        sys.path.insert(0, cwd)
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        script_path, argv, stdout_path, stderr_path = task
+        original_stdout, original_stderr, original_argv = sys.stdout, sys.stderr, sys.argv
+        stdout_f = open(stdout_path, "w", encoding="utf-8", buffering=1, errors='replace')
+        stderr_f = open(stderr_path, "w", encoding="utf-8", buffering=1, errors='replace')
+        result = {"success": True, "error": None}
+        # Messwerte pro Lauf sammeln und mit dem Ergebnis an die App übergeben
+        metrics.reset()
+        try:
+            sys.stdout, sys.stderr = stdout_f, stderr_f
+            sys.argv = [script_path] + list(argv)
+            module = importlib.import_module(Path(script_path).stem)
+            module.main(list(argv))
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                result = {"success": False, "error": f"Exit-Code {e.code}"}
+        except BaseException as e:
+            traceback.print_exc()
+            result = {"success": False, "error": str(e)}
+        finally:
+            sys.stdout, sys.stderr, sys.argv = original_stdout, original_stderr, original_argv
+            # Log-Dateien nach jedem Lauf schließen - keine offenen Handles mehr
+            stdout_f.close()
+            stderr_f.close()
+        result["metrics"] = metrics.snapshot()
+        conn.send(result)
+
+
+class Job:
+    """Ein eingereihter oder laufender Split-/Parse-Lauf"""
+
+    def __init__(self, job_id, kind, script_path, args, priority=False):
+        self.id = job_id
+        self.kind = kind
+        self.script_path = script_path
+        self.args = tuple(args)
+        self.priority = priority
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.stdout_file = None
+        self.stderr_file = None
+        self.cancel_requested = False
+
+    @property
+    def key(self):
+        """Schlüssel für die De-Duplizierung gleichzeitiger, identischer Läufe"""
+        return (self.kind, self.args)
+
+    def to_dict(self):
+        """Serialisiert den Job inklusive Zeitmessungen für die API"""
+        now = time.time()
+        wait_end = self.started_at or self.finished_at or now
+        run_seconds = None
+        if self.started_at is not None:
+            run_seconds = round((self.finished_at or now) - self.started_at, 3)
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "args": list(self.args),
+            "priority": self.priority,
+            "status": self.status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "wait_seconds": round(wait_end - self.created_at, 3),
+            "run_seconds": run_seconds,
+            "log_files": [str(f) for f in (self.stdout_file, self.stderr_file) if f],
+        }
+
+
+class JobManager:
+    """
+    Verwaltet eine Warteschlange von Jobs, die nacheinander in einem persistenten
+    Worker-Prozess ausgeführt werden.
+
+    - Identische Jobs (gleiche Art und Argumente), die bereits warten oder laufen,
+      werden nicht erneut eingereiht, sondern der bestehende Job wird zurückgegeben.
+    - Priorisierte Jobs (z.B. frische Uploads) werden vor alle nicht priorisierten
+      wartenden Jobs eingereiht.
+    - Wartende Jobs können abgebrochen werden; laufende Jobs werden durch Beenden des
+      Worker-Prozesses abgebrochen, der beim nächsten Job neu gestartet wird.
+    """
+
+    def __init__(self, base_dir: Path, log_dir: Path, scripts: dict):
+        self.base_dir = Path(base_dir)
+        self.log_dir = Path(log_dir)
+        self.scripts = scripts
+        self._lock = threading.Lock()
+        self._wakeup = threading.Condition(self._lock)
+        self._queue = deque()
+        self._jobs = {}
+        self._finished = deque()
+        self._running = None
+        self._ids = itertools.count(1)
+        self._process = None
+        self._conn = None
+        self._dispatcher = None
+
+    # ------------------------------------------------------------------
+    # Öffentliche API
+    # ------------------------------------------------------------------
+
+    def submit(self, kind, args=(), priority=False):
+        """
+        Reiht einen Job ein.
+
+        Returns:
+            Tuple (job, created) - created ist False, wenn ein identischer Job bereits aktiv ist
+        """
+        if kind not in self.scripts:
+            raise ValueError(f"Unbekannte Job-Art: {kind}")
+
+        with self._lock:
+            for job in self._active_jobs():
+                if job.key == (kind, tuple(args)):
+                    if priority and job.status == "queued" and not job.priority:
+                        # Bereits wartender Job wird nachträglich priorisiert
+                        self._queue.remove(job)
+                        job.priority = True
+                        self._enqueue(job)
+                    return job, False
+
+            job_id = f"{kind}-{int(time.time())}-{next(self._ids)}"
+            job = Job(job_id, kind, str(self.scripts[kind]), args, priority)
+            self._jobs[job_id] = job
+            self._enqueue(job)
+            self._ensure_dispatcher()
+            self._wakeup.notify()
+            return job, True
+
+    def cancel(self, job_id):
+        """
+        Bricht einen wartenden oder laufenden Job ab.
+
+        Returns:
+            True wenn der Job abgebrochen wurde bzw. wird, sonst False
+        """
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.status not in ACTIVE_STATES:
+                return False
+            if job.status == "queued":
+                self._queue.remove(job)
+                job.status = "cancelled"
+                job.finished_at = time.time()
+                self._remember_finished(job)
+            else:
+                job.cancel_requested = True
+            return True
+
+    def get(self, job_id):
+        """Gibt einen Job anhand seiner ID zurück (oder None)"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def is_active(self, kind):
+        """Prüft ob ein Job dieser Art wartet oder läuft"""
+        with self._lock:
+            return any(job.kind == kind for job in self._active_jobs())
+
+    def snapshot(self):
+        """Status für /api/jobs: Warteschlangentiefe, laufender Job und alle bekannten Jobs"""
+        with self._lock:
+            jobs = sorted(self._jobs.values(), key=lambda job: job.created_at, reverse=True)
+            return {
+                "queue_depth": len(self._queue),
+                "running": self._running.id if self._running else None,
+                "worker_pid": self._process.pid if self._process and self._process.is_alive() else None,
+                "jobs": [job.to_dict() for job in jobs],
+            }
+
+    def shutdown(self):
+        """Beendet den Worker-Prozess (z.B. beim Herunterfahren der App)"""
+        with self._lock:
+            self._stop_worker()
+
+    # ------------------------------------------------------------------
+    # Interne Hilfsfunktionen
+    # ------------------------------------------------------------------
+
+    def _active_jobs(self):
+        if self._running is not None:
+            yield self._running
+        yield from self._queue
+
+    def _enqueue(self, job):
+        """Hängt den Job an; priorisierte Jobs hinter die bereits wartenden priorisierten"""
+        if not job.priority:
+            self._queue.append(job)
+            return
+        position = sum(1 for queued in self._queue if queued.priority)
+        self._queue.insert(position, job)
+
+    def _remember_finished(self, job):
+        """Begrenzt die Historie abgeschlossener Jobs (Aufrufer hält den Lock)"""
+        self._finished.append(job)
+        while len(self._finished) > MAX_FINISHED_JOBS:
+            old = self._finished.popleft()
+            self._jobs.pop(old.id, None)
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or not self._dispatcher.is_alive():
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="job-dispatcher", daemon=True)
+            self._dispatcher.start()
+
+    def _ensure_worker(self):
+        """Startet den persistenten Worker-Prozess bei Bedarf (Aufrufer hält den Lock)"""
+        if self._process is not None and self._process.is_alive():
+            return
+        context = multiprocessing.get_context("spawn")
+        parent_conn, child_conn = context.Pipe()
+        self._process = context.Process(
+            target=_worker_main,
+            args=(child_conn, str(self.base_dir)),
+            name="job-worker",
+            daemon=True
+        )
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        print(f"Job-Worker gestartet: PID {self._process.pid}", flush=True)
+
+    def _stop_worker(self):
+        """Beendet den Worker-Prozess hart (Aufrufer hält den Lock)"""
+        if self._process is not None:
+            if self._process.is_alive():
+                self._process.terminate()
+                self._process.join(timeout=5)
+            self._process = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _dispatch_loop(self):
+        """Arbeitet die Warteschlange nacheinander im Worker-Prozess ab"""
+        while True:
+            with self._lock:
+                while not self._queue:
+                    self._wakeup.wait()
+                job = self._queue.popleft()
+                self._running = job
+
+                self.log_dir.mkdir(exist_ok=True)
+                # Job-ID enthält Zeitstempel und laufende Nummer -> eindeutige Log-Dateien
+                log_stem = f"{Path(job.script_path).stem}_{job.id.split('-', 1)[1]}"
+                job.stdout_file = self.log_dir / f"{log_stem}.log"
+                job.stderr_file = self.log_dir / f"{log_stem}_error.log"
+                job.status = "running"
+                job.started_at = time.time()
+
+                try:
+                    self._ensure_worker()
+                    self._conn.send((job.script_path, job.args, str(job.stdout_file), str(job.stderr_file)))
+                    conn = self._conn
+                except Exception as e:
+                    conn = None
+                    job.status = "failed"
+                    job.error = f"Worker konnte nicht gestartet werden: {e}"
+
+            result = self._wait_for_result(job, conn) if conn is not None else None
+
+            with self._lock:
+                if job.status == "running":
+                    if job.cancel_requested:
+                        job.status = "cancelled"
+                    elif result is None:
+                        job.status = "failed"
+                        job.error = job.error or "Worker-Prozess unerwartet beendet"
+                    elif result["success"]:
+                        job.status = "completed"
+                    else:
+                        job.status = "failed"
+                        job.error = result["error"]
+                job.finished_at = time.time()
+                self._running = None
+                self._remember_finished(job)
+
+            if result is not None:
+                metrics.merge(result.get("metrics", []))
+            metrics.observe("job_queue_wait", job.started_at - job.created_at, kind=job.kind)
+            metrics.observe("job_run", job.finished_at - job.started_at, kind=job.kind, status=job.status)
+            print(f"Job {job.id} beendet: {job.status} ({job.finished_at - job.started_at:.1f}s)", flush=True)
+
+    def _wait_for_result(self, job, conn):
+        """Wartet auf das Ergebnis des Workers und reagiert auf Abbruchwünsche"""
+        while True:
+            try:
+                if conn.poll(POLL_INTERVAL):
+                    return conn.recv()
+            except (EOFError, OSError):
+                return None
+            with self._lock:
+                if job.cancel_requested:
+                    # Laufendes Skript lässt sich nur durch Beenden des Workers abbrechen
+                    self._stop_worker()
+                    return None
+                if self._process is None or not self._process.is_alive():
+                    self._stop_worker()
+                    return None
@@ -0,0 +1,95 @@
+"""
+Kompaktes Manifest pro Dokument für das sofortige Layout im Viewer.
+
+Enthält Seitenzahl, Seitengrößen, Textebene pro Seite, die Zuordnung Segment -> Seiten
+und den SHA-256 der Datei. Wird beim Upload und nach dem Split berechnet, im
+Ergebnis-Speicher abgelegt und in /api/documents eingebettet, damit die Oberfläche die
+Struktur kennt, bevor das PDF geladen ist.
+
+Format (Version 1):
+    {
+        "version": 1,
+        "sha256": "...", "size_bytes": 12345, "mtime_ns": ...,
+        "page_count": 12,
+        "page_sizes": [[595.3, 841.9, 10], [841.9, 595.3, 2]],   # Breite, Höhe (pt), Anzahl Seiten
+        "text_layer": "111111111100",                            # 1 = Seite mit Textebene
+        "segments": {"Mietvertrag_1": [1, 2, 3]}
+    }
+"""
+from pathlib import Path
+import file_hashes
+
+VERSION = 1
+
+
+def segment_map(segments) -> dict:
+    """Zuordnung Segmentname -> Seiten"""
+    return {segment.get("name"): segment.get("pages") or [] for segment in segments or []}
+
+
+def is_current(manifest: dict, pdf_path: Path, sha256: str = None) -> bool:
+    """
+    True, wenn das Manifest zur aktuellen Datei gehört (Version, Größe und Änderungszeit,
+    sowie der Hash, falls er bereits bekannt ist)
+    """
+    if not manifest or manifest.get("version") != VERSION:
+        return False
+    if sha256 and manifest.get("sha256") != sha256:
+        return False
+    stat = Path(pdf_path).stat()
+    return manifest.get("size_bytes") == stat.st_size and manifest.get("mtime_ns") == stat.st_mtime_ns
+
+
+def build_manifest(pdf_path: Path, segments=None, sha256: str = None) -> dict:
+    """
+    Berechnet das Manifest eines PDFs.
+
+    Die Textebene wird an den von der Seite genutzten Schriften erkannt (etwa zehnmal
+    schneller als Text zu extrahieren); reine Bildseiten ohne OCR-Ebene haben keine.
+    """
+    import fitz  # PyMuPDF
+
+    pdf_path = Path(pdf_path)
+    stat = pdf_path.stat()
+    page_sizes = []
+    text_layer = []
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            # page.rect berücksichtigt die Drehung der Seite
+            size = [round(page.rect.width, 1), round(page.rect.height, 1)]
+            if page_sizes and page_sizes[-1][:2] == size:
+                page_sizes[-1][2] += 1
+            else:
+                page_sizes.append(size + [1])
+            text_layer.append("1" if page.get_fonts() else "0")
+
+    return {
+        "version": VERSION,
+        "sha256": sha256 or file_hashes.sha256_file(pdf_path),
+        "size_bytes": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+        "page_count": len(text_layer),
+        "page_sizes": page_sizes,
+        "text_layer": "".join(text_layer),
+        "segments": segment_map(segments),
+    }
+
+
+def refresh(store, pdf_path: Path, segments=None, sha256: str = None) -> dict:
+    """
+    Berechnet das Manifest neu (falls die Datei sich geändert hat) und speichert es.
+
+    Args:
+        segments: Aktuelle Split-Segmente (Standard: aus dem Ergebnis-Speicher)
+        sha256: Bereits bekannter Hash der Datei (z.B. vom Upload)
+    """
+    pdf_path = Path(pdf_path)
+    if segments is None:
+        segments = store.get_split(pdf_path.name) or []
+    manifest = store.get_manifest(pdf_path.name)
+    if is_current(manifest, pdf_path, sha256):
+        manifest = {**manifest, "segments": segment_map(segments)}
+    else:
+        manifest = build_manifest(pdf_path, segments, sha256)
+    store.upsert_manifest(pdf_path.name, manifest)
+    return manifest
@@ -0,0 +1,247 @@
+"""
+Zeitmessung pro Verarbeitungsschritt mit Histogrammen.
+
+Messwerte werden pro Schritt (stage) und optionalen Labels wie Kategorie gesammelt, im
+Prometheus-Textformat für /metrics ausgegeben und am Ende eines Split-/Parse-Laufs als
+Zusammenfassung (JSON) geschrieben.
+
+Das Label "document" hat unbegrenzt viele Werte (eines pro hochgeladener Datei). Es wird
+daher nicht Teil der Histogramm-Serien, sondern nur für die Laufzusammenfassung in einer
+begrenzten Tabelle der zuletzt bearbeiteten Dokumente gezählt.
+"""
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+METRIC_NAME = "flatscouts_stage_duration_seconds"
+
+# Bucket-Grenzen in Sekunden - von schnellen Schreibvorgängen bis zu langen API-Wartezeiten
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, math.inf)
+
+# Maximale Anzahl Einzelwerte pro Histogramm für Perzentile in der Laufzusammenfassung
+MAX_SAMPLES = 10000
+# Dokumente mit eigenen Werten in der Laufzusammenfassung (die ältesten werden verdrängt)
+MAX_DOCUMENTS = 500
+
+_lock = threading.Lock()
+_histograms = {}
+_documents = OrderedDict()  # Dokument -> {Schritt: Histogram}, zuletzt genutzte am Ende
+_stage_listeners = []  # z.B. profiling.Profiler: erhält Beginn und Ende jedes timer()-Blocks
+
+
+class Histogram:
+    """Kumulatives Histogramm mit festen Buckets und begrenzter Stichprobe für Perzentile"""
+
+    def __init__(self):
+        self.bucket_counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.sum = 0.0
+        self.samples = []
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for index, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.bucket_counts[index] += 1
+                break
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(value)
+
+    def merge(self, data: dict):
+        self.count += data["count"]
+        self.sum += data["sum"]
+        for index, value in enumerate(data["bucket_counts"]):
+            self.bucket_counts[index] += value
+        room = MAX_SAMPLES - len(self.samples)
+        if room > 0:
+            self.samples.extend(data["samples"][:room])
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "bucket_counts": list(self.bucket_counts),
+            "samples": list(self.samples),
+        }
+
+    def summary(self) -> dict:
+        """Kennzahlen für die Laufzusammenfassung"""
+        ordered = sorted(self.samples)
+        return {
+            "count": self.count,
+            "total_seconds": round(self.sum, 4),
+            "mean_seconds": round(self.sum / self.count, 4) if self.count else None,
+            "p50_seconds": round(percentile(ordered, 50), 4) if ordered else None,
+            "p95_seconds": round(percentile(ordered, 95), 4) if ordered else None,
+            "max_seconds": round(ordered[-1], 4) if ordered else None,
+        }
+
+
+def percentile(ordered: list, pct: float) -> float:
+    """Perzentil einer sortierten Liste (lineare Interpolation)"""
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * pct / 100
+    lower = math.floor(position)
+    upper = math.ceil(position)
+    if lower == upper:
+        return ordered[lower]
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def _key(stage: str, labels: dict):
+    return (stage, tuple(sorted((k, str(v)) for k, v in labels.items() if v is not None)))
+
+
+def observe(stage: str, seconds: float, document: str = None, **labels):
+    """Erfasst eine Dauer für einen Verarbeitungsschritt (document nur für die Laufzusammenfassung)"""
+    key = _key(stage, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(seconds)
+        if document is not None:
+            stages = _documents.get(document)
+            if stages is None:
+                stages = _documents[document] = {}
+                while len(_documents) > MAX_DOCUMENTS:
+                    _documents.popitem(last=False)
+            else:
+                _documents.move_to_end(document)
+            stages.setdefault(stage, Histogram()).observe(seconds)
+
+
+@contextmanager
+def timer(stage: str, **labels):
+    """Kontextmanager, der die Dauer des Blocks als Messwert erfasst (auch bei Fehlern)"""
+    listeners = list(_stage_listeners)
+    for listener in listeners:
+        listener.stage_started(stage)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - started
+        observe(stage, seconds, **labels)
+        for listener in reversed(listeners):
+            listener.stage_finished(stage, seconds)
+
+
+def add_stage_listener(listener):
+    """Registriert ein Objekt mit stage_started(stage) und stage_finished(stage, seconds)"""
+    with _lock:
+        _stage_listeners.append(listener)
+
+
+def remove_stage_listener(listener):
+    with _lock:
+        if listener in _stage_listeners:
+            _stage_listeners.remove(listener)
+
+
+def snapshot() -> list:
+    """
+    Serialisierbarer Zustand aller Histogramme (z.B. zur Übergabe aus dem Worker-Prozess).
+    Werte pro Dokument gehören zur Laufzusammenfassung des Workers und werden nicht übergeben.
+    """
+    with _lock:
+        return [
+            {"stage": stage, "labels": dict(labels), **histogram.to_dict()}
+            for (stage, labels), histogram in _histograms.items()
+        ]
+
+
+def merge(entries: list):
+    """Übernimmt Messwerte aus einem snapshot() eines anderen Prozesses"""
+    with _lock:
+        for entry in entries:
+            key = _key(entry["stage"], entry["labels"])
+            histogram = _histograms.get(key)
+            if histogram is None:
+                histogram = _histograms[key] = Histogram()
+            histogram.merge(entry)
+
+
+def reset():
+    """Verwirft alle Messwerte"""
+    with _lock:
+        _histograms.clear()
+        _documents.clear()
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels) -> str:
+    return ",".join(f'{name}="{_escape(value)}"' for name, value in labels)
+
+
+def render_prometheus() -> str:
+    """Alle Histogramme im Prometheus-Textformat (Version 0.0.4)"""
+    lines = [
+        f"# HELP {METRIC_NAME} Dauer der Verarbeitungsschritte in Sekunden",
+        f"# TYPE {METRIC_NAME} histogram",
+    ]
+    with _lock:
+        items = sorted(_histograms.items())
+        for (stage, labels), histogram in items:
+            base = (("stage", stage),) + labels
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.bucket_counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                lines.append(f'{METRIC_NAME}_bucket{{{_format_labels(base + (("le", le),))}}} {cumulative}')
+            lines.append(f"{METRIC_NAME}_sum{{{_format_labels(base)}}} {histogram.sum}")
+            lines.append(f"{METRIC_NAME}_count{{{_format_labels(base)}}} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+
+def run_summary() -> dict:
+    """
+    Zusammenfassung aller Messwerte: pro Schritt (über alle Labels), pro Schritt und
+    Dokument (höchstens MAX_DOCUMENTS) sowie pro Schritt und Kategorie.
+    """
+    by_stage, by_category = {}, {}
+    with _lock:
+        by_document = {document: dict(stages) for document, stages in _documents.items()}
+        for (stage, labels), histogram in _histograms.items():
+            label_map = dict(labels)
+            groups = [(by_stage, stage)]
+            if "category" in label_map:
+                groups.append((by_category.setdefault(label_map["category"], {}), stage))
+            for target, name in groups:
+                combined = target.setdefault(name, Histogram())
+                combined.merge(histogram.to_dict())
+
+    def summarize(groups):
+        return {name: histogram.summary() for name, histogram in sorted(groups.items())}
+
+    return {
+        "stages": summarize(by_stage),
+        "documents": {doc: summarize(stages) for doc, stages in sorted(by_document.items())},
+        "categories": {cat: summarize(stages) for cat, stages in sorted(by_category.items())},
+    }
+
+
+def write_run_summary(log_dir: Path, run_name: str, started_at: float, extra: dict = None) -> Path:
+    """Schreibt die Laufzusammenfassung als JSON neben die Log-Dateien (extra: zusätzliche Abschnitte)"""
+    log_dir = Path(log_dir)
+    log_dir.mkdir(parents=True, exist_ok=True)
+    summary_file = log_dir / f"metrics_{run_name}_{int(started_at)}.json"
+    summary = {
+        "run": run_name,
+        "started_at": started_at,
+        "duration_seconds": round(time.time() - started_at, 3),
+        **run_summary(),
+        **(extra or {}),
+    }
+    with open(summary_file, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=2, ensure_ascii=False)
+    return summary_file
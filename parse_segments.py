@@ -1,21 +1,168 @@
+"""
+Parst die Split-Segmente mit LlamaParse.
+
+Als Skript (python parse_segments.py [Dateien] [--worker ...]) oder als Bibliothek:
+
+    import parse_segments
+    config = parse_segments.ParseConfig(data_dir=Path("/tmp/daten"), parser=StubParser())
+    parse_segments.run(config=config)
+
+Beim Import passiert nichts; der LlamaParse-Client und fitz werden erst beim ersten
+Lauf geladen und danach pro Einstellung wiederverwendet.
+"""
+import argparse
+import hashlib
 import json
+import os
+from dataclasses import dataclass, field
 from pathlib import Path
-import fitz  # PyMuPDF
-from llama_cloud_services import LlamaParse
 import time
 import uuid
+import field_extraction
+import search_index
+from result_store import get_store
+import scheduler
+from work_queue import FINAL_STATUSES, LEASE_SECONDS, get_queue, run_worker
+import metrics
+import profiling
 
 # Konfiguration
-DATA_DIR = Path(__file__).parent / "data"
-SPLIT_RESULTS_FILE = DATA_DIR / "split_results.json"
-OUTPUT_FILE = DATA_DIR / "parsed_segments.json"
+DATA_DIR = Path(os.environ.get("FLATSCOUTS_DATA_DIR", Path(__file__).parent / "data"))
 STATUS_FILE = DATA_DIR / "parse_status.json"
+LOG_DIR = Path(__file__).parent / "logs"
+MISSING_API_KEY = "LLAMA_CLOUD_API_KEY ist nicht gesetzt (Umgebungsvariable oder api_key in ParseConfig)"
+FINGERPRINT_CACHE_SIZE = 64  # Dokumente, deren Seiten-Fingerabdrücke im Prozess gecacht werden
+
+_fingerprint_cache = {}
+
+def _api_key_default():
+    return os.environ.get("LLAMA_CLOUD_API_KEY", "")
+
+def _optimize_images_default():
+    import preprocess
+    return preprocess.ENABLED
+
+# Parse-Stufen, von der leichtesten zur schwersten. Die Stufe "agent" verwendet die
+# Einstellungen aus ParseConfig. Budget = Sekunden pro Job + Sekunden pro Seite: Stufen mit
+# Ausweichstufe werden von LlamaParse nach Ablauf abgebrochen und dann schwerer wiederholt,
+# bei der schwersten Stufe wird eine Überschreitung nur gemeldet.
+PARSE_TIERS = {
+    "fast": {
+        "parse_mode": "parse_page_without_llm", "model": None, "high_res_ocr": False,
+        "budget_seconds": 30, "budget_seconds_per_page": 3, "fallback": "agent",
+    },
+    "balanced": {
+        "parse_mode": "parse_page_with_llm", "model": None, "high_res_ocr": True,
+        "budget_seconds": 60, "budget_seconds_per_page": 10, "fallback": "agent",
+    },
+    "agent": {
+        "budget_seconds": 120, "budget_seconds_per_page": 30, "fallback": None,
+    },
+}
+
+# Zuordnung Kategorie/Seitenmerkmale -> Stufe (erste passende Regel gilt, sonst DEFAULT_TIER).
+# Merkmale siehe segment_traits: pages, text_layer (alle Seiten mit Textebene), tables
+PARSE_ROUTES = [
+    # Tabellenlastige Verträge und Protokolle immer mit dem Agenten
+    {"categories": ("Mietvertrag", "Übergabeprotokoll"), "tier": "agent"},
+    # Unsichere Zuordnung: Kategorie könnte falsch sein
+    {"confidence": ("low",), "tier": "agent"},
+    # Linienraster (z.B. Nebenkosten-Tabellen) braucht die Layout-Erkennung
+    {"tables": True, "tier": "agent"},
+    # Einfache Rechnungen und Bewerbungen mit Textebene ohne LLM
+    {"categories": ("Rechnung", "Bewerbung"), "text_layer": True, "max_pages": 6, "tier": "fast"},
+    # Gescannte einfache Seiten: OCR mit LLM, ohne Agent
+    {"categories": ("Rechnung", "Bewerbung"), "max_pages": 6, "tier": "balanced"},
+]
+DEFAULT_TIER = "agent"
+TABLE_MIN_LINES = 12  # Linien/Rechtecke einer Seite, ab denen sie als Tabelle gilt
+
+_tier_stats = {}  # Stufe -> Segmente, Seiten, Sekunden, Ausweichen, Budgetüberschreitungen
+
+# LlamaParse Konfiguration
+# Optimiert für bessere Tabellenerkennung und vollständiges Markdown:
+# - parse_mode="parse_page_with_layout_agent": Speziell für Layout- und Tabellenerkennung optimiert
+# - model="openai-gpt4o": Leistungsstärkeres Modell für präzisere Extraktion (ohne Bindestrich!)
+# - high_res_ocr=True: Hohe OCR-Auflösung für bessere Texterkennung
+# - language="de": Deutsch für bessere Erkennung deutscher Dokumente
+# 
+# HINWEIS: Falls Markdown unvollständig ist, teste verschiedene Konfigurationen mit test_configurations.py
+@dataclass
+class ParseConfig:
+    """Einstellungen eines Parse-Laufs (Standardwerte wie beim Skript)"""
+    data_dir: Path = DATA_DIR
+    log_dir: Path = LOG_DIR
+    api_key: str = field(default_factory=_api_key_default, repr=False)
+    parse_mode: str = "parse_page_with_agent"
+    model: str = "openai-gpt-4-1-mini"
+    high_res_ocr: bool = True
+    language: str = "de"
+    # Parse-Stufe: "auto" (nach PARSE_ROUTES) oder fest eine Stufe aus PARSE_TIERS
+    tier: str = "auto"
+    optimize_images: bool = field(default_factory=_optimize_images_default)
+    # Alle Segmente neu parsen, auch wenn bisherige Ergebnisse übernommen werden könnten
+    force: bool = False
+    # Fertiger Client mit parse(pfad) -> Ergebnis mit .pages (z.B. Stub für Benchmarks)
+    parser: object = field(default=None, repr=False)
+
+    def __post_init__(self):
+        self.data_dir = Path(self.data_dir)
+        self.log_dir = Path(self.log_dir)
+
+    @property
+    def status_file(self) -> Path:
+        return self.data_dir / STATUS_FILE.name
+
+    @property
+    def optimized_dir(self) -> Path:
+        return self.data_dir / ".optimized"
+
+_parsers = {}
 
-def update_parse_status(filename, status, message=""):
+def get_parser(config, tier="agent"):
+    """LlamaParse-Client für Einstellungen und Stufe (wird beim ersten Aufruf erzeugt und wiederverwendet)"""
+    if config.parser is not None:
+        return config.parser
+    if not config.api_key:
+        raise RuntimeError(MISSING_API_KEY)
+    tier_config = PARSE_TIERS[tier]
+    settings = {
+        "parse_mode": tier_config.get("parse_mode", config.parse_mode),
+        "model": tier_config.get("model", config.model),
+        "high_res_ocr": tier_config.get("high_res_ocr", config.high_res_ocr),
+    }
+    if tier_config["fallback"]:
+        # Budget nur durchsetzen, wenn eine schwerere Stufe übernehmen kann
+        settings["job_timeout_in_seconds"] = tier_config["budget_seconds"]
+        settings["job_timeout_extra_time_per_page_in_seconds"] = tier_config["budget_seconds_per_page"]
+    if settings["model"] is None:
+        del settings["model"]
+    key = (config.api_key, config.language, tuple(sorted(settings.items())))
+    parser = _parsers.get(key)
+    if parser is None:
+        from llama_cloud_services import LlamaParse
+        parser = _parsers[key] = LlamaParse(
+            **settings,
+            language=config.language,
+            api_key=config.api_key,
+            description="Document-Agent mit GPT-4o (ganzes Dokument-Kontext)"
+        )
+    return parser
+
+def write_status_file(config, status_data):
+    """Schreibt die Status-Datei atomar (mehrere Worker können gleichzeitig schreiben)"""
+    status_file = config.status_file
+    status_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = status_file.with_name(f"{status_file.name}.{os.getpid()}.tmp")
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(status_data, f, indent=2, ensure_ascii=False)
+    os.replace(temp_file, status_file)
+
+def update_parse_status(config, filename, status, message=""):
     """Aktualisiert den Parse-Status in der Status-Datei"""
     try:
-        if STATUS_FILE.exists():
-            with open(STATUS_FILE, "r", encoding="utf-8") as f:
+        if config.status_file.exists():
+            with open(config.status_file, "r", encoding="utf-8") as f:
                 status_data = json.load(f)
         else:
             status_data = {}
@@ -26,30 +173,13 @@ def update_parse_status(filename, status, message=""):
             "timestamp": time.time()
         }
         
-        with open(STATUS_FILE, "w", encoding="utf-8") as f:
-            json.dump(status_data, f, indent=2, ensure_ascii=False)
+        write_status_file(config, status_data)
     except Exception as e:
         print(f"Fehler beim Aktualisieren des Parse-Status: {e}", flush=True)
 
-# LlamaParse Konfiguration
-# Optimiert für bessere Tabellenerkennung und vollständiges Markdown:
-# - parse_mode="parse_page_with_layout_agent": Speziell für Layout- und Tabellenerkennung optimiert
-# - model="openai-gpt4o": Leistungsstärkeres Modell für präzisere Extraktion (ohne Bindestrich!)
-# - high_res_ocr=True: Hohe OCR-Auflösung für bessere Texterkennung
-# - language="de": Deutsch für bessere Erkennung deutscher Dokumente
-# 
-# HINWEIS: Falls Markdown unvollständig ist, teste verschiedene Konfigurationen mit test_configurations.py
-parser = LlamaParse(
-    parse_mode="parse_page_with_agent",
-    model="openai-gpt-4-1-mini",
-    high_res_ocr=True,
-    language="de",
-    api_key="llx-IWbVsP0maYq3OvP4VJg2MjM8jxqciXHA9Gx1SLYRB3O2rr8W",
-    description="Document-Agent mit GPT-4o (ganzes Dokument-Kontext)"
-)
-
 
-def extract_pages_from_pdf(pdf_path: Path, page_numbers: list[int], segment_name: str) -> Path:
+def extract_pages_from_pdf(pdf_path: Path, page_numbers: list[int], segment_name: str,
+                           temp_dir: Path = DATA_DIR) -> Path:
     """
     Extrahiert spezifische Seiten aus einem PDF und erstellt ein temporäres PDF.
     
@@ -57,10 +187,13 @@ def extract_pages_from_pdf(pdf_path: Path, page_numbers: list[int], segment_name
         pdf_path: Pfad zum ursprünglichen PDF
         page_numbers: Liste der Seitennummern (1-basiert)
         segment_name: Name des Segments für eindeutigen Dateinamen
+        temp_dir: Ordner für das temporäre PDF
     
     Returns:
         Pfad zum temporären PDF mit den extrahierten Seiten
     """
+    import fitz  # PyMuPDF
+    
     # PDF öffnen
     doc = fitz.open(pdf_path)
     
@@ -78,23 +211,26 @@ def extract_pages_from_pdf(pdf_path: Path, page_numbers: list[int], segment_name
     # Eindeutiger Dateiname basierend auf Segment-Name und UUID
     safe_segment_name = "".join(c for c in segment_name if c.isalnum() or c in ('_', '-'))
     temp_filename = f"temp_segment_{safe_segment_name}_{uuid.uuid4().hex[:8]}.pdf"
-    temp_file_path = DATA_DIR / temp_filename
+    temp_file_path = Path(temp_dir) / temp_filename
     
     temp_pdf.save(str(temp_file_path))
     temp_pdf.close()
     
     return temp_file_path
 
-def parse_segment_with_llamaparse(segment_pdf_path: Path) -> dict:
+def parse_segment_with_llamaparse(segment_pdf_path: Path, parser) -> dict:
     """
     Parst ein Segment-PDF mit LlamaParse.
     
     Args:
         segment_pdf_path: Pfad zum Segment-PDF
+        parser: LlamaParse-Client (siehe get_parser)
     
     Returns:
         Dictionary mit geparsten Daten
     """
+    import fitz  # PyMuPDF
+    
     try:
         # Überprüfen, dass die Datei existiert
         if not segment_pdf_path.exists():
@@ -120,22 +256,29 @@ def parse_segment_with_llamaparse(segment_pdf_path: Path) -> dict:
             available_attrs = [attr for attr in dir(first_page) if not attr.startswith('_')]
             # print(f"      Debug: Verfügbare Attribute: {available_attrs}")
         
+        page_contents = []  # Ergebnis pro Seite (für den Seitenabgleich bei neuen Versionen)
         for i, page in enumerate(result.pages):
+            page_text = ""
+            page_markdown = ""
             # Text extrahieren
             if hasattr(page, 'text') and page.text:
-                full_text += page.text + "\n\n"
+                page_text = page.text + "\n\n"
             elif hasattr(page, 'text_blocks') and page.text_blocks:
                 # Alternative: Text aus Text-Blöcken extrahieren
                 for block in page.text_blocks:
                     if hasattr(block, 'text'):
-                        full_text += block.text + "\n"
+                        page_text += block.text + "\n"
             
             # Markdown extrahieren
             if hasattr(page, 'md') and page.md:
-                markdown_content += page.md + "\n\n"
+                page_markdown = page.md + "\n\n"
             elif hasattr(page, 'markdown') and page.markdown:
                 # Alternative: Markdown-Attribut
-                markdown_content += page.markdown + "\n\n"
+                page_markdown = page.markdown + "\n\n"
+            
+            full_text += page_text
+            markdown_content += page_markdown
+            page_contents.append({"text": page_text.strip(), "markdown": page_markdown.strip()})
         
         parsed_pages = len(result.pages)
         
@@ -148,7 +291,8 @@ def parse_segment_with_llamaparse(segment_pdf_path: Path) -> dict:
             "text": full_text.strip(),
             "markdown": markdown_content.strip(),
             "num_pages": parsed_pages,
-            "expected_pages": expected_pages
+            "expected_pages": expected_pages,
+            "page_contents": page_contents
         }
     except Exception as e:
         return {
@@ -156,144 +300,587 @@ def parse_segment_with_llamaparse(segment_pdf_path: Path) -> dict:
             "error": str(e)
         }
 
-def main():
-    """Hauptfunktion zum Parsen aller Segmente."""
+def segment_traits(segment_pdf_path: Path) -> dict:
+    """
+    Seitenmerkmale eines Segment-PDFs für das Routing.
+    
+    Returns:
+        Dictionary mit pages, text_pages (Textebene pro Seite), text_layer (alle Seiten mit
+        Textebene) und tables (mindestens eine Seite mit Linienraster)
+    """
+    import fitz  # PyMuPDF
+    
+    text_pages = []
+    tables = False
+    with fitz.open(segment_pdf_path) as doc:
+        for page in doc:
+            text_pages.append(bool(page.get_fonts()))
+            if not tables:
+                lines = sum(1 for drawing in page.get_drawings() for item in drawing["items"] if item[0] in ("l", "re"))
+                tables = lines >= TABLE_MIN_LINES
+    return {
+        "pages": len(text_pages),
+        "text_pages": text_pages,
+        "text_layer": bool(text_pages) and all(text_pages),
+        "tables": tables
+    }
+
+def route_tier(category: str, confidence: str, traits: dict) -> str:
+    """Parse-Stufe eines Segments nach PARSE_ROUTES"""
+    for route in PARSE_ROUTES:
+        if "categories" in route and category not in route["categories"]:
+            continue
+        if "confidence" in route and confidence not in route["confidence"]:
+            continue
+        if "tables" in route and traits["tables"] != route["tables"]:
+            continue
+        if "text_layer" in route and traits["text_layer"] != route["text_layer"]:
+            continue
+        if "max_pages" in route and traits["pages"] > route["max_pages"]:
+            continue
+        return route["tier"]
+    return DEFAULT_TIER
+
+def output_problem(parse_result: dict, text_pages: list) -> str:
+    """Grund, warum ein Ergebnis unbrauchbar ist (Fehler, leer, abgeschnitten), sonst None"""
+    if not parse_result["success"]:
+        return f"Fehler: {parse_result.get('error', 'Unbekannter Fehler')}"
+    page_contents = parse_result.get("page_contents") or []
+    if parse_result.get("num_pages", 0) < parse_result.get("expected_pages", 0):
+        return f"abgeschnitten ({parse_result['num_pages']}/{parse_result['expected_pages']} Seiten)"
+    if not any(content["text"] or content["markdown"] for content in page_contents):
+        return "leer"
+    for page_num, (content, has_text) in enumerate(zip(page_contents, text_pages), start=1):
+        if has_text and not (content["text"] or content["markdown"]):
+            return f"Seite {page_num} leer trotz Textebene"
+    return None
+
+def _record_tier(tier: str, pages: int, seconds: float, fallback: bool, over_budget: bool):
+    stats = _tier_stats.setdefault(tier, {"segments": 0, "pages": 0, "seconds": 0.0, "fallbacks": 0,
+                                          "budget_exceeded": 0})
+    stats["segments"] += 1
+    stats["pages"] += pages
+    stats["seconds"] += seconds
+    stats["fallbacks"] += int(fallback)
+    stats["budget_exceeded"] += int(over_budget)
+
+def tier_summary() -> dict:
+    """Durchsatz pro Parse-Stufe seit Laufbeginn"""
+    return {
+        tier: {
+            **stats,
+            "seconds": round(stats["seconds"], 3),
+            "pages_per_second": round(stats["pages"] / stats["seconds"], 3) if stats["seconds"] else None
+        }
+        for tier, stats in sorted(_tier_stats.items())
+    }
+
+def parse_with_tier(config, segment_pdf_path: Path, category: str, confidence: str, pdf_filename: str) -> dict:
+    """
+    Parst ein Segment-PDF mit der passenden Stufe. Ist das Ergebnis fehlerhaft, leer oder
+    abgeschnitten, wird mit der schwereren Ausweichstufe wiederholt.
+    
+    Returns:
+        Ergebnis wie parse_segment_with_llamaparse, zusätzlich "tier" (verwendete Stufe)
+        und ggf. "fallback_from" (verworfene Stufen)
+    """
+    traits = segment_traits(segment_pdf_path)
+    tier = route_tier(category, confidence, traits) if config.tier == "auto" else config.tier
+    fallback_from = []
+    while True:
+        tier_config = PARSE_TIERS[tier]
+        started = time.perf_counter()
+        with metrics.timer("parse_llamaparse", document=pdf_filename, category=category, tier=tier):
+            parse_result = parse_segment_with_llamaparse(segment_pdf_path, get_parser(config, tier))
+        seconds = time.perf_counter() - started
+        
+        budget = tier_config["budget_seconds"] + tier_config["budget_seconds_per_page"] * traits["pages"]
+        if seconds > budget:
+            print(f"(Stufe {tier} über Budget: {seconds:.0f}/{budget:.0f} s)", end=" ", flush=True)
+        problem = output_problem(parse_result, traits["text_pages"])
+        fallback = tier_config["fallback"] if problem else None
+        _record_tier(tier, traits["pages"], seconds, fallback is not None, seconds > budget)
+        if fallback is None:
+            break
+        print(f"(Stufe {tier} {problem} -> {fallback})", end=" ", flush=True)
+        fallback_from.append(tier)
+        tier = fallback
+    
+    parse_result["tier"] = tier
+    if fallback_from:
+        parse_result["fallback_from"] = fallback_from
+    return parse_result
+
+def page_fingerprints(pdf_path: Path) -> list:
+    """
+    Inhalts-Fingerabdruck pro Seite (SHA-256 über Seitengröße, Drehung, Inhaltsstrom
+    und eingebettete Bilder/Formulare). Gecacht, solange die Datei unverändert ist.
+    """
+    import fitz  # PyMuPDF
+    
+    pdf_path = Path(pdf_path)
+    stat = pdf_path.stat()
+    key = (str(pdf_path), stat.st_mtime_ns, stat.st_size)
+    fingerprints = _fingerprint_cache.get(key)
+    if fingerprints is None:
+        fingerprints = []
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                digest = hashlib.sha256(f"{tuple(page.rect)}|{page.rotation}".encode("utf-8"))
+                digest.update(page.read_contents())
+                xrefs = [image[0] for image in page.get_images(full=True)]
+                xrefs += [xobject[0] for xobject in page.get_xobjects()]
+                for xref in xrefs:
+                    digest.update(doc.xref_stream_raw(xref) or b"")
+                fingerprints.append(digest.hexdigest())
+        if len(_fingerprint_cache) >= FINGERPRINT_CACHE_SIZE:
+            _fingerprint_cache.clear()
+        _fingerprint_cache[key] = fingerprints
+    return fingerprints
+
+def parse_settings(config) -> str:
+    """
+    Schlüssel der Einstellungen, die das Parse-Ergebnis bestimmen (Stufe, Parser-Einstellungen,
+    Stufen- und Routing-Tabelle, Bildoptimierung). Budgets zählen nicht dazu.
+    """
+    tiers = {name: {key: value for key, value in tier.items() if not key.startswith("budget")}
+             for name, tier in PARSE_TIERS.items()}
+    settings = [config.tier, config.parse_mode, config.model, config.high_res_ocr, config.language,
+                config.optimize_images, tiers, PARSE_ROUTES if config.tier == "auto" else None]
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+def load_previous_version(store, pdf_path: Path, config) -> dict:
+    """
+    Bisheriges Parse-Ergebnis eines Dokuments für den Seitenabgleich mit einer neuen Version.
+    
+    Übernommen werden nur Ergebnisse, die mit denselben Einstellungen (parse_settings)
+    geparst wurden; mit config.force wird nichts übernommen.
+    
+    Returns:
+        Dictionary mit
+        - fingerprints: Fingerabdrücke der aktuellen Version (Index = Seite - 1)
+        - pages: Fingerabdruck -> bisheriges Ergebnis der Seite (text, markdown)
+        - segments: Tupel der Fingerabdrücke eines Segments -> bisheriges "parsed"
+        oder None, falls die Fingerabdrücke nicht berechnet werden konnten
+    """
+    try:
+        fingerprints = page_fingerprints(pdf_path)
+    except Exception as e:
+        print(f"   ⚠️  Seiten-Fingerabdrücke für {pdf_path.name} nicht berechenbar: {e}", flush=True)
+        return None
+    stored_pages = {} if config.force else store.get_pages(pdf_path.name)
+    settings = parse_settings(config)
+    segments = {}
+    reusable_pages = set()
+    if stored_pages:
+        for segment in store.get_parsed(pdf_path.name) or []:
+            parsed = segment.get("parsed") or {}
+            # Ergebnisse anderer Einstellungen (oder ohne Angabe, ältere Läufe) neu parsen
+            if "error" in parsed or parsed.get("settings") != settings:
+                continue
+            pages = segment.get("pages") or []
+            reusable_pages.update(pages)
+            key = tuple(stored_pages.get(page, {}).get("fingerprint") for page in pages)
+            if key and None not in key:
+                segments[key] = parsed
+    return {
+        "fingerprints": fingerprints,
+        "pages": {info["fingerprint"]: info for page, info in stored_pages.items() if page in reusable_pages},
+        "segments": segments
+    }
+
+def _join_pages(page_contents: list, field_name: str) -> str:
+    return "\n\n".join(content[field_name] for content in page_contents if content[field_name])
+
+def parse_segment(config, pdf_path: Path, pdf_filename: str, segment: dict, temp_files: list,
+                  progress: str = "", previous: dict = None) -> dict:
+    """
+    Extrahiert die Seiten eines Segments und parst sie.
+    
+    Mit previous (siehe load_previous_version) werden nur geänderte oder neue Seiten geparst:
+    Segmente mit unveränderten Seiten behalten ihr bisheriges Ergebnis, bei teilweise
+    geänderten Segmenten werden die unveränderten Seiten übernommen.
+    
+    Args:
+        config: ParseConfig des Laufs
+        pdf_path: Pfad zum ursprünglichen PDF
+        pdf_filename: Dateiname (für Status und Zeitmessung)
+        segment: Segment aus dem Split-Ergebnis
+        temp_files: Liste, an die das temporäre Segment-PDF zum späteren Aufräumen angehängt wird
+        progress: Fortschrittsanzeige, z.B. "3/12"
+        previous: Optional bisheriges Ergebnis des Dokuments
+    
+    Returns:
+        Segment mit Parse-Ergebnis (oder Fehler unter "parsed"); unter "page_results" das
+        Ergebnis pro Seite, das store_document getrennt speichert
+    """
+    segment_name = segment["name"]
+    category = segment["category"]
+    pages = segment["pages"]
+    confidence = segment.get("confidence_category", "unknown")
+    
+    print(f"\n   [{progress}] Segment: {segment_name}")
+    print(f"      Kategorie: {category}")
+    print(f"      Seiten: {pages}")
+    print(f"      Confidence: {confidence}")
+    print(f"      Parsing...", end=" ", flush=True)
+    segment_started = time.perf_counter()
+    
+    segment_data = {
+        "name": segment_name,
+        "category": category,
+        "pages": pages,
+        "confidence_category": confidence
+    }
+    
+    # Fingerabdrücke der Segmentseiten und bisherige Ergebnisse dieser Seiten
+    fingerprints = (previous or {}).get("fingerprints") or []
+    segment_fingerprints = [fingerprints[page - 1] if 1 <= page <= len(fingerprints) else None for page in pages]
+    known = None not in segment_fingerprints
+    cached = [previous["pages"].get(fingerprint) for fingerprint in segment_fingerprints] if known else []
+    
+    def page_results(page_contents):
+        if not known or len(page_contents) != len(pages):
+            return []
+        return [
+            {"page": page, "fingerprint": fingerprint, "text": content["text"], "markdown": content["markdown"]}
+            for page, fingerprint, content in zip(pages, segment_fingerprints, page_contents)
+        ]
+    
+    reused = previous["segments"].get(tuple(segment_fingerprints)) if known and pages else None
+    if reused is not None:
+        # Alle Seiten unverändert: bisheriges Ergebnis übernehmen
+        segment_data["parsed"] = dict(reused)
+        segment_data["page_results"] = page_results(cached) if None not in cached else []
+        metrics.observe("parse_segment_reused", time.perf_counter() - segment_started,
+                        document=pdf_filename, category=category)
+        print("UNVERÄNDERT (übernommen)", flush=True)
+        update_parse_status(config, pdf_filename, "processing", f"Segment {progress} unverändert: {segment_name}")
+        return segment_data
+    
+    try:
+        parse_pages = pages
+        if any(content is not None for content in cached):
+            # Nur geänderte oder neue Seiten parsen
+            parse_pages = [page for page, content in zip(pages, cached) if content is None]
+        
+        if parse_pages:
+            # Seiten aus PDF extrahieren
+            with metrics.timer("parse_extract_pages", document=pdf_filename, category=category):
+                temp_pdf_path = extract_pages_from_pdf(pdf_path, parse_pages, segment_name, config.data_dir)
+            temp_files.append(temp_pdf_path)
+            
+            # Mit LlamaParse parsen (Stufe nach Kategorie und Seitenmerkmalen)
+            parse_result = parse_with_tier(config, temp_pdf_path, category, confidence, pdf_filename)
+        else:
+            # Segmentgrenzen verschoben, aber alle Seiten unverändert
+            parse_result = {"success": True, "page_contents": []}
+        
+        page_contents = parse_result.get("page_contents") or []
+        if parse_result["success"] and parse_pages != pages:
+            if len(page_contents) == len(parse_pages):
+                # Neu geparste Seiten mit den unveränderten zusammenführen
+                new_contents = iter(page_contents)
+                page_contents = [content if content is not None else next(new_contents) for content in cached]
+                parse_result = {
+                    **parse_result,
+                    "text": _join_pages(page_contents, "text"),
+                    "markdown": _join_pages(page_contents, "markdown"),
+                    "num_pages": len(pages)
+                }
+                print(f"({len(pages) - len(parse_pages)} Seite(n) übernommen)", end=" ", flush=True)
+            else:
+                # Seiten nicht eindeutig zuordenbar: ganzes Segment parsen
+                with metrics.timer("parse_extract_pages", document=pdf_filename, category=category):
+                    temp_pdf_path = extract_pages_from_pdf(pdf_path, pages, segment_name, config.data_dir)
+                temp_files.append(temp_pdf_path)
+                parse_result = parse_with_tier(config, temp_pdf_path, category, confidence, pdf_filename)
+                page_contents = parse_result.get("page_contents") or []
+        
+        # Segment-Daten zusammenstellen
+        segment_data["parsed"] = {
+            "text": parse_result.get("text", ""),
+            "markdown": parse_result.get("markdown", ""),
+            "num_pages_parsed": parse_result.get("num_pages", 0)
+        } if parse_result["success"] else {"error": parse_result.get("error", "Unbekannter Fehler")}
+        if parse_result.get("tier"):
+            segment_data["parsed"]["tier"] = parse_result["tier"]
+        if parse_result["success"]:
+            segment_data["parsed"]["settings"] = parse_settings(config)
+        segment_data["page_results"] = page_results(page_contents) if parse_result["success"] else []
+        
+        print("OK" if parse_result["success"] else f"FEHLER: {parse_result.get('error', 'Unbekannter Fehler')}", flush=True)
+        update_parse_status(config, pdf_filename, "processing", f"Segment {progress} geparst: {segment_name}")
+    
+    except Exception as e:
+        segment_data["parsed"] = {"error": str(e)}
+        print(f"FEHLER: {e}", flush=True)
+        update_parse_status(config, pdf_filename, "processing", f"Fehler bei Segment {segment_name}: {str(e)}")
+    
+    metrics.observe("parse_segment_total", time.perf_counter() - segment_started,
+                    document=pdf_filename, category=category)
+    return segment_data
+
+def store_document(store, pdf_filename: str, parsed_segments: list, data_dir: Path = None):
+    """
+    Speichert die geparsten Segmente eines Dokuments und aktualisiert den Suchindex.
+    Das Ergebnis pro Seite ("page_results") wird aus den Segmenten entfernt und getrennt gespeichert.
+    """
+    pages = []
+    for segment in parsed_segments:
+        pages.extend(segment.pop("page_results", None) or [])
+    
+    # Ergebnis sofort pro Dokument speichern (kein Neuschreiben aller Ergebnisse)
+    with metrics.timer("store_write", document=pdf_filename):
+        store.upsert_parsed(pdf_filename, parsed_segments, pages)
+    
+    # Volltext-Index inkrementell aktualisieren, damit das Dokument sofort durchsuchbar ist
+    try:
+        with metrics.timer("search_index", document=pdf_filename):
+            search_index.index_document(pdf_filename, parsed_segments, data_dir)
+    except Exception as e:
+        print(f"   ⚠️  Suchindex konnte nicht aktualisiert werden: {e}", flush=True)
+
+def cleanup_temp_files(temp_files: list) -> int:
+    """Löscht temporäre Segment-PDFs (mit Wiederholung, falls die Datei noch gesperrt ist)"""
+    cleaned_count = 0
+    for temp_file in temp_files:
+        if temp_file.exists():
+            for attempt in range(5):
+                try:
+                    temp_file.unlink()
+                    cleaned_count += 1
+                    break
+                except PermissionError:
+                    if attempt < 4:
+                        time.sleep(2)
+                    else:
+                        print(f"   ⚠️  Konnte {temp_file.name} nicht löschen")
+    return cleaned_count
+
+def finish_document_if_complete(config, store, queue, pdf_filename: str):
+    """
+    Speichert ein Dokument, sobald alle seine Parse-Aufgaben abgeschlossen sind.
+    Mehrere Worker können dies gleichzeitig auslösen; das Speichern ist idempotent.
+    """
+    tasks = queue.document_tasks("parse", pdf_filename)
+    done = sum(1 for task in tasks if task["status"] in FINAL_STATUSES)
+    if done < len(tasks):
+        update_parse_status(config, pdf_filename, "processing", f"{done}/{len(tasks)} Segmente geparst")
+        return False
+    
+    parsed_segments = []
+    for task in tasks:
+        if task["status"] == "done":
+            parsed_segments.append(task["result"])
+        else:
+            parsed_segments.append({**task["payload"], "parsed": {"error": task["error"] or "Unbekannter Fehler"}})
+    store_document(store, pdf_filename, parsed_segments, config.data_dir)
+    update_parse_status(config, pdf_filename, "completed", f"Parsing abgeschlossen für {pdf_filename}")
+    scheduler.clear_priority(pdf_filename, config.data_dir)
+    return True
+
+def upload_source(config, pdf_path: Path) -> Path:
+    """PDF, aus dem die Segmente extrahiert werden (leichte Kopie mit neu komprimierten Bildern, falls aktiv)"""
+    if not config.optimize_images:
+        return pdf_path
+    import preprocess
+    return preprocess.upload_copy(pdf_path, optimized_dir=config.optimized_dir)
+
+def run_parse_worker(worker_id=None, lease_seconds=LEASE_SECONDS, idle_timeout=0, config=None):
+    """Worker-Modus: parst einzelne Segmente aus der Warteschlange"""
+    config = config or ParseConfig()
+    store = get_store(config.data_dir)
+    queue = get_queue(config.data_dir)
+
+    def handle(task):
+        pdf_filename = task["document"]
+        pdf_path = config.data_dir / pdf_filename
+        if not pdf_path.exists():
+            raise FileNotFoundError(f"PDF-Datei nicht gefunden: {pdf_filename}")
+        previous = load_previous_version(store, pdf_path, config)
+        pdf_path = upload_source(config, pdf_path)
+        temp_files = []
+        try:
+            return parse_segment(config, pdf_path, pdf_filename, task["payload"], temp_files,
+                                 f"{pdf_filename} #{task['position'] + 1}", previous)
+        finally:
+            cleanup_temp_files(temp_files)
+
+    return run_worker(queue, "parse", handle, worker_id, lease_seconds, idle_timeout,
+                      on_finished=lambda task: finish_document_if_complete(config, store, queue, task["document"]))
+
+def run(files=None, config=None):
+    """
+    Parst alle Segmente (oder nur die Segmente der angegebenen Dateien) und speichert die Ergebnisse.
+
+    Returns:
+        Dictionary Dateiname -> geparste Segmente, oder None, falls keine Split-Ergebnisse vorliegen
+    """
+    config = config or ParseConfig()
+    
     print("=" * 60)
     print("Starte Parsing der Segmente mit LlamaParse")
     print("=" * 60)
     
     # Split-Ergebnisse laden
-    if not SPLIT_RESULTS_FILE.exists():
-        print(f"FEHLER: {SPLIT_RESULTS_FILE} nicht gefunden!", flush=True)
+    store = get_store(config.data_dir)
+    if not store.has_split():
+        print("FEHLER: Keine Split-Ergebnisse gefunden!", flush=True)
         print("Bitte zuerst split_document.py ausführen.", flush=True)
-        return
-    
-    with open(SPLIT_RESULTS_FILE, "r", encoding="utf-8") as f:
-        split_results = json.load(f)
+        return None
     
     parsed_results = {}
+    initial_parse_status = {}
+    
+    # Bei einzelnen Dateien nur deren Split-Ergebnisse laden und den bestehenden Status ergänzen
+    if files:
+        split_results = {}
+        for name in files:
+            segments = store.get_split(Path(name).name)
+            if segments is not None:
+                split_results[Path(name).name] = segments
+        if config.status_file.exists():
+            with open(config.status_file, "r", encoding="utf-8") as f:
+                initial_parse_status = json.load(f)
+    else:
+        split_results = store.all_split()
+        # Voller Lauf: Ergebnisse von Dokumenten ohne Split-Ergebnis entfernen
+        store.retain_parsed(split_results.keys())
+    
+    # Kleine und frisch hochgeladene Dokumente zuerst
+    split_results = scheduler.order_split_results(split_results, config.data_dir)
+    
     total_segments = sum(len(segments) for segments in split_results.values())
     current_segment = 0
     temp_files_to_cleanup = []  # Liste der temporären Dateien zum Aufräumen
     
     # Für jede PDF-Datei
     # Initialisiere Parse-Status für alle Dokumente
-    initial_parse_status = {}
     for pdf_filename in split_results.keys():
         initial_parse_status[pdf_filename] = {
             "status": "pending",
             "message": "Wartend auf Parsing",
             "timestamp": time.time()
         }
-    with open(STATUS_FILE, "w", encoding="utf-8") as f:
-        json.dump(initial_parse_status, f, indent=2, ensure_ascii=False)
+    write_status_file(config, initial_parse_status)
     
     for pdf_filename, segments in split_results.items():
-        pdf_path = DATA_DIR / pdf_filename
+        pdf_path = config.data_dir / pdf_filename
+        document_started = time.perf_counter()
         
-        update_parse_status(pdf_filename, "processing", f"Starte Parsing für {pdf_filename}...")
+        update_parse_status(config, pdf_filename, "processing", f"Starte Parsing für {pdf_filename}...")
         
         if not pdf_path.exists():
             print(f"WARNUNG: PDF {pdf_filename} nicht gefunden, überspringe...", flush=True)
-            update_parse_status(pdf_filename, "failed", f"PDF-Datei nicht gefunden: {pdf_filename}")
+            update_parse_status(config, pdf_filename, "failed", f"PDF-Datei nicht gefunden: {pdf_filename}")
             parsed_results[pdf_filename] = []
+            store.upsert_parsed(pdf_filename, [])
             continue
         
         print(f"\n📄 Verarbeite: {pdf_filename}")
         print(f"   Anzahl Segmente: {len(segments)}")
         
+        # Bei einer neuen Version nur geänderte oder neue Seiten parsen
+        previous = load_previous_version(store, pdf_path, config)
+        
+        # Segmente aus der leichten Kopie mit neu komprimierten Bildern extrahieren
+        source_path = upload_source(config, pdf_path)
+        
         parsed_segments = []
         
         # Für jedes Segment
         for segment in segments:
             current_segment += 1
-            segment_name = segment["name"]
-            category = segment["category"]
-            pages = segment["pages"]
-            confidence = segment.get("confidence_category", "unknown")
-            
-            print(f"\n   [{current_segment}/{total_segments}] Segment: {segment_name}")
-            print(f"      Kategorie: {category}")
-            print(f"      Seiten: {pages}")
-            print(f"      Confidence: {confidence}")
-            print(f"      Parsing...", end=" ", flush=True)
-            
-            try:
-                # Seiten aus PDF extrahieren
-                temp_pdf_path = extract_pages_from_pdf(pdf_path, pages, segment_name)
-                temp_files_to_cleanup.append(temp_pdf_path)
-                
-                # Mit LlamaParse parsen
-                parse_result = parse_segment_with_llamaparse(temp_pdf_path)
-                
-                # Segment-Daten zusammenstellen
-                segment_data = {
-                    "name": segment_name,
-                    "category": category,
-                    "pages": pages,
-                    "confidence_category": confidence,
-                    "parsed": {
-                        "text": parse_result.get("text", ""),
-                        "markdown": parse_result.get("markdown", ""),
-                        "num_pages_parsed": parse_result.get("num_pages", 0)
-                    } if parse_result["success"] else {"error": parse_result.get("error", "Unbekannter Fehler")}
-                }
-                
-                print("OK" if parse_result["success"] else f"FEHLER: {parse_result.get('error', 'Unbekannter Fehler')}", flush=True)
-                parsed_segments.append(segment_data)
-                update_parse_status(pdf_filename, "processing", f"Segment {current_segment}/{total_segments} geparst: {segment_name}")
-                    
-            except Exception as e:
-                parsed_segments.append({
-                    "name": segment_name,
-                    "category": category,
-                    "pages": pages,
-                    "confidence_category": confidence,
-                    "parsed": {"error": str(e)}
-                })
-                print(f"FEHLER: {e}", flush=True)
-                update_parse_status(pdf_filename, "processing", f"Fehler bei Segment {segment_name}: {str(e)}")
+            parsed_segments.append(parse_segment(config, source_path, pdf_filename, segment, temp_files_to_cleanup,
+                                                 f"{current_segment}/{total_segments}", previous))
         
         parsed_results[pdf_filename] = parsed_segments
-        update_parse_status(pdf_filename, "completed", f"Parsing abgeschlossen für {pdf_filename}")
+        store_document(store, pdf_filename, parsed_segments, config.data_dir)
+        
+        metrics.observe("parse_document_total", time.perf_counter() - document_started, document=pdf_filename)
+        update_parse_status(config, pdf_filename, "completed", f"Parsing abgeschlossen für {pdf_filename}")
+        scheduler.clear_priority(pdf_filename, config.data_dir)
     
     # Temporäre Dateien aufräumen
     print("\n🧹 Räume temporäre Dateien auf...")
-    cleaned_count = 0
-    for temp_file in temp_files_to_cleanup:
-        if temp_file.exists():
-            for attempt in range(5):
-                try:
-                    temp_file.unlink()
-                    cleaned_count += 1
-                    break
-                except PermissionError:
-                    if attempt < 4:
-                        time.sleep(2)
-                    else:
-                        print(f"   ⚠️  Konnte {temp_file.name} nicht löschen")
+    cleaned_count = cleanup_temp_files(temp_files_to_cleanup)
     
     print(f"   ✅ {cleaned_count}/{len(temp_files_to_cleanup)} temporäre Dateien gelöscht")
     
-    # Ergebnisse speichern
-    with open(OUTPUT_FILE, "w", encoding="utf-8") as f:
-        json.dump(parsed_results, f, indent=2, ensure_ascii=False)
-    
     print("\n" + "=" * 60)
     print("✅ Parsing abgeschlossen!")
-    print(f"📁 Ergebnisse gespeichert in: {OUTPUT_FILE}")
+    print(f"📁 Ergebnisse gespeichert in: {store.db_file}")
     print("=" * 60)
     
     # Zusammenfassung
     total_parsed = sum(
-        sum(1 for seg in segs if "text" in seg.get("parsed", {}))
-        for segs in parsed_results.values()
+        sum(1 for seg in parsed_results.get(pdf_filename, []) if "text" in seg.get("parsed", {}))
+        for pdf_filename in split_results
     )
     
     print(f"\nZusammenfassung:", flush=True)
     print(f"   Gesamt Segmente: {total_segments}", flush=True)
     print(f"   Erfolgreich geparst: {total_parsed}", flush=True)
     print(f"   Fehlgeschlagen: {total_segments - total_parsed}", flush=True)
+    for tier, stats in tier_summary().items():
+        print(f"   Stufe {tier}: {stats['segments']} Segment(e), {stats['pages']} Seite(n), "
+              f"{stats['pages_per_second'] or 0:.2f} Seiten/s, {stats['fallbacks']} Ausweichen, "
+              f"{stats['budget_exceeded']} über Budget", flush=True)
+
+    # Strukturierte Felder lokal (ohne LLM) aus den Parse-Ergebnissen extrahieren
+    try:
+        field_extraction.run(config.data_dir)
+    except Exception as e:
+        print(f"⚠️  Feldextraktion fehlgeschlagen: {e}", flush=True)
+    return parsed_results
+
+def main(argv=None):
+    """Hauptfunktion zum Parsen aller Segmente (oder nur der Segmente der angegebenen Dateien)."""
+    arg_parser = argparse.ArgumentParser(description="Parst die Split-Segmente mit LlamaParse")
+    arg_parser.add_argument("files", nargs="*", help="Nur Segmente dieser Dateien parsen")
+    arg_parser.add_argument("--worker", action="store_true", help="Segmente aus der Warteschlange abarbeiten")
+    arg_parser.add_argument("--worker-id", default=None, help="Kennung des Workers (Standard: Rechner-PID)")
+    arg_parser.add_argument("--lease", type=float, default=LEASE_SECONDS, help="Lease-Dauer in Sekunden")
+    arg_parser.add_argument("--idle-timeout", type=float, default=0,
+                            help="Worker beenden, wenn so viele Sekunden keine Aufgabe kam (0 = nie)")
+    arg_parser.add_argument("--optimize-images", action="store_true",
+                            help="Bilder vor dem Upload neu komprimieren (siehe preprocess.py)")
+    arg_parser.add_argument("--profile", action="store_true", default=profiling.ENABLED,
+                            help="CPU-, Stichproben- und Speicherprofil schreiben (siehe profiling.py)")
+    arg_parser.add_argument("--tier", choices=("auto",) + tuple(PARSE_TIERS), default="auto",
+                            help="Parse-Stufe (Standard: auto nach Kategorie und Seitenmerkmalen)")
+    arg_parser.add_argument("--force", action="store_true",
+                            help="Alle Segmente neu parsen, keine bisherigen Ergebnisse übernehmen")
+    args = arg_parser.parse_args(argv)
+    
+    run_started = time.time()
+    config = ParseConfig(tier=args.tier, force=args.force)
+    if args.optimize_images:
+        config.optimize_images = True
+    if not config.api_key:
+        arg_parser.error(MISSING_API_KEY)
+    # Der Job-Worker-Prozess führt mehrere Läufe nacheinander aus
+    _tier_stats.clear()
+    
+    if args.worker:
+        try:
+            with profiling.profile(config.log_dir, "parse_worker", args.profile):
+                run_parse_worker(args.worker_id, args.lease, args.idle_timeout, config)
+        finally:
+            summary_file = metrics.write_run_summary(config.log_dir, "parse_worker", run_started,
+                                                     {"tiers": tier_summary()})
+            print(f"Zeitmessung gespeichert in: {summary_file}", flush=True)
+        return
+    
+    with profiling.profile(config.log_dir, "parse_segments", args.profile):
+        results = run(args.files, config)
+    if results is None:
+        return
+    
+    summary_file = metrics.write_run_summary(config.log_dir, "parse_segments", run_started,
+                                             {"tiers": tier_summary()})
+    print(f"   Zeitmessung: {summary_file}", flush=True)
 
 if __name__ == "__main__":
     main()
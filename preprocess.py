@@ -0,0 +1,297 @@
+"""
+Optionale Vorverarbeitung vor dem Upload: Bilder in PDFs neu komprimieren.
+
+Gescannte PDFs enthalten oft Farb-JPEGs mit 600 dpi oder unkomprimierte Bilder. Für den
+Upload zu Llama Split/Parse wird eine leichte Kopie erzeugt, in der Bilder auf eine
+Ziel-Auflösung verkleinert und als JPEG gespeichert werden (Graustufen für Textscans).
+Das Original im data-Ordner bleibt für die Anzeige unverändert.
+
+Aktiviert über FLATSCOUTS_OPTIMIZE_IMAGES=1 oder --optimize-images bei split_document.py
+bzw. parse_segments.py.
+
+Beispiel:
+    python preprocess.py data/scan.pdf --dpi 150 --quality 70
+"""
+import argparse
+import hashlib
+import io
+import os
+import shutil
+import sys
+import time
+from contextlib import contextmanager
+from pathlib import Path
+import fitz  # PyMuPDF
+from PIL import Image, ImageChops
+import metrics
+
+# Konfiguration
+DATA_DIR = Path(os.environ.get("FLATSCOUTS_DATA_DIR", Path(__file__).parent / "data"))
+OPTIMIZED_DIR = DATA_DIR / ".optimized"
+
+# Standard für split_document.py/parse_segments.py, falls nicht per Option gesetzt
+ENABLED = os.environ.get("FLATSCOUTS_OPTIMIZE_IMAGES", "").lower() in ("1", "true", "yes", "on")
+
+TARGET_DPI = 200  # Reicht für OCR von Text
+JPEG_QUALITY = 75
+DPI_TOLERANCE = 1.2  # Bilder bis 20 % über der Ziel-Auflösung bleiben unverändert
+GRAY_TOLERANCE = 12  # Maximale Farbabweichung, bis zu der ein Bild als Graustufen gilt
+MIN_IMAGE_BYTES = 20 * 1024  # Kleine Bilder (Logos, Unterschriften) nicht anfassen
+COMPRESSED_FILTERS = ("DCTDecode", "JPXDecode")
+# Kopien anderer Versionen/Einstellungen, die so lange unbenutzt sind, dürfen gelöscht werden
+# (ein anderer Worker könnte sie sonst gerade hochladen)
+COPY_GRACE_SECONDS = 3600
+
+
+def _is_grayscale(image: Image.Image) -> bool:
+    """True, wenn sich die Farbkanäle kaum unterscheiden (typischer Textscan)"""
+    if image.mode == "L":
+        return True
+    sample = image.convert("RGB")
+    sample.thumbnail((256, 256))
+    red, green, blue = sample.split()
+    max_diff = max(
+        ImageChops.difference(red, green).getextrema()[1],
+        ImageChops.difference(green, blue).getextrema()[1]
+    )
+    return max_diff <= GRAY_TOLERANCE
+
+
+def _display_dpi(page, xref: int, width: int) -> float:
+    """Effektive Auflösung eines Bildes anhand seiner größten Darstellung auf der Seite"""
+    rects = page.get_image_rects(xref)
+    widest = max((rect.width for rect in rects), default=0)
+    if widest <= 0:
+        return 0
+    return width / (widest / 72)
+
+
+def _recompress(doc, xref: int, scale: float, quality: int, grayscale):
+    """
+    Liefert das Bild neu als JPEG (oder None, falls es nicht verarbeitet werden kann).
+
+    Returns:
+        Tuple (JPEG-Daten, Breite, Höhe, Farbraum "/DeviceGray" bzw. "/DeviceRGB") oder None
+    """
+    pix = fitz.Pixmap(doc, xref)
+    if pix.alpha or pix.n not in (1, 3, 4):
+        # Transparenz bzw. Sonderfarbräume unverändert lassen
+        return None
+    if pix.n == 4:
+        pix = fitz.Pixmap(fitz.csRGB, pix)
+    mode = "L" if pix.n == 1 else "RGB"
+    image = Image.frombytes(mode, (pix.width, pix.height), pix.samples)
+
+    if scale < 1:
+        size = (max(1, round(image.width * scale)), max(1, round(image.height * scale)))
+        image = image.resize(size, Image.LANCZOS)
+    if grayscale is True or (grayscale == "auto" and _is_grayscale(image)):
+        image = image.convert("L")
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=quality, optimize=True)
+    colorspace = "/DeviceGray" if image.mode == "L" else "/DeviceRGB"
+    return buffer.getvalue(), image.width, image.height, colorspace
+
+
+def _replace_stream(doc, xref: int, data: bytes, width: int, height: int, colorspace: str):
+    """
+    Ersetzt das Bild im vorhandenen Objekt. page.replace_image würde ein zusätzliches
+    Hilfsbild in den Seitenressourcen anlegen, das garbage=3 nicht entfernt (Bild doppelt).
+    """
+    doc.update_stream(xref, data, compress=False)
+    doc.xref_set_key(xref, "Filter", "/DCTDecode")
+    doc.xref_set_key(xref, "Width", str(width))
+    doc.xref_set_key(xref, "Height", str(height))
+    doc.xref_set_key(xref, "ColorSpace", colorspace)
+    doc.xref_set_key(xref, "BitsPerComponent", "8")
+    # Parameter und Decode-Array gehörten zum alten Filter bzw. den alten Samples
+    doc.xref_set_key(xref, "DecodeParms", "null")
+    doc.xref_set_key(xref, "Decode", "null")
+
+
+def optimize_pdf(pdf_path: Path, out_path: Path, dpi: int = TARGET_DPI, quality: int = JPEG_QUALITY,
+                 grayscale="auto") -> dict:
+    """
+    Schreibt eine Kopie des PDFs mit neu komprimierten Bildern.
+
+    Args:
+        dpi: Ziel-Auflösung; höher aufgelöste Bilder werden verkleinert
+        quality: JPEG-Qualität der neu geschriebenen Bilder
+        grayscale: "auto" (Textscans erkennen), True (immer) oder False (nie)
+
+    Returns:
+        Statistik: original_bytes, optimized_bytes, saved_bytes, images_rewritten, images_total
+    """
+    pdf_path = Path(pdf_path)
+    out_path = Path(out_path)
+    rewritten = 0
+    seen = set()
+
+    with fitz.open(pdf_path) as doc:
+        for page in doc:
+            for image_info in page.get_images(full=True):
+                xref, smask, width, image_filter = image_info[0], image_info[1], image_info[2], image_info[8]
+                if xref in seen or smask:
+                    continue
+                seen.add(xref)
+                if doc.xref_get_key(xref, "ImageMask")[1] == "true":
+                    # Schablonen (1 Bit, Füllfarbe der Seite) nicht in JPEG umwandeln
+                    continue
+
+                original_size = len(doc.xref_stream_raw(xref) or b"")
+                if original_size < MIN_IMAGE_BYTES:
+                    continue
+                display_dpi = _display_dpi(page, xref, width)
+                too_large = display_dpi > dpi * DPI_TOLERANCE
+                uncompressed = image_filter not in COMPRESSED_FILTERS
+                if not too_large and not uncompressed:
+                    continue
+
+                scale = dpi / display_dpi if too_large else 1.0
+                try:
+                    recompressed = _recompress(doc, xref, scale, quality, grayscale)
+                except Exception as e:
+                    print(f"Bild {xref} in {pdf_path.name} nicht verarbeitet: {e}", flush=True)
+                    continue
+                if recompressed is None or len(recompressed[0]) >= original_size:
+                    continue
+                _replace_stream(doc, xref, *recompressed)
+                rewritten += 1
+
+        out_path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = out_path.with_name(f"{out_path.name}.{os.getpid()}.tmp")
+        doc.save(str(temp_path), garbage=3, deflate=True)
+    os.replace(temp_path, out_path)
+
+    original_bytes = pdf_path.stat().st_size
+    optimized_bytes = out_path.stat().st_size
+    return {
+        "original_bytes": original_bytes,
+        "optimized_bytes": optimized_bytes,
+        "saved_bytes": original_bytes - optimized_bytes,
+        "images_rewritten": rewritten,
+        "images_total": len(seen),
+    }
+
+
+def _document_dir(pdf_path: Path, optimized_dir: Path = None) -> Path:
+    """Eigener Unterordner pro Dokument (Hash des Dateinamens)"""
+    key = hashlib.sha1(pdf_path.name.encode("utf-8")).hexdigest()[:16]
+    return Path(optimized_dir or OPTIMIZED_DIR) / key
+
+
+@contextmanager
+def _document_lock(document_dir: Path):
+    """Exklusive Sperre pro Dokument über Prozesse hinweg (parallele Split-/Parse-Worker)"""
+    document_dir.mkdir(parents=True, exist_ok=True)
+    with open(document_dir / ".lock", "a+b") as lock_file:
+        if sys.platform == "win32":
+            import msvcrt
+            lock_file.seek(0)
+            while True:
+                try:
+                    # LK_LOCK gibt nach 10 Versuchen auf - weiter warten, bis die Sperre frei ist
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if sys.platform == "win32":
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def _remove_unused_copies(document_dir: Path, keep: set):
+    """
+    Verwirft Kopien älterer Versionen bzw. anderer Einstellungen (Aufrufer hält die Sperre).
+    Kürzlich benutzte Kopien bleiben, weil ein anderer Worker sie noch hochladen könnte.
+    """
+    cutoff = time.time() - COPY_GRACE_SECONDS
+    for old_copy in document_dir.iterdir():
+        if old_copy.name == ".lock" or old_copy.name in keep:
+            continue
+        try:
+            # .tmp-Dateien stammen unter der Sperre immer von abgebrochenen Läufen
+            if old_copy.suffix == ".tmp" or old_copy.stat().st_mtime < cutoff:
+                old_copy.unlink()
+        except OSError:
+            # Bereits gelöscht oder unter Windows noch geöffnet
+            pass
+
+
+def upload_copy(pdf_path: Path, dpi: int = TARGET_DPI, quality: int = JPEG_QUALITY,
+                optimized_dir: Path = None) -> Path:
+    """
+    Pfad der leichten Upload-Kopie eines PDFs (wird bei Bedarf erzeugt und wiederverwendet).
+    Bringt die Neukomprimierung nichts, wird das Original zurückgegeben.
+    """
+    pdf_path = Path(pdf_path)
+    stat = pdf_path.stat()
+    document_dir = _document_dir(pdf_path, optimized_dir)
+    out_path = document_dir / f"{stat.st_mtime_ns}_{stat.st_size}_{dpi}_{quality}.pdf"
+    # Markierung für Dateien ohne Einsparung, damit sie nicht jedes Mal neu geprüft werden
+    skip_marker = out_path.with_suffix(".skip")
+
+    with _document_lock(document_dir):
+        if out_path.exists():
+            # Änderungszeit = letzte Benutzung (schützt die Kopie vor dem Aufräumen)
+            os.utime(out_path)
+            return out_path
+        if skip_marker.exists():
+            return pdf_path
+
+        _remove_unused_copies(document_dir, keep={out_path.name, skip_marker.name})
+        with metrics.timer("preprocess_images", document=pdf_path.name):
+            stats = optimize_pdf(pdf_path, out_path, dpi, quality)
+        if stats["saved_bytes"] <= 0:
+            out_path.unlink(missing_ok=True)
+            skip_marker.touch()
+
+    saved_mb = stats["saved_bytes"] / 1024 / 1024
+    if stats["saved_bytes"] <= 0:
+        print(f"Vorverarbeitung {pdf_path.name}: keine Einsparung, Original wird hochgeladen", flush=True)
+        return pdf_path
+    print(
+        f"Vorverarbeitung {pdf_path.name}: {stats['images_rewritten']}/{stats['images_total']} Bilder "
+        f"neu komprimiert, {saved_mb:.1f} MB gespart "
+        f"({stats['saved_bytes'] / stats['original_bytes']:.0%})",
+        flush=True
+    )
+    return out_path
+
+
+def remove_document(pdf_path: Path):
+    """Entfernt die Upload-Kopien eines gelöschten Dokuments"""
+    shutil.rmtree(_document_dir(Path(pdf_path)), ignore_errors=True)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Bilder in PDFs für den Upload neu komprimieren")
+    arg_parser.add_argument("files", nargs="+", type=Path, help="PDF-Dateien")
+    arg_parser.add_argument("--dpi", type=int, default=TARGET_DPI, help="Ziel-Auflösung")
+    arg_parser.add_argument("--quality", type=int, default=JPEG_QUALITY, help="JPEG-Qualität")
+    arg_parser.add_argument("--out-dir", type=Path, default=OPTIMIZED_DIR, help="Zielordner der Kopien")
+    args = arg_parser.parse_args()
+
+    total_saved = 0
+    for pdf_path in args.files:
+        stats = optimize_pdf(pdf_path, args.out_dir / pdf_path.name, args.dpi, args.quality)
+        total_saved += stats["saved_bytes"]
+        print(
+            f"{pdf_path.name}: {stats['original_bytes'] / 1024 / 1024:.1f} MB -> "
+            f"{stats['optimized_bytes'] / 1024 / 1024:.1f} MB, "
+            f"{stats['images_rewritten']}/{stats['images_total']} Bilder neu komprimiert"
+        )
+    print(f"Insgesamt gespart: {total_saved / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Profiling-Modus für Split- und Parse-Läufe (--profile bzw. FLATSCOUTS_PROFILE=1).
+
+Schreibt neben die Lauf-Logs (logs/):
+- profile_<lauf>_<zeit>.pstats: cProfile des Hauptthreads (python -m pstats, snakeviz)
+- profile_<lauf>_<zeit>.folded: Stichproben aller Threads im Folded-Format für
+  Flamegraphs (flamegraph.pl, speedscope, inferno). Die äußersten Einträge sind die
+  aktiven Verarbeitungsschritte aus metrics.timer(), z.B. "stage:parse_llamaparse".
+  Wartezeit auf das Netzwerk erscheint als Stapel in socket/ssl, CPU-Arbeit von PyMuPDF
+  als Stapel in fitz, JSON-Serialisierung in json.
+- profile_<lauf>_<zeit>_memory.json: tracemalloc pro Schritt (Anzahl, größter Speicherzuwachs,
+  größte Allokationen) sowie die Snapshots als .tracemalloc (tracemalloc.Snapshot.load)
+
+Beispiel:
+    python parse_segments.py --profile
+    flamegraph.pl logs/profile_parse_segments_1700000000.folded > parse.svg
+"""
+import cProfile
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+import metrics
+
+SAMPLE_INTERVAL = 0.005  # Sekunden zwischen zwei Stichproben
+TRACE_FRAMES = 10  # Tiefe der Aufrufstapel in tracemalloc
+TOP_ALLOCATIONS = 15  # Allokationen pro Schritt in der Speicherübersicht
+
+ENABLED = os.environ.get("FLATSCOUTS_PROFILE", "").lower() in ("1", "true", "yes", "on")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # co_qualname gibt es erst ab Python 3.11
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({Path(code.co_filename).name}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """
+    cProfile + Stichproben-Profiler + tracemalloc für einen Lauf.
+
+    cProfile erfasst nur den startenden Thread; die Stichproben decken alle Threads ab
+    (z.B. parallel gesplittete Seitenfenster).
+    """
+
+    def __init__(self, log_dir: Path, run_name: str, interval: float = SAMPLE_INTERVAL,
+                 trace_memory: bool = True):
+        self.log_dir = Path(log_dir)
+        self.run_name = run_name
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.started_at = None
+        self.samples = Counter()
+        self.memory = {}
+        self._profile = cProfile.Profile()
+        self._stages = {}  # Thread-ID -> Stapel aktiver Schritte
+        self._stage_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler = None
+        self._started_tracemalloc = False
+
+    # ------------------------------------------------------------------
+    # Schritte aus metrics.timer()
+    # ------------------------------------------------------------------
+
+    def stage_started(self, stage: str):
+        thread_id = threading.get_ident()
+        with self._stage_lock:
+            self._stages.setdefault(thread_id, []).append((stage, self._traced_current()))
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+
+    def stage_finished(self, stage: str, seconds: float):
+        thread_id = threading.get_ident()
+        with self._stage_lock:
+            stack = self._stages.get(thread_id) or []
+            current_at_start = stack.pop()[1] if stack else 0
+            if not stack:
+                self._stages.pop(thread_id, None)
+        if not self.trace_memory:
+            return
+        # Näherungswert: bei parallelen Threads bzw. verschachtelten Schritten enthält der
+        # Spitzenwert auch deren Allokationen
+        peak_growth = max(tracemalloc.get_traced_memory()[1] - current_at_start, 0)
+        entry = self.memory.setdefault(stage, {"count": 0, "seconds": 0.0, "max_peak_growth_bytes": 0})
+        entry["count"] += 1
+        entry["seconds"] += seconds
+        if peak_growth > entry["max_peak_growth_bytes"] or "snapshot" not in entry:
+            entry["max_peak_growth_bytes"] = max(peak_growth, entry["max_peak_growth_bytes"])
+            # Snapshot der Ausführung mit dem größten Speicherzuwachs behalten
+            entry["snapshot"] = tracemalloc.take_snapshot()
+
+    def _traced_current(self) -> int:
+        return tracemalloc.get_traced_memory()[0] if self.trace_memory else 0
+
+    # ------------------------------------------------------------------
+    # Stichproben
+    # ------------------------------------------------------------------
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            with self._stage_lock:
+                stages = {thread_id: [name for name, _ in stack] for thread_id, stack in self._stages.items()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.reverse()
+                prefix = [f"stage:{name}" for name in stages.get(thread_id, [])]
+                self.samples[";".join(prefix + stack)] += 1
+
+    # ------------------------------------------------------------------
+    # Start, Stopp und Ausgabe
+    # ------------------------------------------------------------------
+
+    def start(self):
+        self.started_at = time.time()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start(TRACE_FRAMES)
+            self._started_tracemalloc = True
+        metrics.add_stage_listener(self)
+        self._sampler = threading.Thread(target=self._sample_loop, name="profiling-sampler", daemon=True)
+        self._sampler.start()
+        self._profile.enable()
+        return self
+
+    def stop(self) -> dict:
+        """Beendet das Profiling und schreibt die Dateien. Returns: Pfade der geschriebenen Dateien"""
+        self._profile.disable()
+        self._stop.set()
+        self._sampler.join()
+        metrics.remove_stage_listener(self)
+        try:
+            return self.write()
+        finally:
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+
+    def write(self) -> dict:
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        prefix = self.log_dir / f"profile_{self.run_name}_{int(self.started_at)}"
+        files = {}
+
+        files["pstats"] = prefix.with_suffix(".pstats")
+        self._profile.dump_stats(str(files["pstats"]))
+
+        files["folded"] = prefix.with_suffix(".folded")
+        with open(files["folded"], "w", encoding="utf-8") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+        if self.trace_memory:
+            files["memory"] = prefix.with_name(prefix.name + "_memory.json")
+            stages = {}
+            for stage, entry in sorted(self.memory.items()):
+                snapshot = entry["snapshot"]
+                snapshot_file = prefix.with_name(f"{prefix.name}_{stage}.tracemalloc")
+                snapshot.dump(str(snapshot_file))
+                top = snapshot.statistics("lineno")[:TOP_ALLOCATIONS]
+                stages[stage] = {
+                    "count": entry["count"],
+                    "seconds": round(entry["seconds"], 4),
+                    "max_peak_growth_bytes": entry["max_peak_growth_bytes"],
+                    "snapshot": snapshot_file.name,
+                    "top_allocations": [
+                        {"location": str(stat.traceback[0]), "size_bytes": stat.size, "count": stat.count}
+                        for stat in top
+                    ],
+                }
+            current, peak = tracemalloc.get_traced_memory()
+            with open(files["memory"], "w", encoding="utf-8") as f:
+                json.dump({
+                    "run": self.run_name,
+                    "traced_current_bytes": current,
+                    "traced_peak_bytes": peak,
+                    "stages": stages,
+                }, f, indent=2, ensure_ascii=False)
+        return files
+
+
+@contextmanager
+def _profiled(log_dir: Path, run_name: str):
+    profiler = Profiler(log_dir, run_name).start()
+    try:
+        yield profiler
+    finally:
+        files = profiler.stop()
+        print(f"Profil gespeichert in: {', '.join(str(path) for path in files.values())}", flush=True)
+
+
+def profile(log_dir: Path, run_name: str, enabled: bool = True):
+    """Kontextmanager: profiliert den Block, wenn enabled gesetzt ist (sonst ohne Wirkung)"""
+    return _profiled(log_dir, run_name) if enabled else nullcontext()
@@ -0,0 +1,451 @@
+"""
+Speicherschicht für Split- und Parse-Ergebnisse (SQLite, ein Eintrag pro Dokument).
+
+Ersetzt die monolithischen Dateien split_results.json und parsed_segments.json:
+Ergebnisse werden pro Dokument geschrieben und gelesen, Text und Markdown der
+Segmente werden nur bei Bedarf geladen. Für Kompatibilität können die alten
+JSON-Dateien weiterhin exportiert werden:
+
+    python result_store.py export   # schreibt split_results.json und parsed_segments.json
+    python result_store.py import   # übernimmt vorhandene JSON-Dateien in den Speicher
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+# Konfiguration
+DATA_DIR = Path(os.environ.get("FLATSCOUTS_DATA_DIR", Path(__file__).parent / "data"))
+DB_FILE = DATA_DIR / "results.sqlite"
+LEGACY_SPLIT_FILE = "split_results.json"
+LEGACY_PARSED_FILE = "parsed_segments.json"
+
+# Felder von "parsed", die getrennt gespeichert und nur bei Bedarf geladen werden
+CONTENT_FIELDS = ("text", "markdown")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS split_results (
+        file TEXT PRIMARY KEY,
+        segments TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS parsed_documents (
+        file TEXT PRIMARY KEY,
+        content_hash TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS parsed_segments (
+        file TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        name TEXT,
+        segment TEXT NOT NULL,
+        text TEXT,
+        markdown TEXT,
+        PRIMARY KEY (file, position)
+    );
+    CREATE TABLE IF NOT EXISTS parsed_pages (
+        file TEXT NOT NULL,
+        page INTEGER NOT NULL,
+        fingerprint TEXT NOT NULL,
+        text TEXT,
+        markdown TEXT,
+        PRIMARY KEY (file, page)
+    );
+    CREATE TABLE IF NOT EXISTS manifests (
+        file TEXT PRIMARY KEY,
+        manifest TEXT NOT NULL,
+        updated_at REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value TEXT
+    );
+"""
+
+
+def _json(value) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+def content_hash(segments: list) -> str:
+    """Inhalts-Hash der geparsten Segmente eines Dokuments"""
+    return hashlib.sha256(_json(segments).encode("utf-8")).hexdigest()
+
+
+class ResultStore:
+    """Zugriff auf die Ergebnis-Datenbank. Jede Methode nutzt eine eigene kurze Verbindung."""
+
+    def __init__(self, db_file: Path = None):
+        self.db_file = Path(db_file or DB_FILE)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        is_new = not self.db_file.exists()
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+        if is_new:
+            # Bestehende JSON-Ergebnisse beim ersten Start automatisch übernehmen
+            imported = self.import_legacy(self.db_file.parent)
+            if imported:
+                print(f"Ergebnis-Speicher aus JSON-Dateien übernommen: {imported} Dokument(e)", flush=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_file), timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _bump_revision(conn):
+        """Erhöht den Revisionszähler (für Cache-Signaturen) innerhalb der Schreibtransaktion"""
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('revision', '1') "
+            "ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+
+    def revision(self) -> int:
+        """Revisionszähler: ändert sich bei jedem Schreibvorgang"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'revision'").fetchone()
+        finally:
+            conn.close()
+        return int(row[0]) if row else 0
+
+    # ------------------------------------------------------------------
+    # Split-Ergebnisse
+    # ------------------------------------------------------------------
+
+    def upsert_split(self, filename: str, segments: list):
+        """Speichert die Split-Segmente eines Dokuments (ersetzt vorhandene)"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO split_results (file, segments, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(file) DO UPDATE SET segments = excluded.segments, updated_at = excluded.updated_at",
+                    (filename, _json(segments), time.time())
+                )
+                self._bump_revision(conn)
+        finally:
+            conn.close()
+
+    def get_split(self, filename: str):
+        """Split-Segmente eines Dokuments oder None"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT segments FROM split_results WHERE file = ?", (filename,)).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
+
+    def all_split(self) -> dict:
+        """Alle Split-Ergebnisse als Dictionary (Dateiname -> Segmente), in Einfügereihenfolge"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT file, segments FROM split_results ORDER BY rowid").fetchall()
+        finally:
+            conn.close()
+        return {filename: json.loads(segments) for filename, segments in rows}
+
+    def has_split(self) -> bool:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT 1 FROM split_results LIMIT 1").fetchone() is not None
+        finally:
+            conn.close()
+
+    def retain_split(self, filenames):
+        """Entfernt Split-Ergebnisse aller Dokumente, die nicht in filenames enthalten sind"""
+        keep = set(filenames)
+        conn = self._connect()
+        try:
+            with conn:
+                stale = [row[0] for row in conn.execute("SELECT file FROM split_results") if row[0] not in keep]
+                conn.executemany("DELETE FROM split_results WHERE file = ?", [(f,) for f in stale])
+                if stale:
+                    self._bump_revision(conn)
+        finally:
+            conn.close()
+
+    # ------------------------------------------------------------------
+    # Parse-Ergebnisse
+    # ------------------------------------------------------------------
+
+    def upsert_parsed(self, filename: str, segments: list, pages: list = None):
+        """
+        Speichert die geparsten Segmente eines Dokuments (ersetzt vorhandene).
+
+        Args:
+            pages: Optional Parse-Ergebnis pro Seite als Dicts mit page, fingerprint, text,
+                markdown (ersetzt die gespeicherten Seiten des Dokuments)
+        """
+        document_hash = content_hash(segments)
+        rows = []
+        for position, segment in enumerate(segments):
+            segment = dict(segment)
+            parsed = dict(segment.get("parsed") or {})
+            content = {field: parsed.pop(field, None) for field in CONTENT_FIELDS}
+            segment["parsed"] = parsed
+            rows.append((
+                filename, position, segment.get("name"), _json(segment),
+                content["text"], content["markdown"]
+            ))
+
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM parsed_segments WHERE file = ?", (filename,))
+                conn.executemany(
+                    "INSERT INTO parsed_segments (file, position, name, segment, text, markdown) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    rows
+                )
+                conn.execute(
+                    "INSERT INTO parsed_documents (file, content_hash, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(file) DO UPDATE SET content_hash = excluded.content_hash, "
+                    "updated_at = excluded.updated_at",
+                    (filename, document_hash, time.time())
+                )
+                if pages is not None:
+                    conn.execute("DELETE FROM parsed_pages WHERE file = ?", (filename,))
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO parsed_pages (file, page, fingerprint, text, markdown) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        [(filename, page["page"], page["fingerprint"], page.get("text"), page.get("markdown"))
+                         for page in pages]
+                    )
+                self._bump_revision(conn)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_segment(row, include_content):
+        """Baut ein Segment aus einer Zeile; ohne include_content enthält die letzte Spalte die Markdown-Länge"""
+        segment_json, text, markdown = row
+        segment = json.loads(segment_json)
+        parsed = segment.get("parsed", {})
+        if "error" in parsed:
+            return segment
+        if include_content:
+            # Ursprüngliche Feldreihenfolge wiederherstellen: text, markdown, num_pages_parsed
+            segment["parsed"] = {"text": text or "", "markdown": markdown or "", **parsed}
+        else:
+            parsed["markdown_length"] = markdown or 0
+        return segment
+
+    def get_parsed(self, filename: str, include_content: bool = True):
+        """Geparste Segmente eines Dokuments oder None. Ohne include_content fehlen Text und Markdown."""
+        conn = self._connect()
+        try:
+            if conn.execute("SELECT 1 FROM parsed_documents WHERE file = ?", (filename,)).fetchone() is None:
+                return None
+            columns = "segment, text, markdown" if include_content else "segment, NULL, length(markdown)"
+            rows = conn.execute(
+                f"SELECT {columns} FROM parsed_segments WHERE file = ? ORDER BY position",
+                (filename,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [self._row_to_segment(row, include_content) for row in rows]
+
+    def all_parsed(self, include_content: bool = True) -> dict:
+        """Alle Parse-Ergebnisse als Dictionary (Dateiname -> Segmente)"""
+        columns = "s.segment, s.text, s.markdown" if include_content else "s.segment, NULL, length(s.markdown)"
+        conn = self._connect()
+        try:
+            files = [row[0] for row in conn.execute("SELECT file FROM parsed_documents ORDER BY rowid")]
+            results = {filename: [] for filename in files}
+            for row in conn.execute(
+                f"SELECT s.file, {columns} FROM parsed_segments s "
+                "JOIN parsed_documents d ON d.file = s.file ORDER BY d.rowid, s.position"
+            ):
+                results[row[0]].append(self._row_to_segment(row[1:], include_content))
+        finally:
+            conn.close()
+        return results
+
+    def get_pages(self, filename: str) -> dict:
+        """Gespeichertes Parse-Ergebnis pro Seite (Seitennummer -> fingerprint, text, markdown)"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT page, fingerprint, text, markdown FROM parsed_pages WHERE file = ? ORDER BY page",
+                (filename,)
+            ).fetchall()
+        finally:
+            conn.close()
+        return {
+            page: {"fingerprint": fingerprint, "text": text or "", "markdown": markdown or ""}
+            for page, fingerprint, text, markdown in rows
+        }
+
+    def parsed_hashes(self) -> dict:
+        """Inhalts-Hash pro geparstem Dokument (für inkrementelle Abgleiche, z.B. den Suchindex)"""
+        conn = self._connect()
+        try:
+            return dict(conn.execute("SELECT file, content_hash FROM parsed_documents"))
+        finally:
+            conn.close()
+
+    def has_parsed(self) -> bool:
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT 1 FROM parsed_documents LIMIT 1").fetchone() is not None
+        finally:
+            conn.close()
+
+    def retain_parsed(self, filenames):
+        """Entfernt Parse-Ergebnisse aller Dokumente, die nicht in filenames enthalten sind"""
+        keep = set(filenames)
+        conn = self._connect()
+        try:
+            with conn:
+                stale = [row[0] for row in conn.execute("SELECT file FROM parsed_documents") if row[0] not in keep]
+                for filename in stale:
+                    conn.execute("DELETE FROM parsed_segments WHERE file = ?", (filename,))
+                    conn.execute("DELETE FROM parsed_pages WHERE file = ?", (filename,))
+                    conn.execute("DELETE FROM parsed_documents WHERE file = ?", (filename,))
+                if stale:
+                    self._bump_revision(conn)
+        finally:
+            conn.close()
+
+    def get_segment_content(self, filename: str, segment_name: str):
+        """Text und Markdown eines einzelnen Segments (lazy Laden) oder None"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT text, markdown FROM parsed_segments WHERE file = ? AND name = ?",
+                (filename, segment_name)
+            ).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            return None
+        return {"text": row[0] or "", "markdown": row[1] or ""}
+
+    # ------------------------------------------------------------------
+    # Manifeste (Seitenzahl, Seitengrößen, Segment -> Seiten, siehe manifests.py)
+    # ------------------------------------------------------------------
+
+    def upsert_manifest(self, filename: str, manifest: dict):
+        """
+        Speichert das Manifest eines Dokuments (ersetzt ein vorhandenes).
+
+        Ändert die Revision nicht: das Manifest folgt aus dem PDF, dessen Änderungen schon die
+        Signatur von /api/documents ändern. Sonst würde das Nachberechnen beim Aufbau der
+        Dokumentenliste den eben gebauten Cache-Eintrag sofort wieder ungültig machen.
+        """
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO manifests (file, manifest, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(file) DO UPDATE SET manifest = excluded.manifest, updated_at = excluded.updated_at",
+                    (filename, _json(manifest), time.time())
+                )
+        finally:
+            conn.close()
+
+    def get_manifest(self, filename: str):
+        """Manifest eines Dokuments oder None"""
+        conn = self._connect()
+        try:
+            row = conn.execute("SELECT manifest FROM manifests WHERE file = ?", (filename,)).fetchone()
+        finally:
+            conn.close()
+        return json.loads(row[0]) if row else None
+
+    def all_manifests(self) -> dict:
+        """Alle Manifeste (Dateiname -> Manifest)"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT file, manifest FROM manifests").fetchall()
+        finally:
+            conn.close()
+        return {filename: json.loads(manifest) for filename, manifest in rows}
+
+    # ------------------------------------------------------------------
+    # Dokumente, Export und Import
+    # ------------------------------------------------------------------
+
+    def delete_document(self, filename: str):
+        """Entfernt alle Ergebnisse eines Dokuments"""
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("DELETE FROM split_results WHERE file = ?", (filename,))
+                conn.execute("DELETE FROM parsed_segments WHERE file = ?", (filename,))
+                conn.execute("DELETE FROM parsed_pages WHERE file = ?", (filename,))
+                conn.execute("DELETE FROM parsed_documents WHERE file = ?", (filename,))
+                conn.execute("DELETE FROM manifests WHERE file = ?", (filename,))
+                self._bump_revision(conn)
+        finally:
+            conn.close()
+
+    def export_legacy(self, target_dir: Path = None):
+        """Schreibt split_results.json und parsed_segments.json im bisherigen Format"""
+        target_dir = Path(target_dir or self.db_file.parent)
+        exported = []
+        for filename, data in ((LEGACY_SPLIT_FILE, self.all_split()), (LEGACY_PARSED_FILE, self.all_parsed())):
+            path = target_dir / filename
+            temp_path = path.with_name(path.name + ".tmp")
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            os.replace(temp_path, path)
+            exported.append(path)
+        return exported
+
+    def import_legacy(self, source_dir: Path = None) -> int:
+        """Übernimmt split_results.json und parsed_segments.json (falls vorhanden) in den Speicher"""
+        source_dir = Path(source_dir or self.db_file.parent)
+        imported = set()
+        split_path = source_dir / LEGACY_SPLIT_FILE
+        if split_path.exists():
+            with open(split_path, "r", encoding="utf-8") as f:
+                for filename, segments in json.load(f).items():
+                    self.upsert_split(filename, segments)
+                    imported.add(filename)
+        parsed_path = source_dir / LEGACY_PARSED_FILE
+        if parsed_path.exists():
+            with open(parsed_path, "r", encoding="utf-8") as f:
+                for filename, segments in json.load(f).items():
+                    self.upsert_parsed(filename, segments)
+                    imported.add(filename)
+        return len(imported)
+
+
+_stores = {}
+
+
+def get_store(data_dir: Path = None) -> ResultStore:
+    """Gemeinsamer Speicher für den data-Ordner (oder einen anderen Datenordner)"""
+    db_file = Path(data_dir) / DB_FILE.name if data_dir else DB_FILE
+    store = _stores.get(db_file)
+    if store is None:
+        store = _stores[db_file] = ResultStore(db_file)
+    return store
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Ergebnis-Speicher verwalten")
+    arg_parser.add_argument("command", choices=["export", "import"],
+                            help="export: JSON-Dateien schreiben, import: JSON-Dateien übernehmen")
+    arg_parser.add_argument("--dir", type=Path, default=DATA_DIR, help="Zielordner bzw. Quellordner")
+    args = arg_parser.parse_args()
+
+    store = get_store()
+    if args.command == "export":
+        for path in store.export_legacy(args.dir):
+            print(f"Exportiert: {path}")
+    else:
+        print(f"{store.import_legacy(args.dir)} Dokument(e) übernommen")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Reihenfolge der Verarbeitung nach geschätztem Aufwand (kürzester Job zuerst).
+
+Die Kosten eines Dokuments oder Segments werden aus Seitenzahl und Dateigröße
+geschätzt. Damit große Dateien nicht verhungern, sinken die effektiven Kosten mit
+der Wartezeit (Aging). Frisch über die Oberfläche hochgeladene Dokumente werden
+als priorisiert markiert und immer zuerst verarbeitet.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+# Konfiguration
+DATA_DIR = Path(os.environ.get("FLATSCOUTS_DATA_DIR", Path(__file__).parent / "data"))
+PRIORITY_FILE = DATA_DIR / "priority.json"
+
+# Kostenmodell (geschätzte Sekunden)
+BASE_COST = 5.0  # Fester Aufwand pro Job (Upload, Job anlegen, Polling)
+PAGE_COST = 2.0  # Pro Seite
+MB_COST = 0.5  # Pro MB Dateigröße (Upload, Bildseiten)
+
+# Pro Sekunde Wartezeit sinken die effektiven Kosten um diesen Wert. Ein Dokument mit
+# 800 Seiten (~1600 s) überholt damit nach ~4.5 Stunden Wartezeit auch neue 1-Seiter.
+AGING_FACTOR = 0.1
+
+# Priorität frischer Uploads verfällt nach dieser Zeit (Sekunden)
+PRIORITY_TTL = 6 * 3600
+
+_info_cache = {}
+_priority_lock = threading.Lock()
+
+
+def document_info(pdf_path: Path) -> dict:
+    """Seitenzahl und Größe eines PDFs (gecacht, solange die Datei unverändert ist)"""
+    pdf_path = Path(pdf_path)
+    stat = pdf_path.stat()
+    key = (str(pdf_path), stat.st_mtime_ns, stat.st_size)
+    info = _info_cache.get(key)
+    if info is None:
+        import fitz  # PyMuPDF - erst bei Bedarf laden (Importzeit)
+        try:
+            with fitz.open(pdf_path) as doc:
+                pages = len(doc)
+        except Exception as e:
+            print(f"Seitenzahl von {pdf_path.name} nicht lesbar: {e}", flush=True)
+            pages = 1
+        info = _info_cache[key] = {"pages": pages, "size_bytes": stat.st_size, "mtime": stat.st_mtime}
+    return info
+
+
+def estimate_cost(pages: int, size_bytes: int) -> float:
+    """Geschätzter Aufwand in Sekunden"""
+    return BASE_COST + PAGE_COST * pages + MB_COST * size_bytes / 1024 / 1024
+
+
+def document_cost(pdf_path: Path) -> float:
+    """Geschätzter Aufwand für ein ganzes Dokument"""
+    info = document_info(pdf_path)
+    return estimate_cost(info["pages"], info["size_bytes"])
+
+
+def segment_cost(pdf_path: Path, pages: list) -> float:
+    """Geschätzter Aufwand für ein Segment (Dateigröße anteilig nach Seiten)"""
+    info = document_info(pdf_path)
+    share = len(pages) / max(info["pages"], 1)
+    return estimate_cost(len(pages), info["size_bytes"] * share)
+
+
+def effective_cost(cost: float, arrived_at: float, now: float = None) -> float:
+    """Kosten abzüglich Wartezeit-Bonus (Aging)"""
+    now = now or time.time()
+    return cost - AGING_FACTOR * max(now - arrived_at, 0)
+
+
+# ----------------------------------------------------------------------
+# Priorität frischer Uploads
+# ----------------------------------------------------------------------
+
+def _priority_file(data_dir: Path = None) -> Path:
+    return Path(data_dir) / PRIORITY_FILE.name if data_dir else PRIORITY_FILE
+
+
+def _load_priorities(data_dir: Path = None) -> dict:
+    priority_file = _priority_file(data_dir)
+    if priority_file.exists():
+        try:
+            with open(priority_file, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Fehler beim Laden der Prioritäten: {e}", flush=True)
+    return {}
+
+
+def _save_priorities(priorities: dict, data_dir: Path = None):
+    priority_file = _priority_file(data_dir)
+    priority_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = priority_file.with_name(f"{priority_file.name}.{os.getpid()}.tmp")
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(priorities, f, indent=2, ensure_ascii=False)
+    os.replace(temp_file, priority_file)
+
+
+def mark_priority(filename: str, data_dir: Path = None):
+    """Markiert ein Dokument als priorisiert (z.B. frischer Upload über die Oberfläche)"""
+    with _priority_lock:
+        priorities = _load_priorities(data_dir)
+        priorities[filename] = time.time()
+        _save_priorities(priorities, data_dir)
+
+
+def clear_priority(filename: str, data_dir: Path = None):
+    """Entfernt die Priorität (nach abgeschlossener Verarbeitung oder Löschen)"""
+    with _priority_lock:
+        priorities = _load_priorities(data_dir)
+        if priorities.pop(filename, None) is not None:
+            _save_priorities(priorities, data_dir)
+
+
+def priorities(data_dir: Path = None) -> dict:
+    """Priorisierte Dokumente mit Zeitpunkt der Markierung (abgelaufene ausgenommen)"""
+    now = time.time()
+    return {name: marked for name, marked in _load_priorities(data_dir).items() if now - marked < PRIORITY_TTL}
+
+
+# ----------------------------------------------------------------------
+# Reihenfolge
+# ----------------------------------------------------------------------
+
+def order(items: list, cost_of, arrived_of, priority_of=None) -> list:
+    """
+    Sortiert Arbeit: priorisierte zuerst (älteste Markierung vorne), dann nach
+    effektiven Kosten (kürzester Job zuerst mit Aging).
+
+    Args:
+        cost_of: Funktion(item) -> geschätzte Kosten
+        arrived_of: Funktion(item) -> Zeitpunkt, seit dem das Item wartet
+        priority_of: Optionale Funktion(item) -> Markierungszeitpunkt oder None
+    """
+    now = time.time()
+
+    def sort_key(item):
+        marked = priority_of(item) if priority_of else None
+        if marked is not None:
+            return (0, marked)
+        return (1, effective_cost(cost_of(item), arrived_of(item), now))
+
+    return sorted(items, key=sort_key)
+
+
+def order_pdf_files(pdf_files: list, data_dir: Path = None) -> list:
+    """Reihenfolge für den Split: Wartezeit zählt ab Upload (Änderungszeit der Datei)"""
+    marked = priorities(data_dir)
+    existing = [pdf_file for pdf_file in pdf_files if pdf_file.exists()]
+    missing = [pdf_file for pdf_file in pdf_files if not pdf_file.exists()]
+    ordered = order(
+        existing,
+        cost_of=document_cost,
+        arrived_of=lambda pdf_file: document_info(pdf_file)["mtime"],
+        priority_of=lambda pdf_file: marked.get(pdf_file.name)
+    )
+    # Fehlende Dateien zuletzt, damit sie wie bisher als Fehler gemeldet werden
+    return ordered + missing
+
+
+def order_split_results(split_results: dict, data_dir: Path = None) -> dict:
+    """Reihenfolge für das Parsen: Kosten = Summe der Segmentkosten eines Dokuments"""
+    marked = priorities(data_dir)
+    data_dir = Path(data_dir or DATA_DIR)
+
+    def cost_of(filename):
+        pdf_path = data_dir / filename
+        if not pdf_path.exists():
+            return 0
+        return sum(segment_cost(pdf_path, segment.get("pages") or []) for segment in split_results[filename])
+
+    def arrived_of(filename):
+        pdf_path = data_dir / filename
+        return document_info(pdf_path)["mtime"] if pdf_path.exists() else 0
+
+    ordered = order(list(split_results), cost_of, arrived_of, priority_of=marked.get)
+    return {filename: split_results[filename] for filename in ordered}
@@ -0,0 +1,217 @@
+"""Lokaler Volltext-Index (SQLite FTS5) über die geparsten Segmente"""
+import html
+import json
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from result_store import content_hash, get_store
+
+# Konfiguration
+DATA_DIR = Path(os.environ.get("FLATSCOUTS_DATA_DIR", Path(__file__).parent / "data"))
+INDEX_FILE = DATA_DIR / "search_index.sqlite"
+
+SNIPPET_TOKENS = 16
+# Platzhalter für die Treffermarkierung (Zeichen aus dem Private-Use-Bereich), damit der
+# Ausschnitt zuerst HTML-escaped und erst danach mit <mark> versehen werden kann
+MARK_START, MARK_END = "\ue000", "\ue001"
+
+_sync_lock = threading.Lock()
+
+
+def connect(index_file: Path = None) -> sqlite3.Connection:
+    """Öffnet den Index und legt das Schema bei Bedarf an"""
+    index_file = index_file or INDEX_FILE
+    index_file.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(index_file), timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS segments USING fts5(
+            file,
+            segment,
+            category,
+            pages UNINDEXED,
+            content,
+            tokenize = 'unicode61 remove_diacritics 2'
+        );
+        CREATE TABLE IF NOT EXISTS documents (
+            file TEXT PRIMARY KEY,
+            content_hash TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """)
+    return conn
+
+
+def _segment_content(segment: dict) -> str:
+    """Durchsuchbarer Inhalt eines Segments (Markdown, sonst reiner Text)"""
+    parsed = segment.get("parsed") or {}
+    content = parsed.get("markdown") or parsed.get("text") or ""
+    return content.replace(MARK_START, "").replace(MARK_END, "")
+
+
+def _index_document(conn: sqlite3.Connection, filename: str, segments: list, document_hash: str = None):
+    conn.execute("DELETE FROM segments WHERE file = ?", (filename,))
+    rows = []
+    for segment in segments:
+        content = _segment_content(segment)
+        if not content:
+            continue
+        rows.append((
+            filename,
+            segment.get("name", ""),
+            segment.get("category", ""),
+            json.dumps(segment.get("pages") or []),
+            content
+        ))
+    conn.executemany(
+        "INSERT INTO segments (file, segment, category, pages, content) VALUES (?, ?, ?, ?, ?)",
+        rows
+    )
+    conn.execute(
+        "INSERT OR REPLACE INTO documents (file, content_hash) VALUES (?, ?)",
+        (filename, document_hash or content_hash(segments))
+    )
+    return len(rows)
+
+
+def index_document(filename: str, segments: list, data_dir: Path = None) -> int:
+    """
+    Aktualisiert den Index für ein einzelnes Dokument (inkrementell nach jedem Parse-Ergebnis).
+
+    Args:
+        data_dir: Anderer Datenordner als der Standard (z.B. für Benchmarks)
+
+    Returns:
+        Anzahl indexierter Segmente
+    """
+    conn = connect(Path(data_dir) / INDEX_FILE.name if data_dir else None)
+    try:
+        with conn:
+            return _index_document(conn, filename, segments)
+    finally:
+        conn.close()
+
+
+def remove_document(filename: str):
+    """Entfernt ein Dokument aus dem Index"""
+    conn = connect()
+    try:
+        with conn:
+            conn.execute("DELETE FROM segments WHERE file = ?", (filename,))
+            conn.execute("DELETE FROM documents WHERE file = ?", (filename,))
+    finally:
+        conn.close()
+
+
+def sync_if_stale():
+    """
+    Gleicht den Index mit dem Ergebnis-Speicher ab, falls sich dieser seit dem letzten
+    Abgleich geändert hat. Nur geänderte Dokumente werden neu indexiert, nicht mehr
+    vorhandene entfernt.
+
+    Returns:
+        Statistik mit Anzahl aktualisierter und entfernter Dokumente oder None wenn aktuell
+    """
+    store = get_store()
+    revision = str(store.revision())
+
+    with _sync_lock:
+        conn = connect()
+        try:
+            row = conn.execute("SELECT value FROM meta WHERE key = 'store_revision'").fetchone()
+            if row and row[0] == revision:
+                return None
+
+            updated = removed = 0
+            with conn:
+                known = dict(conn.execute("SELECT file, content_hash FROM documents"))
+                current = store.parsed_hashes()
+                for filename, document_hash in current.items():
+                    if known.get(filename) != document_hash:
+                        _index_document(conn, filename, store.get_parsed(filename) or [], document_hash)
+                        updated += 1
+                for filename in set(known) - set(current):
+                    conn.execute("DELETE FROM segments WHERE file = ?", (filename,))
+                    conn.execute("DELETE FROM documents WHERE file = ?", (filename,))
+                    removed += 1
+                conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('store_revision', ?)",
+                    (revision,)
+                )
+        finally:
+            conn.close()
+        return {"updated": updated, "removed": removed}
+
+
+def build_match_query(query: str) -> str:
+    """
+    Wandelt eine Benutzereingabe in eine sichere FTS5-Abfrage um:
+    jedes Wort wird als Präfix-Suche gequotet, alle Wörter müssen vorkommen.
+    """
+    terms = []
+    for term in query.split():
+        term = term.replace('"', '""')
+        terms.append(f'"{term}"*')
+    return " ".join(terms)
+
+
+def highlight(snippet: str) -> str:
+    """Ausschnitt als sicheres HTML: Inhalt escapen, danach die Treffer mit <mark> markieren"""
+    escaped = html.escape(snippet or "")
+    return escaped.replace(MARK_START, "<mark>").replace(MARK_END, "</mark>")
+
+
+def search(query: str, category: str = None, filename: str = None, limit: int = 20) -> list:
+    """
+    Durchsucht den Index und liefert nach Relevanz (BM25) sortierte Treffer mit Textausschnitt.
+
+    Returns:
+        Liste von Treffern: file, segment, category, pages, snippet, score
+    """
+    match_query = build_match_query(query)
+    if not match_query:
+        return []
+
+    sql = (
+        "SELECT file, segment, category, pages, "
+        "snippet(segments, 4, ?, ?, '…', ?) AS snippet, "
+        "bm25(segments) AS score "
+        "FROM segments WHERE segments MATCH ?"
+    )
+    params = [MARK_START, MARK_END, SNIPPET_TOKENS, match_query]
+    if category:
+        sql += " AND category = ?"
+        params.append(category)
+    if filename:
+        sql += " AND file = ?"
+        params.append(filename)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+
+    conn = connect()
+    try:
+        rows = conn.execute(sql, params).fetchall()
+    finally:
+        conn.close()
+
+    return [
+        {
+            "file": file,
+            "segment": segment,
+            "category": category,
+            "pages": json.loads(pages),
+            "snippet": highlight(snippet),
+            "score": round(-score, 4)
+        }
+        for file, segment, category, pages, snippet, score in rows
+    ]
+
+
+if __name__ == "__main__":
+    stats = sync_if_stale()
+    print(f"Suchindex aktualisiert: {stats}" if stats else "Suchindex ist aktuell")
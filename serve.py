@@ -0,0 +1,99 @@
+"""
+Produktionsstart der Web-Anwendung (statt app.py mit Entwicklungsserver und Debugger).
+
+Server nach Verfügbarkeit (--server auto):
+- gunicorn (nur Linux/macOS): gthread-Worker, PDFs und Range-Anfragen per sendfile()
+- waitress (auch Windows): Thread-Pool, Dateien direkt aus dem Dateipuffer des Servers
+- werkzeug: Entwicklungsserver mit einem Thread pro Anfrage (Notlösung, ohne Debugger)
+
+Es läuft immer genau ein Prozess mit mehreren Threads: Jobverwaltung, Ergebnis-Speicher
+und Caches liegen im Prozess von app.py. Mehrere Worker-Prozesse würden jeweils eigene
+Jobs starten und /api/jobs nur teilweise sehen.
+
+Beispiel:
+    python serve.py --port 5000 --threads 16
+"""
+import argparse
+import os
+
+DEFAULT_HOST = os.environ.get("FLATSCOUTS_HOST", "0.0.0.0")
+DEFAULT_PORT = int(os.environ.get("FLATSCOUTS_PORT", "5000"))
+# PDF-Downloads blockieren je einen Thread; genug Threads, damit JSON-Polling frei bleibt
+DEFAULT_THREADS = int(os.environ.get("FLATSCOUTS_THREADS", "16"))
+# Maximale Dauer einer Anfrage (gunicorn); Uploads großer PDFs brauchen länger
+REQUEST_TIMEOUT = 600
+
+SERVERS = ("auto", "gunicorn", "waitress", "werkzeug")
+
+
+def available_server() -> str:
+    """Bester installierter Server für diese Plattform"""
+    if os.name == "posix":
+        try:
+            import gunicorn  # noqa: F401
+            return "gunicorn"
+        except ImportError:
+            pass
+    try:
+        import waitress  # noqa: F401
+        return "waitress"
+    except ImportError:
+        return "werkzeug"
+
+
+def serve_gunicorn(app, host: str, port: int, threads: int):
+    from gunicorn.app.base import BaseApplication
+
+    class FlatScoutsApplication(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{host}:{port}")
+            self.cfg.set("workers", 1)
+            self.cfg.set("worker_class", "gthread")
+            self.cfg.set("threads", threads)
+            self.cfg.set("timeout", REQUEST_TIMEOUT)
+            self.cfg.set("accesslog", "-")
+
+        def load(self):
+            return app
+
+    FlatScoutsApplication().run()
+
+
+def serve_waitress(app, host: str, port: int, threads: int):
+    from waitress import serve
+    serve(app, host=host, port=port, threads=threads, channel_timeout=REQUEST_TIMEOUT)
+
+
+def serve_werkzeug(app, host: str, port: int, threads: int):
+    app.run(host=host, port=port, threaded=True, debug=False, use_reloader=False)
+
+
+def main(argv=None):
+    arg_parser = argparse.ArgumentParser(description="FlatScouts Web-Anwendung im Produktionsbetrieb starten")
+    arg_parser.add_argument("--host", default=DEFAULT_HOST, help="Adresse (Standard: 0.0.0.0)")
+    arg_parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port (Standard: 5000)")
+    arg_parser.add_argument("--threads", type=int, default=DEFAULT_THREADS,
+                            help="Gleichzeitig bearbeitete Anfragen")
+    arg_parser.add_argument("--server", choices=SERVERS, default="auto",
+                            help="WSGI-Server (Standard: gunicorn, sonst waitress, sonst werkzeug)")
+    args = arg_parser.parse_args(argv)
+
+    server = available_server() if args.server == "auto" else args.server
+    if server == "gunicorn" and os.name != "posix":
+        arg_parser.error("gunicorn läuft nur unter Linux/macOS, unter Windows --server waitress verwenden")
+
+    if server == "werkzeug" and args.server == "auto":
+        print("Weder gunicorn noch waitress installiert - Werkzeug-Server als Notlösung (pip install waitress)",
+              flush=True)
+
+    from app import app
+    print(f"Starte FlatScouts mit {server} auf {args.host}:{args.port} ({args.threads} Threads)", flush=True)
+    {
+        "gunicorn": serve_gunicorn,
+        "waitress": serve_waitress,
+        "werkzeug": serve_werkzeug,
+    }[server](app, args.host, args.port, args.threads)
+
+
+if __name__ == "__main__":
+    main()
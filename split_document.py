@@ -1,32 +1,118 @@
-import requests
+"""
+Splittet PDFs mit Llama Split in Segmente.
+
+Als Skript (python split_document.py [Dateien] [--worker ...]) oder als Bibliothek:
+
+    import split_document
+    config = split_document.SplitConfig(data_dir=Path("/tmp/daten"), base_url=stub_url)
+    split_document.run(["scan.pdf"], config)
+
+Beim Import passiert nichts; schwere Abhängigkeiten (fitz, requests, preprocess) werden
+erst beim ersten Lauf geladen.
+"""
+import argparse
+import os
+import threading
 import time
 import json
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
+from result_store import get_store
+import manifests
+import scheduler
+from work_queue import LEASE_SECONDS, get_queue, run_worker
+import metrics
+import profiling
 
-API_KEY = "llx-IWbVsP0maYq3OvP4VJg2MjM8jxqciXHA9Gx1SLYRB3O2rr8W"
+MISSING_API_KEY = "LLAMA_CLOUD_API_KEY ist nicht gesetzt (Umgebungsvariable oder api_key in SplitConfig)"
 BASE_URL = "https://api.cloud.llamaindex.ai/api/v1"
-DATA_DIR = Path(__file__).parent / "data"
+POLL_INTERVAL = 2  # Sekunden zwischen zwei Statusabfragen eines Split-Jobs
+DATA_DIR = Path(os.environ.get("FLATSCOUTS_DATA_DIR", Path(__file__).parent / "data"))
 STATUS_FILE = DATA_DIR / "split_status.json"
+LOG_DIR = Path(__file__).parent / "logs"
+
+# Große PDFs werden in überlappende Seitenfenster geteilt und parallel gesplittet
+SHARD_THRESHOLD_PAGES = 120  # Ab dieser Seitenzahl wird geteilt
+WINDOW_PAGES = 100  # Seiten pro Fenster
+WINDOW_OVERLAP = 10  # Überlappung benachbarter Fenster (Kontext an der Schnittstelle)
+MAX_PARALLEL_WINDOWS = 4
+WINDOW_DIR = DATA_DIR / ".split_windows"
+WINDOW_RETRIES = 1  # Wiederholungen pro fehlgeschlagenem Fenster
+
+# Beim Verbinden von Segmenten gilt die niedrigere Confidence
+CONFIDENCE_ORDER = {"low": 0, "medium": 1, "high": 2}
+
+_status_lock = threading.Lock()
+
+def _api_key_default():
+    return os.environ.get("LLAMA_CLOUD_API_KEY", "")
+
+def _optimize_images_default():
+    import preprocess
+    return preprocess.ENABLED
+
+@dataclass
+class SplitConfig:
+    """Einstellungen eines Split-Laufs (Standardwerte wie beim Skript)"""
+    data_dir: Path = DATA_DIR
+    log_dir: Path = LOG_DIR
+    api_key: str = field(default_factory=_api_key_default, repr=False)
+    base_url: str = BASE_URL
+    poll_interval: float = POLL_INTERVAL
+    optimize_images: bool = field(default_factory=_optimize_images_default)
+    shard_threshold_pages: int = SHARD_THRESHOLD_PAGES
+    window_pages: int = WINDOW_PAGES
+    window_overlap: int = WINDOW_OVERLAP
+    max_parallel_windows: int = MAX_PARALLEL_WINDOWS
+    window_retries: int = WINDOW_RETRIES
+
+    def __post_init__(self):
+        self.data_dir = Path(self.data_dir)
+        self.log_dir = Path(self.log_dir)
+
+    @property
+    def status_file(self) -> Path:
+        return self.data_dir / STATUS_FILE.name
 
-def update_status(filename, status, message=""):
+    @property
+    def window_dir(self) -> Path:
+        return self.data_dir / WINDOW_DIR.name
+
+    @property
+    def optimized_dir(self) -> Path:
+        return self.data_dir / ".optimized"
+
+def write_status_file(config, status_data):
+    """Schreibt die Status-Datei atomar (mehrere Worker können gleichzeitig schreiben)"""
+    status_file = config.status_file
+    status_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = status_file.with_name(f"{status_file.name}.{os.getpid()}.tmp")
+    with open(temp_file, "w", encoding="utf-8") as f:
+        json.dump(status_data, f, indent=2, ensure_ascii=False)
+    os.replace(temp_file, status_file)
+
+def update_status(config, filename, status, message=""):
     """Aktualisiert den Status in der Status-Datei"""
-    try:
-        if STATUS_FILE.exists():
-            with open(STATUS_FILE, "r", encoding="utf-8") as f:
-                status_data = json.load(f)
-        else:
-            status_data = {}
+    # Seitenfenster werden parallel in Threads gesplittet
+    with _status_lock:
+        try:
+            if config.status_file.exists():
+                with open(config.status_file, "r", encoding="utf-8") as f:
+                    status_data = json.load(f)
+            else:
+                status_data = {}
         
-        status_data[filename] = {
-            "status": status,
-            "message": message,
-            "timestamp": time.time()
-        }
+            status_data[filename] = {
+                "status": status,
+                "message": message,
+                "timestamp": time.time()
+            }
         
-        with open(STATUS_FILE, "w", encoding="utf-8") as f:
-            json.dump(status_data, f, indent=2, ensure_ascii=False)
-    except Exception as e:
-        print(f"Fehler beim Aktualisieren des Status: {e}")
+            write_status_file(config, status_data)
+        except Exception as e:
+            print(f"Fehler beim Aktualisieren des Status: {e}")
 
 categories = [
     {
@@ -47,96 +133,403 @@ categories = [
     }
 ]
 
-session = requests.Session()
-session.headers.update({"Authorization": f"Bearer {API_KEY}"})
+def load_json_file(path, default):
+    """Lädt eine JSON-Datei oder gibt den Standardwert zurück"""
+    if path.exists():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Fehler beim Laden von {path.name}: {e}", flush=True)
+    return default
 
-pdf_files = list(DATA_DIR.glob("*.pdf")) + list(DATA_DIR.glob("*.PDF"))
-pdf_files = list(dict.fromkeys(pdf_files))
-ergebnisse = {}
+def find_pdf_files(filenames=None, data_dir=DATA_DIR):
+    """Alle PDFs im data-Ordner oder nur die angegebenen Dateien"""
+    data_dir = Path(data_dir)
+    if filenames:
+        return [data_dir / Path(name).name for name in filenames]
+    pdf_files = list(data_dir.glob("*.pdf")) + list(data_dir.glob("*.PDF"))
+    return list(dict.fromkeys(pdf_files))
 
-# Initialisiere Status-Datei
-initial_status = {}
-for pdf_file in pdf_files:
-    initial_status[pdf_file.name] = {
-        "status": "pending",
-        "message": "Wartend auf Verarbeitung",
-        "timestamp": time.time()
+def run_split_job(config, session, pdf_file, document, label="", upload_name=None):
+    """
+    Lädt ein PDF hoch, erstellt einen Split-Job und wartet auf das Ergebnis.
+    
+    Args:
+        pdf_file: Hochzuladendes PDF (ganzes Dokument oder Seitenfenster)
+        document: Name des Originaldokuments (für Status und Zeitmessung)
+        label: Präfix für Statusmeldungen, z.B. "Fenster 2/5: "
+        upload_name: Dateiname beim Upload (Standard: Name von pdf_file)
+    
+    Returns:
+        Segmente der API (Seiten bezogen auf pdf_file) oder None, falls der Job fehlgeschlagen ist
+    """
+    # Datei hochladen
+    update_status(config, document, "processing", f"{label}Lade Datei hoch...")
+    with metrics.timer("split_upload", document=document):
+        with open(pdf_file, "rb") as f:
+            files = {"upload_file": (upload_name or pdf_file.name, f, "application/pdf")}
+            response = session.post(f"{config.base_url}/files", files=files)
+            file_id = response.json()["id"]
+    
+    # Split-Job erstellen
+    update_status(config, document, "processing", f"{label}Erstelle Split-Job...")
+    payload = {
+        "document_input": {"type": "file_id", "value": file_id},
+        "categories": categories,
+        "splitting_strategy": {"allow_uncategorized": True}
     }
-with open(STATUS_FILE, "w", encoding="utf-8") as f:
-    json.dump(initial_status, f, indent=2, ensure_ascii=False)
+    with metrics.timer("split_job_create", document=document):
+        response = session.post(f"{config.base_url}/beta/split/jobs", json=payload, headers={"Content-Type": "application/json"})
+        job_id = response.json()["id"]
+    
+    # Auf Fertigstellung warten (Warteschlange + Verarbeitung beim Split-Dienst)
+    update_status(config, document, "processing", f"{label}Warte auf Llama Split...")
+    wait_started = time.perf_counter()
+    while True:
+        with metrics.timer("split_poll_request", document=document):
+            response = session.get(f"{config.base_url}/beta/split/jobs/{job_id}")
+            job_status = response.json()["status"]
+        
+        if job_status == "completed":
+            metrics.observe("split_wait", time.perf_counter() - wait_started, document=document)
+            return response.json().get("result", {}).get("segments", [])
+        elif job_status == "failed":
+            metrics.observe("split_wait", time.perf_counter() - wait_started, document=document)
+            return None
+        else:
+            # Status ist "processing" oder ähnlich
+            update_status(config, document, "processing", f"{label}Status: {job_status}")
+        
+        time.sleep(config.poll_interval)
+
+def name_segments(segments):
+    """Vergibt eindeutige Segmentnamen pro Kategorie (z.B. Rechnung_1, Rechnung_2)"""
+    # Zähler pro Kategorie für eindeutige Segmentnamen
+    category_counters = {}
+    segment_list = []
+    
+    for segment in segments:
+        category = segment.get("category", "uncategorized")
+        # Zähler für diese Kategorie erhöhen
+        category_counters[category] = category_counters.get(category, 0) + 1
+        segment_name = f"{category}_{category_counters[category]}"
+        
+        segment_list.append({
+            "name": segment_name,
+            "category": category,
+            "pages": segment.get("pages"),
+            "confidence_category": segment.get("confidence_category")
+        })
+    return segment_list
+
+def page_windows(page_count, window_pages=WINDOW_PAGES, overlap=WINDOW_OVERLAP):
+    """
+    Teilt die Seiten in überlappende Fenster.
+    
+    Returns:
+        Liste von (erste Seite, letzte Seite), 1-basiert und inklusive
+    """
+    step = max(window_pages - overlap, 1)
+    windows = []
+    start = 1
+    while True:
+        end = min(start + window_pages - 1, page_count)
+        windows.append((start, end))
+        if end >= page_count:
+            return windows
+        start += step
+
+def window_ownership(windows):
+    """
+    Seitenbereich, für den jedes Fenster zuständig ist: Überlappungen werden in der
+    Mitte geteilt, damit jede Seite genau einem Fenster gehört.
+    """
+    owned = []
+    for index, (start, end) in enumerate(windows):
+        own_start = start if index == 0 else owned[-1][1] + 1
+        if index + 1 < len(windows):
+            next_start = windows[index + 1][0]
+            own_end = (next_start + end) // 2
+        else:
+            own_end = end
+        owned.append((own_start, own_end))
+    return owned
 
-for pdf_file in pdf_files:
+def write_window_pdf(pdf_file, start, end, window_dir=WINDOW_DIR):
+    """Schreibt die Seiten start..end (1-basiert) in ein temporäres PDF"""
+    import fitz  # PyMuPDF
+    # Unterordner, damit die Fenster nicht als eigene Dokumente im data-Ordner erscheinen
+    window_dir.mkdir(parents=True, exist_ok=True)
+    temp_file = window_dir / f"{pdf_file.stem}_{start}-{end}_{uuid.uuid4().hex[:8]}.pdf"
+    with fitz.open(pdf_file) as doc, fitz.open() as window_doc:
+        window_doc.insert_pdf(doc, from_page=start - 1, to_page=end - 1)
+        window_doc.save(str(temp_file))
+    return temp_file
+
+def merge_window_segments(window_results, windows):
+    """
+    Führt die Segmente aller Fenster zusammen.
+    
+    - Seitennummern werden auf das Originaldokument umgerechnet
+    - Seiten aus Überlappungen zählen nur für das zuständige Fenster
+    - Gleichartige Segmente an einer Schnittstelle werden verbunden, wenn eines der beiden
+      Fenster das Segment über die Schnittstelle hinweg gesehen hat
+    """
+    merged = []
+    crosses_cut = False  # Letztes Segment reicht im eigenen Fenster über den zuständigen Bereich hinaus
+    for (start, _), (own_start, own_end), segments in zip(windows, window_ownership(windows), window_results):
+        for segment in segments:
+            all_pages = sorted({page + start - 1 for page in segment.get("pages") or []})
+            pages = [page for page in all_pages if own_start <= page <= own_end]
+            if not pages:
+                continue
+            category = segment.get("category", "uncategorized")
+            confidence = segment.get("confidence_category")
+            previous = merged[-1] if merged else None
+            at_cut = previous is not None and previous["pages"][-1] == own_start - 1 and pages[0] == own_start
+            if at_cut and previous["category"] == category and (crosses_cut or all_pages[0] < own_start):
+                # Fortsetzung desselben Segments hinter der Schnittstelle
+                previous["pages"] = previous["pages"] + pages
+                if CONFIDENCE_ORDER.get(confidence, 0) < CONFIDENCE_ORDER.get(previous["confidence_category"], 0):
+                    previous["confidence_category"] = confidence
+            else:
+                merged.append({"category": category, "pages": pages, "confidence_category": confidence})
+            crosses_cut = all_pages[-1] > own_end
+    return merged
+
+def split_window(config, pdf_file, document, start, end, label):
+    """Splittet ein Seitenfenster (eigene Session pro Thread), mit einer Wiederholung"""
+    session = create_session(config)
+    temp_file = write_window_pdf(pdf_file, start, end, config.window_dir)
+    try:
+        for attempt in range(1 + config.window_retries):
+            with metrics.timer("split_window", document=document):
+                segments = run_split_job(config, session, temp_file, document, label)
+            if segments is not None:
+                return segments
+            print(f"{label}Split fehlgeschlagen (Versuch {attempt + 1})", flush=True)
+        return None
+    finally:
+        temp_file.unlink(missing_ok=True)
+        session.close()
+
+def split_pdf(config, session, pdf_file):
+    """
+    Splittet ein PDF. Große Dokumente werden in überlappende Seitenfenster geteilt,
+    die parallel gesplittet und anschließend zusammengeführt werden.
+    
+    Returns:
+        Liste der Segmente oder None, falls der Split-Job fehlgeschlagen ist
+    """
+    import fitz  # PyMuPDF
+    document = pdf_file.name
+    if config.optimize_images:
+        import preprocess
+        # Leichte Kopie mit neu komprimierten Bildern hochladen, Original bleibt unverändert
+        update_status(config, document, "processing", "Komprimiere Bilder...")
+        pdf_file = preprocess.upload_copy(pdf_file, optimized_dir=config.optimized_dir)
+    with fitz.open(pdf_file) as doc:
+        page_count = len(doc)
+    
+    if page_count <= config.shard_threshold_pages:
+        segments = run_split_job(config, session, pdf_file, document, upload_name=document)
+        return name_segments(segments) if segments is not None else None
+    
+    windows = page_windows(page_count, config.window_pages, config.window_overlap)
+    print(f"{page_count} Seiten -> {len(windows)} Fenster...", end=" ", flush=True)
+    with ThreadPoolExecutor(max_workers=config.max_parallel_windows) as executor:
+        futures = [
+            executor.submit(split_window, config, pdf_file, document, start, end,
+                            f"Fenster {index + 1}/{len(windows)}: ")
+            for index, (start, end) in enumerate(windows)
+        ]
+        window_results = [future.result() for future in futures]
+    
+    if any(segments is None for segments in window_results):
+        return None
+    return name_segments(merge_window_segments(window_results, windows))
+
+def process_document(config, session, store, pdf_file):
+    """
+    Splittet ein Dokument, speichert das Ergebnis und aktualisiert den Status.
+
+    Returns:
+        Liste der Segmente oder None, falls der Split fehlgeschlagen ist
+    """
     print(f"Verarbeite: {pdf_file.name}...", end=" ", flush=True)
-    update_status(pdf_file.name, "processing", "Starte Verarbeitung...")
+    update_status(config, pdf_file.name, "processing", "Starte Verarbeitung...")
     
     try:
-        # Datei hochladen
-        update_status(pdf_file.name, "processing", "Lade Datei hoch...")
-        with open(pdf_file, "rb") as f:
-            files = {"upload_file": (pdf_file.name, f, "application/pdf")}
-            response = session.post(f"{BASE_URL}/files", files=files)
-            file_id = response.json()["id"]
+        with metrics.timer("split_document_total", document=pdf_file.name):
+            segment_list = split_pdf(config, session, pdf_file)
         
-        # Split-Job erstellen
-        update_status(pdf_file.name, "processing", "Erstelle Split-Job...")
-        payload = {
-            "document_input": {"type": "file_id", "value": file_id},
-            "categories": categories,
-            "splitting_strategy": {"allow_uncategorized": True}
-        }
-        response = session.post(f"{BASE_URL}/beta/split/jobs", json=payload, headers={"Content-Type": "application/json"})
-        job_id = response.json()["id"]
+        with metrics.timer("store_write", document=pdf_file.name):
+            # Ergebnis sofort pro Dokument speichern (kein Neuschreiben aller Ergebnisse)
+            store.upsert_split(pdf_file.name, segment_list or [])
         
-        # Auf Fertigstellung warten
-        update_status(pdf_file.name, "processing", "Warte auf Llama Split...")
-        while True:
-            response = session.get(f"{BASE_URL}/beta/split/jobs/{job_id}")
-            job_status = response.json()["status"]
-            
-            if job_status == "completed":
-                segments = response.json().get("result", {}).get("segments", [])
-                # Zähler pro Kategorie für eindeutige Segmentnamen
-                category_counters = {}
-                segment_list = []
-                
-                for segment in segments:
-                    category = segment.get("category", "uncategorized")
-                    # Zähler für diese Kategorie erhöhen
-                    category_counters[category] = category_counters.get(category, 0) + 1
-                    segment_name = f"{category}_{category_counters[category]}"
-                    
-                    segment_list.append({
-                        "name": segment_name,
-                        "category": category,
-                        "pages": segment.get("pages"),
-                        "confidence_category": segment.get("confidence_category")
-                    })
-                
-                ergebnisse[pdf_file.name] = segment_list
-                update_status(pdf_file.name, "completed", "Verarbeitung abgeschlossen")
-                print("OK", flush=True)  # Verwende Text statt Emoji für Kompatibilität
-                break
-            elif job_status == "failed":
-                ergebnisse[pdf_file.name] = []
-                update_status(pdf_file.name, "failed", "Verarbeitung fehlgeschlagen")
-                print("FEHLGESCHLAGEN", flush=True)  # Verwende Text statt Emoji
-                break
-            else:
-                # Status ist "processing" oder ähnlich
-                update_status(pdf_file.name, "processing", f"Status: {job_status}")
-            
-            time.sleep(2)
+        try:
+            # Segment -> Seiten im Manifest für den Viewer aktualisieren
+            manifests.refresh(store, pdf_file, segment_list or [])
+        except Exception as manifest_error:
+            print(f"Warnung: Manifest konnte nicht gespeichert werden: {manifest_error}", flush=True)
+        
+        if segment_list is not None:
+            update_status(config, pdf_file.name, "completed", "Verarbeitung abgeschlossen")
+            print("OK", flush=True)  # Verwende Text statt Emoji für Kompatibilität
+        else:
+            update_status(config, pdf_file.name, "failed", "Verarbeitung fehlgeschlagen")
+            print("FEHLGESCHLAGEN", flush=True)  # Verwende Text statt Emoji
+        return segment_list
     
     except Exception as e:
-        ergebnisse[pdf_file.name] = []
         try:
-            update_status(pdf_file.name, "failed", f"Fehler: {str(e)}")
+            store.upsert_split(pdf_file.name, [])
+        except Exception as store_error:
+            print(f"Warnung: Ergebnis konnte nicht gespeichert werden: {store_error}", flush=True)
+        try:
+            update_status(config, pdf_file.name, "failed", f"Fehler: {str(e)}")
         except Exception as status_error:
             print(f"Warnung: Status-Update fehlgeschlagen: {status_error}", flush=True)
         print(f"FEHLER: {e}", flush=True)
+        return None
+
+def create_session(config):
+    import requests
+    if not config.api_key:
+        raise RuntimeError(MISSING_API_KEY)
+    session = requests.Session()
+    session.headers.update({"Authorization": f"Bearer {config.api_key}"})
+    return session
+
+def enqueue_documents(pdf_files, config=None):
+    """Stellt Dokumente als Split-Aufgaben in die gemeinsame Warteschlange"""
+    config = config or SplitConfig()
+    queue = get_queue(config.data_dir)
+    marked = scheduler.priorities(config.data_dir)
+    for pdf_file in pdf_files:
+        cost = scheduler.document_cost(pdf_file) if pdf_file.exists() else 0
+        queue.enqueue("split", pdf_file.name, cost=cost, priority=marked.get(pdf_file.name))
+        update_status(config, pdf_file.name, "pending", "Wartend in Warteschlange")
+    print(f"{len(pdf_files)} Datei(en) in die Warteschlange gestellt", flush=True)
+
+def run_split_worker(worker_id=None, lease_seconds=LEASE_SECONDS, idle_timeout=0, config=None):
+    """
+    Worker-Modus: holt Split-Aufgaben aus der Warteschlange und stellt für jedes
+    gesplittete Dokument die Parse-Aufgaben (pro Segment) ein.
+    """
+    config = config or SplitConfig()
+    session = create_session(config)
+    store = get_store(config.data_dir)
+    queue = get_queue(config.data_dir)
+
+    def handle(task):
+        pdf_file = config.data_dir / task["document"]
+        if not pdf_file.exists():
+            raise FileNotFoundError(f"PDF-Datei nicht gefunden: {pdf_file.name}")
+        segment_list = process_document(config, session, store, pdf_file)
+        if segment_list is None:
+            raise RuntimeError("Split fehlgeschlagen")
+        queue.replace_document(
+            "parse",
+            pdf_file.name,
+            [
+                (segment["name"], segment, scheduler.segment_cost(pdf_file, segment.get("pages") or []))
+                for segment in segment_list
+            ],
+            priority=scheduler.priorities(config.data_dir).get(pdf_file.name)
+        )
+        if not segment_list:
+            # Ohne Segmente entsteht keine Parse-Aufgabe, die das Dokument abschließen würde
+            import parse_segments
+            parse_config = parse_segments.ParseConfig(data_dir=config.data_dir, log_dir=config.log_dir)
+            parse_segments.finish_document_if_complete(parse_config, store, queue, pdf_file.name)
+        return {"segments": len(segment_list)}
+
+    return run_worker(queue, "split", handle, worker_id, lease_seconds, idle_timeout)
+
+def run(files=None, config=None):
+    """
+    Splittet alle PDFs im data-Ordner (oder nur die angegebenen) und speichert die Ergebnisse.
+
+    Returns:
+        Dictionary Dateiname -> Segmente (None, falls der Split fehlgeschlagen ist)
+    """
+    config = config or SplitConfig()
+    session = create_session(config)
+
+    # Kleine und frisch hochgeladene Dokumente zuerst (statt Reihenfolge des Dateisystems)
+    pdf_files = scheduler.order_pdf_files(find_pdf_files(files, config.data_dir), config.data_dir)
+
+    store = get_store(config.data_dir)
+
+    # Bei einzelnen Dateien bestehenden Status behalten und nur ergänzen
+    if files:
+        initial_status = load_json_file(config.status_file, {})
+    else:
+        initial_status = {}
+        # Voller Lauf: Ergebnisse nicht mehr vorhandener PDFs entfernen
+        store.retain_split(pdf_file.name for pdf_file in pdf_files)
+
+    # Initialisiere Status-Datei
+    for pdf_file in pdf_files:
+        initial_status[pdf_file.name] = {
+            "status": "pending",
+            "message": "Wartend auf Verarbeitung",
+            "timestamp": time.time()
+        }
+    write_status_file(config, initial_status)
+
+    results = {}
+    try:
+        for pdf_file in pdf_files:
+            results[pdf_file.name] = process_document(config, session, store, pdf_file)
+    finally:
+        session.close()
+    return results
+
+def main(argv=None):
+    """Hauptfunktion: Splittet alle PDFs im data-Ordner (oder nur die angegebenen)"""
+    arg_parser = argparse.ArgumentParser(description="Splittet PDFs mit Llama Split in Segmente")
+    arg_parser.add_argument("files", nargs="*", help="Nur diese Dateien aus dem data-Ordner verarbeiten")
+    arg_parser.add_argument("--enqueue", action="store_true", help="Dateien nur in die Warteschlange stellen")
+    arg_parser.add_argument("--worker", action="store_true", help="Aufgaben aus der Warteschlange abarbeiten")
+    arg_parser.add_argument("--worker-id", default=None, help="Kennung des Workers (Standard: Rechner-PID)")
+    arg_parser.add_argument("--lease", type=float, default=LEASE_SECONDS, help="Lease-Dauer in Sekunden")
+    arg_parser.add_argument("--idle-timeout", type=float, default=0,
+                            help="Worker beenden, wenn so viele Sekunden keine Aufgabe kam (0 = nie)")
+    arg_parser.add_argument("--optimize-images", action="store_true",
+                            help="Bilder vor dem Upload neu komprimieren (siehe preprocess.py)")
+    arg_parser.add_argument("--profile", action="store_true", default=profiling.ENABLED,
+                            help="CPU-, Stichproben- und Speicherprofil schreiben (siehe profiling.py)")
+    args = arg_parser.parse_args(argv)
+
+    run_started = time.time()
+    config = SplitConfig()
+    if args.optimize_images:
+        config.optimize_images = True
+
+    if args.enqueue:
+        enqueue_documents(find_pdf_files(args.files, config.data_dir), config)
+        return
+    if not config.api_key:
+        arg_parser.error(MISSING_API_KEY)
+
+    if args.worker:
+        try:
+            with profiling.profile(config.log_dir, "split_worker", args.profile):
+                run_split_worker(args.worker_id, args.lease, args.idle_timeout, config)
+        finally:
+            summary_file = metrics.write_run_summary(config.log_dir, "split_worker", run_started)
+            print(f"Zeitmessung gespeichert in: {summary_file}", flush=True)
+        return
+
+    with profiling.profile(config.log_dir, "split_document", args.profile):
+        results = run(args.files, config)
 
-# Ergebnisse speichern
-with open(DATA_DIR / "split_results.json", "w", encoding="utf-8") as f:
-    json.dump(ergebnisse, f, indent=2, ensure_ascii=False)
+    summary_file = metrics.write_run_summary(config.log_dir, "split_document", run_started)
+    print(f"Zeitmessung gespeichert in: {summary_file}", flush=True)
+    print(f"\n{len(results)} Datei(en) verarbeitet", flush=True)
 
-print(f"\n{len(ergebnisse)} Datei(en) verarbeitet", flush=True)
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,6 @@
 @echo off
 echo Starte FlatScouts Web-Anwendung...
-venv\Scripts\python.exe app.py
+venv\Scripts\python.exe serve.py
 pause
 
 
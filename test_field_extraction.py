@@ -0,0 +1,108 @@
+"""Tests für die lokale Feldextraktion aus geparsten Segmenten (field_extraction.py)"""
+import json
+import pytest
+import field_extraction
+from field_extraction import extract_fields, iban_valid, parse_number
+
+LEASE = """# Mietvertrag
+
+Vermieter: Immo AG, Bahnhofstrasse 12, 8001 Zürich
+Mieter: Hans Muster, Obere Gasse 4a
+9000 St. Gallen
+
+| Position | Betrag |
+|---|---|
+| Nettomiete | CHF 1'850.00 |
+| Akonto Nebenkosten | CHF 220.– |
+| Bruttomiete | CHF 2'070.00 |
+
+Mietzinsdepot: 5'550.00 Franken
+Mietbeginn: 1. Oktober 2024, Vertragsende 30.09.2026
+Zahlung auf IBAN CH93 0076 2011 6238 5295 7 BIC UBSWCHZH80A, falsche IBAN CH93 0076 2011 6238 5295 8
+
+## Nebenkostenabrechnung
+| Kostenart | Betrag |
+| --- | ---: |
+| Heizung | 1.234,50 |
+| Hauswart | 450.00 |
+"""
+
+
+@pytest.mark.parametrize("raw, value", [
+    ("1'850.00", 1850.0), ("1’850.–", 1850.0), ("220.-", 220.0), ("1.234,50", 1234.5),
+    ("1,850.00", 1850.0), ("1.850", 1850.0), ("12,5", 12.5), ("450", 450.0),
+])
+def test_parse_number(raw, value):
+    assert parse_number(raw) == value
+
+
+def test_iban_checksum():
+    assert iban_valid("CH9300762011623852957")
+    assert iban_valid("DE89370400440532013000")
+    assert not iban_valid("CH9300762011623852958")
+    assert not iban_valid("CH93")
+
+
+def test_lease_fields_with_positions():
+    result = extract_fields(LEASE, "Mietvertrag")
+    fields = result["fields"]
+
+    assert {name: fields[name]["value"] for name in ("rent_net", "nebenkosten", "rent_gross", "deposit")} == {
+        "rent_net": 1850.0, "nebenkosten": 220.0, "rent_gross": 2070.0, "deposit": 5550.0
+    }
+    assert fields["deposit"]["currency"] == "CHF"
+    # Fundstellen zeigen auf den Originaltext
+    assert LEASE[fields["deposit"]["start"]:fields["deposit"]["end"]] == "5'550.00 Franken"
+    assert fields["start_date"]["value"] == "2024-10-01"
+    assert fields["end_date"]["value"] == "2026-09-30"
+    assert fields["address"]["value"] == {"street": "Bahnhofstrasse", "number": "12", "zip": "8001", "city": "Zürich"}
+    assert fields["iban"]["value"] == "CH9300762011623852957"
+    assert LEASE[fields["iban"]["start"]:fields["iban"]["end"]] == "CH93 0076 2011 6238 5295 7"
+
+    # Ungültige Prüfziffer wird verworfen, Adresse über zwei Zeilen wird erkannt
+    assert len(result["ibans"]) == 1
+    assert [address["value"]["city"] for address in result["addresses"]] == ["Zürich", "St. Gallen"]
+
+
+def test_nebenkosten_table_items():
+    items = extract_fields(LEASE, "Mietvertrag")["fields"]["nebenkosten_items"]
+
+    assert [(item["label"], item["amount"]["value"]) for item in items] == [
+        ("Akonto Nebenkosten", 220.0), ("Heizung", 1234.5), ("Hauswart", 450.0)
+    ]
+    assert LEASE[items[1]["start"]:items[1]["end"]] == "| Heizung | 1.234,50 |"
+
+
+def test_invoice_fields():
+    content = "Rechnungsdatum: 03.02.2025\nTotal EUR 1.234,56, zahlbar bis 2025-03-01\nIBAN DE89370400440532013000"
+    fields = extract_fields(content, "Rechnung")["fields"]
+
+    assert fields["total"]["value"] == 1234.56 and fields["total"]["currency"] == "EUR"
+    assert fields["invoice_date"]["value"] == "2025-02-03"
+    assert fields["due_date"]["value"] == "2025-03-01"
+    assert fields["iban"]["country"] == "DE"
+
+
+def test_labels_are_case_insensitive_and_stay_on_their_line():
+    fields = extract_fields("NETTOMIETE: CHF 1'500.00\nMietbeginn:\nDatum 31.02.2024", "Mietvertrag")["fields"]
+
+    assert fields["rent_net"]["value"] == 1500.0
+    assert fields["rent_net"]["label"] == "NETTOMIETE"
+    # Kein Wert auf der Zeile der Beschriftung, ungültiges Datum wird ignoriert
+    assert "start_date" not in fields
+
+
+def test_run_writes_output_and_keeps_errors(tmp_path):
+    parsed = {"a.pdf": [
+        {"name": "Mietvertrag_1", "category": "Mietvertrag", "pages": [1], "parsed": {"markdown": LEASE}},
+        {"name": "Rechnung_1", "category": "Rechnung", "pages": [2], "parsed": {"error": "Zeitlimit"}},
+    ]}
+    input_file = tmp_path / "parsed_segments.json"
+    input_file.write_text(json.dumps(parsed), encoding="utf-8")
+
+    field_extraction.run(tmp_path, input_file=input_file)
+
+    with open(tmp_path / "extracted_fields.json", encoding="utf-8") as f:
+        [lease, invoice] = json.load(f)["a.pdf"]
+    assert lease["source"] == "markdown" and lease["fields"]["rent_net"]["value"] == 1850.0
+    assert invoice["error"] == "Zeitlimit" and "fields" not in invoice
@@ -0,0 +1,103 @@
+"""Tests für gestreamte Uploads und den Hash-Index (file_hashes.py)"""
+import hashlib
+import io
+import pytest
+from flask import Flask, Request, request
+import file_hashes
+
+
+@pytest.fixture
+def data_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_hashes, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(file_hashes, "INDEX_FILE", tmp_path / "file_hashes.json")
+    return tmp_path
+
+
+def upload_app(data_dir, keep=True):
+    class UploadRequest(Request):
+        def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+            return file_hashes.UploadStream(data_dir)
+
+    app = Flask(__name__)
+    app.request_class = UploadRequest
+
+    @app.route("/upload", methods=["POST"])
+    def upload():
+        stream = request.files["file"].stream
+        if not keep:
+            return {"kept": False}
+        path, sha256, size = stream.detach()
+        return {"path": str(path), "sha256": sha256, "size": size}
+
+    return app.test_client()
+
+
+def test_upload_is_hashed_while_receiving(data_dir):
+    content = b"%PDF-1.7\n" + bytes(range(256)) * 4096
+    client = upload_app(data_dir)
+
+    result = client.post("/upload", data={"file": (io.BytesIO(content), "a.pdf")}).get_json()
+
+    assert result["sha256"] == hashlib.sha256(content).hexdigest()
+    assert result["size"] == len(content)
+    path = data_dir / result["path"]
+    assert path.parent == data_dir
+    assert path.read_bytes() == content
+
+
+def test_unclaimed_upload_is_removed(data_dir):
+    client = upload_app(data_dir, keep=False)
+    client.post("/upload", data={"file": (io.BytesIO(b"%PDF-1.7"), "a.pdf")})
+    assert not list(data_dir.glob(".upload_*"))
+
+
+def test_get_hash_writes_index_only_when_changed(data_dir):
+    pdf_path = data_dir / "a.pdf"
+    pdf_path.write_bytes(b"%PDF-1.7 eins")
+
+    assert file_hashes.get_hash(pdf_path) == hashlib.sha256(b"%PDF-1.7 eins").hexdigest()
+    index_mtime = file_hashes.INDEX_FILE.stat().st_mtime_ns
+    file_hashes.INDEX_FILE.touch()
+    touched = file_hashes.INDEX_FILE.stat().st_mtime_ns
+
+    file_hashes.get_hash(pdf_path)
+    assert file_hashes.INDEX_FILE.stat().st_mtime_ns == touched >= index_mtime
+
+
+def test_find_duplicate(data_dir):
+    (data_dir / "a.pdf").write_bytes(b"%PDF-1.7 eins")
+    (data_dir / "b.pdf").write_bytes(b"%PDF-1.7 zwei")
+    sha256 = hashlib.sha256(b"%PDF-1.7 zwei").hexdigest()
+
+    assert file_hashes.find_duplicate(sha256, len(b"%PDF-1.7 zwei")) == "b.pdf"
+    assert file_hashes.find_duplicate(sha256, 3) is None
+
+
+def test_app_streams_only_upload_requests(data_dir, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, "DATA_DIR", data_dir)
+
+    with app_module.app.test_request_context("/api/documents", method="POST",
+                                             data={"file": (io.BytesIO(b"%PDF-1.7"), "a.pdf")}):
+        assert not isinstance(request.files["file"].stream, file_hashes.UploadStream)
+    with app_module.app.test_request_context("/api/upload", method="POST",
+                                             data={"file": (io.BytesIO(b"%PDF-1.7"), "a.pdf")}):
+        stream = request.files["file"].stream
+        assert isinstance(stream, file_hashes.UploadStream)
+        stream.close()
+    assert not list(data_dir.glob(".upload_*"))
+
+
+def test_app_removes_part_file_when_storing_fails(data_dir, monkeypatch):
+    import app as app_module
+    monkeypatch.setattr(app_module, "DATA_DIR", data_dir)
+
+    def broken(sha256, size):
+        raise OSError("Hash-Index gesperrt")
+
+    monkeypatch.setattr(file_hashes, "find_duplicate", broken)
+    response = app_module.app.test_client().post("/api/upload", data={"file": (io.BytesIO(b"%PDF-1.7"), "a.pdf")})
+
+    assert response.status_code == 500
+    assert not list(data_dir.glob(".upload_*"))
+    assert not (data_dir / "a.pdf").exists()
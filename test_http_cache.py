@@ -0,0 +1,106 @@
+"""Tests für ETags, 304-Antworten und Kompression (http_cache.py)"""
+import gzip
+import json
+import pytest
+from flask import Flask
+import http_cache
+
+LARGE = {"items": [{"name": f"Segment_{index}", "text": "Mietvertrag " * 20} for index in range(20)]}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(http_cache, "_cache", {})
+    app = Flask(__name__)
+    state = {"signature": 1, "builds": 0}
+
+    @app.route("/small")
+    def small():
+        return http_cache.json_response({"ok": True})
+
+    @app.route("/large")
+    def large():
+        return http_cache.json_response(LARGE)
+
+    @app.route("/cached")
+    def cached():
+        def build():
+            state["builds"] += 1
+            return {"signature": state["signature"], **LARGE}
+        return http_cache.cached_json_response("cached", state["signature"], build)
+
+    client = app.test_client()
+    client.state = state
+    return client
+
+
+def test_etag_and_not_modified(client):
+    response = client.get("/small")
+    etag = response.headers["ETag"]
+    assert response.status_code == 200
+    assert response.get_json() == {"ok": True}
+    assert response.headers["Cache-Control"] == "no-cache"
+
+    response = client.get("/small", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.data == b""
+    assert response.headers["ETag"] == etag
+
+
+def test_gzip_for_large_responses_only(client):
+    response = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert json.loads(gzip.decompress(response.data)) == LARGE
+
+    response = client.get("/small", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+    response = client.get("/large")
+    assert "Content-Encoding" not in response.headers
+    assert response.get_json() == LARGE
+
+
+def test_etag_per_encoding(client):
+    plain = client.get("/large")
+    compressed = client.get("/large", headers={"Accept-Encoding": "gzip"})
+    # Starke ETags: gzip-Variante hat andere Bytes und damit einen eigenen Validator
+    assert compressed.headers["ETag"] == plain.headers["ETag"].rstrip('"') + '-gzip"'
+
+    response = client.get("/large", headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["ETag"]})
+    assert response.status_code == 304
+    assert response.headers["ETag"] == compressed.headers["ETag"]
+
+    # Validator der unkomprimierten Variante passt nicht zur gzip-Antwort
+    response = client.get("/large", headers={"Accept-Encoding": "gzip", "If-None-Match": plain.headers["ETag"]})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+
+
+def test_cached_response_is_rebuilt_when_signature_changes(client):
+    first = client.get("/cached", headers={"Accept-Encoding": "gzip"})
+    client.get("/cached", headers={"Accept-Encoding": "gzip"})
+    assert client.state["builds"] == 1
+
+    client.state["signature"] = 2
+    second = client.get("/cached", headers={"If-None-Match": first.headers["ETag"]})
+    assert client.state["builds"] == 2
+    assert second.status_code == 200
+    assert second.get_json()["signature"] == 2
+    assert second.headers["ETag"] != first.headers["ETag"]
+
+
+def test_listing_signature_ignores_non_pdf_files(tmp_path):
+    (tmp_path / "a.pdf").write_bytes(b"%PDF eins")
+    (tmp_path / "B.PDF").write_bytes(b"%PDF zwei")
+    signature = http_cache.listing_signature(tmp_path)
+    assert [name for name, _, _ in signature] == ["B.PDF", "a.pdf"]
+
+    # SQLite-Journale und atomar ersetzte Status-Dateien ändern nur die mtime des Verzeichnisses
+    (tmp_path / "results.sqlite-wal").write_bytes(b"wal")
+    (tmp_path / "split_status.json.tmp").write_text("{}")
+    (tmp_path / "split_status.json.tmp").replace(tmp_path / "split_status.json")
+    assert http_cache.listing_signature(tmp_path) == signature
+
+    (tmp_path / "c.pdf").write_bytes(b"%PDF drei")
+    assert http_cache.listing_signature(tmp_path) != signature
@@ -0,0 +1,98 @@
+"""Tests für die Jobverwaltung mit persistentem Worker-Prozess (job_manager.py)"""
+import time
+import pytest
+import metrics
+from job_manager import JobManager
+
+WAIT_SCRIPT = '''
+import time
+from pathlib import Path
+
+
+def main(argv):
+    # Läuft, bis die Datei argv[0] existiert
+    while not Path(argv[0]).exists():
+        time.sleep(0.01)
+'''
+
+METRIC_SCRIPT = '''
+import metrics
+
+
+def main(argv):
+    metrics.observe("test_stage", 0.25, kind=argv[0])
+'''
+
+
+def wait_until(condition, timeout=60):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, "Zeitüberschreitung"
+        time.sleep(0.02)
+
+
+@pytest.fixture
+def manager(tmp_path):
+    (tmp_path / "wait_job.py").write_text(WAIT_SCRIPT, encoding="utf-8")
+    (tmp_path / "metric_job.py").write_text(METRIC_SCRIPT, encoding="utf-8")
+    metrics.reset()
+    manager = JobManager(tmp_path, tmp_path / "logs",
+                         {"wait": tmp_path / "wait_job.py", "metric": tmp_path / "metric_job.py"})
+    yield manager
+    manager.shutdown()
+    metrics.reset()
+
+
+def test_dedup_priority_and_cancel_queued(manager, tmp_path):
+    gate = tmp_path / "gate"
+    blocker, _ = manager.submit("wait", [str(gate)])
+    wait_until(lambda: blocker.status == "running")
+
+    first, created = manager.submit("metric", ["1"])
+    assert created
+    second, _ = manager.submit("metric", ["2"])
+    assert manager.submit("metric", ["1"]) == (first, False)
+    urgent, _ = manager.submit("metric", ["3"], priority=True)
+    # Wartender Job wird nachträglich priorisiert und hinter die priorisierten eingereiht
+    assert manager.submit("metric", ["2"], priority=True) == (second, False)
+    assert second.priority
+
+    assert manager.cancel(first.id)
+    assert first.status == "cancelled"
+    assert not manager.cancel(first.id)
+    assert manager.snapshot()["queue_depth"] == 2
+
+    gate.touch()
+    wait_until(lambda: second.status == "completed")
+    assert blocker.status == "completed" and urgent.status == "completed"
+    assert blocker.started_at < urgent.started_at < second.started_at
+    assert first.started_at is None
+    with pytest.raises(ValueError):
+        manager.submit("unbekannt")
+
+
+def test_cancel_running_job_restarts_worker(manager, tmp_path):
+    job, _ = manager.submit("wait", [str(tmp_path / "nie")])
+    wait_until(lambda: job.status == "running")
+    worker_pid = manager.snapshot()["worker_pid"]
+
+    assert manager.cancel(job.id)
+    wait_until(lambda: job.status == "cancelled")
+    assert not manager.is_active("wait")
+
+    # Der nächste Job startet einen neuen Worker
+    follow_up, _ = manager.submit("metric", ["x"])
+    wait_until(lambda: follow_up.status == "completed")
+    assert manager.snapshot()["worker_pid"] not in (None, worker_pid)
+
+
+def test_worker_metrics_are_merged(manager):
+    job, _ = manager.submit("metric", ["split"])
+    wait_until(lambda: job.status == "completed")
+    # Die Messwerte werden direkt nach dem Statuswechsel übernommen
+    wait_until(lambda: "job_run" in metrics.run_summary()["stages"])
+
+    stages = metrics.run_summary()["stages"]
+    assert stages["test_stage"]["count"] == 1
+    assert stages["job_queue_wait"]["count"] == 1
+    assert 'kind="split"' in metrics.render_prometheus()
@@ -0,0 +1,146 @@
+"""Tests für das Dokument-Manifest (manifests.py) und die Einbettung in /api/documents"""
+import os
+import fitz  # PyMuPDF
+import pytest
+import file_hashes
+import manifests
+from result_store import ResultStore
+
+A4 = (595.0, 842.0)
+
+
+def write_pdf(path, sizes, text_pages=()):
+    """PDF mit den Seitengrößen sizes; Seiten aus text_pages (1-basiert) erhalten Text"""
+    with fitz.open() as doc:
+        for number, (width, height) in enumerate(sizes, start=1):
+            page = doc.new_page(width=width, height=height)
+            if number in text_pages:
+                page.insert_text((72, 72), f"Seite {number}")
+        doc.save(str(path))
+    return path
+
+
+def expand_page_sizes(page_sizes):
+    """Lauflängen [Breite, Höhe, Anzahl] wieder in eine Größe pro Seite auflösen (wie der Viewer)"""
+    return [(width, height) for width, height, count in page_sizes for _ in range(count)]
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(tmp_path / "results.sqlite")
+
+
+def test_page_sizes_run_length_round_trip(tmp_path):
+    sizes = [A4, A4, A4, (842.0, 595.0), (842.0, 595.0), A4, (300.5, 400.25)]
+    pdf_path = write_pdf(tmp_path / "a.pdf", sizes, text_pages=(1, 4))
+
+    manifest = manifests.build_manifest(pdf_path, [{"name": "Mietvertrag_1", "pages": [1, 2]}])
+
+    assert manifest["page_sizes"] == [[595.0, 842.0, 3], [842.0, 595.0, 2], [595.0, 842.0, 1], [300.5, 400.2, 1]]
+    assert expand_page_sizes(manifest["page_sizes"]) == [(round(w, 1), round(h, 1)) for w, h in sizes]
+    assert manifest["page_count"] == len(sizes) == len(manifest["text_layer"])
+    assert manifest["text_layer"] == "1001000"
+    assert manifest["segments"] == {"Mietvertrag_1": [1, 2]}
+    assert manifest["sha256"] == file_hashes.sha256_file(pdf_path)
+
+
+def test_rotated_pages_use_displayed_size(tmp_path):
+    pdf_path = write_pdf(tmp_path / "a.pdf", [A4, A4])
+    with fitz.open(pdf_path) as doc:
+        doc[1].set_rotation(90)
+        doc.saveIncr()
+
+    assert expand_page_sizes(manifests.build_manifest(pdf_path)["page_sizes"]) == [A4, (842.0, 595.0)]
+
+
+def test_stale_manifest_detection(tmp_path):
+    pdf_path = write_pdf(tmp_path / "a.pdf", [A4])
+    manifest = manifests.build_manifest(pdf_path)
+    stat = pdf_path.stat()
+    assert manifests.is_current(manifest, pdf_path)
+    assert manifests.is_current(manifest, pdf_path, manifest["sha256"])
+
+    # Gleicher Inhalt, andere Änderungszeit
+    os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert not manifests.is_current(manifest, pdf_path)
+
+    # Andere Größe bei gleicher Änderungszeit
+    with open(pdf_path, "ab") as f:
+        f.write(b"\n")
+    os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    assert not manifests.is_current(manifest, pdf_path)
+
+    # Größe und Änderungszeit passen, aber der bekannte Hash nicht
+    manifest = manifests.build_manifest(pdf_path)
+    assert not manifests.is_current(manifest, pdf_path, "0" * 64)
+    assert not manifests.is_current({**manifest, "version": manifests.VERSION + 1}, pdf_path)
+    assert not manifests.is_current(None, pdf_path)
+
+
+def test_refresh_rebuilds_when_hash_changed(tmp_path, store):
+    def padded_pdf(path, **kwargs):
+        # Leerzeilen nach %%EOF stören nicht und ergeben für beide Versionen dieselbe Größe
+        content = write_pdf(path, [A4], **kwargs).read_bytes()
+        return content + b"\n" * (4096 - len(content))
+
+    pdf_path = tmp_path / "a.pdf"
+    pdf_path.write_bytes(padded_pdf(pdf_path))
+    old = manifests.refresh(store, pdf_path, segments=[])
+    stat = pdf_path.stat()
+
+    # Neue Version mit gleicher Größe und Änderungszeit (z.B. beim Upload ersetzt)
+    pdf_path.write_bytes(padded_pdf(tmp_path / "neu.pdf", text_pages=(1,)))
+    assert pdf_path.stat().st_size == stat.st_size
+    os.utime(pdf_path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    # Nur über die Segmente aktualisiert, solange der Hash nicht bekannt ist
+    segments = [{"name": "Rechnung_1", "pages": [1]}]
+    assert manifests.refresh(store, pdf_path, segments)["text_layer"] == "0"
+    manifest = manifests.refresh(store, pdf_path, segments, sha256=file_hashes.sha256_file(pdf_path))
+
+    assert manifest["sha256"] != old["sha256"] and manifest["text_layer"] == "1"
+    assert manifest["segments"] == {"Rechnung_1": [1]}
+    assert store.get_manifest("a.pdf") == manifest
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    import app as app_module
+    import http_cache
+    import result_store
+
+    monkeypatch.setattr(app_module, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(result_store, "DB_FILE", tmp_path / "results.sqlite")
+    monkeypatch.setattr(result_store, "_stores", {})
+    monkeypatch.setattr(http_cache, "_cache", {})
+    return app_module.app.test_client()
+
+
+def test_documents_recompute_missing_and_stale_manifests(tmp_path, client, monkeypatch):
+    import result_store
+
+    store = result_store.get_store()
+    write_pdf(tmp_path / "neu.pdf", [A4], text_pages=(1,))
+    write_pdf(tmp_path / "alt.pdf", [A4, A4])
+    write_pdf(tmp_path / "aktuell.pdf", [A4])
+    # alt.pdf: Manifest einer früheren Version der Datei
+    store.upsert_manifest("alt.pdf", {**manifests.build_manifest(tmp_path / "alt.pdf"), "page_count": 5,
+                                      "mtime_ns": 1})
+    store.upsert_manifest("aktuell.pdf", manifests.build_manifest(tmp_path / "aktuell.pdf"))
+    for filename in ("neu.pdf", "alt.pdf", "aktuell.pdf"):
+        store.upsert_split(filename, [{"name": "Mietvertrag_1", "pages": [1]}])
+    built = []
+    build_manifest = manifests.build_manifest
+    monkeypatch.setattr(manifests, "build_manifest",
+                        lambda pdf_path, *args: built.append(pdf_path.name) or build_manifest(pdf_path, *args))
+
+    documents = {document["datei"]: document["manifest"] for document in client.get("/api/documents").get_json()}
+
+    # Nur fehlende und veraltete Manifeste werden berechnet und gespeichert
+    assert sorted(built) == ["alt.pdf", "neu.pdf"]
+    assert documents["neu.pdf"]["text_layer"] == "1"
+    assert documents["alt.pdf"]["page_count"] == 2
+    assert documents["aktuell.pdf"]["page_count"] == 1
+    assert all(manifest["segments"] == {"Mietvertrag_1": [1]} for manifest in documents.values())
+    assert store.get_manifest("alt.pdf")["page_count"] == 2
+    assert manifests.is_current(store.get_manifest("neu.pdf"), tmp_path / "neu.pdf")
@@ -0,0 +1,79 @@
+"""Tests für Zeitmessungen und /metrics-Ausgabe (metrics.py)"""
+import pytest
+import metrics
+
+
+@pytest.fixture(autouse=True)
+def clean_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def test_document_label_is_not_exported(monkeypatch):
+    for index in range(50):
+        metrics.observe("parse_llamaparse", 0.2, document=f"dokument_{index}.pdf", category="Mietvertrag")
+
+    output = metrics.render_prometheus()
+
+    assert "document=" not in output
+    assert output.count("_count{") == 1
+    assert ('flatscouts_stage_duration_seconds_count{stage="parse_llamaparse",category="Mietvertrag"} 50'
+            in output)
+
+
+def test_documents_in_run_summary_are_capped(monkeypatch):
+    monkeypatch.setattr(metrics, "MAX_DOCUMENTS", 3)
+    for index in range(5):
+        metrics.observe("store_write", 0.01 * (index + 1), document=f"{index}.pdf")
+    # Erneut genutztes Dokument wird nicht verdrängt
+    metrics.observe("store_write", 0.5, document="2.pdf")
+    metrics.observe("store_write", 0.5, document="5.pdf")
+
+    summary = metrics.run_summary()
+
+    assert set(summary["documents"]) == {"2.pdf", "4.pdf", "5.pdf"}
+    assert summary["documents"]["2.pdf"]["store_write"]["count"] == 2
+    assert summary["stages"]["store_write"]["count"] == 7
+
+
+def test_snapshot_merge_round_trip():
+    metrics.observe("job_run", 1.5, kind="split")
+    metrics.observe("job_run", 3.0, kind="split", document="a.pdf")
+    entries = metrics.snapshot()
+
+    metrics.reset()
+    metrics.merge(entries)
+    metrics.merge(entries)
+
+    assert metrics.run_summary()["stages"]["job_run"]["count"] == 4
+    assert all("document" not in entry["labels"] for entry in metrics.snapshot())
+
+
+def test_timer_records_failures_and_notifies_listeners():
+    events = []
+
+    class Listener:
+        def stage_started(self, stage):
+            events.append(("start", stage))
+
+        def stage_finished(self, stage, seconds):
+            events.append(("end", stage))
+
+    listener = Listener()
+    metrics.add_stage_listener(listener)
+    try:
+        with pytest.raises(RuntimeError):
+            with metrics.timer("split_window"):
+                raise RuntimeError("Fehler")
+    finally:
+        metrics.remove_stage_listener(listener)
+
+    assert events == [("start", "split_window"), ("end", "split_window")]
+    assert metrics.run_summary()["stages"]["split_window"]["count"] == 1
+
+
+def test_percentile():
+    assert metrics.percentile([], 50) == 0.0
+    assert metrics.percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.5
+    assert metrics.percentile([1.0, 2.0, 3.0], 100) == 3.0
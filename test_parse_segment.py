@@ -1,5 +1,6 @@
 """Test-Skript zum Parsen einer einzelnen Seite mit LlamaParse"""
 import json
+import os
 from pathlib import Path
 import fitz
 import uuid
@@ -17,17 +18,17 @@ parser = LlamaParse(
     model="openai-gpt-4-1-mini",
     high_res_ocr=True,
     language="de",
-    api_key="llx-IWbVsP0maYq3OvP4VJg2MjM8jxqciXHA9Gx1SLYRB3O2rr8W",
+    api_key=os.environ.get("LLAMA_CLOUD_API_KEY", ""),
 )
 '''
 parser = LlamaParse(
     tier="premium",
-    api_key="llx-IWbVsP0maYq3OvP4VJg2MjM8jxqciXHA9Gx1SLYRB3O2rr8W",
+    api_key=os.environ.get("LLAMA_CLOUD_API_KEY", ""),
 )
 
 parser = LlamaParse(
     preset="invoice",
-    api_key="llx-IWbVsP0maYq3OvP4VJg2MjM8jxqciXHA9Gx1SLYRB3O2rr8W",
+    api_key=os.environ.get("LLAMA_CLOUD_API_KEY", ""),
 )
 
 
@@ -38,7 +39,7 @@ parser = LlamaParse(
     adaptive_long_table=True,  # Adaptive long table. LlamaParse will try to detect long table and adapt the output
     outlined_table_extraction=True,  # Whether to try to extract outlined tables
     output_tables_as_HTML=False,  # Whether to output tables as HTML in the markdown output
-    api_key="llx-IWbVsP0maYq3OvP4VJg2MjM8jxqciXHA9Gx1SLYRB3O2rr8W",
+    api_key=os.environ.get("LLAMA_CLOUD_API_KEY", ""),
 )
 
 parser = LlamaParse(
@@ -46,7 +47,7 @@ parser = LlamaParse(
     model="openai-gpt-4-1-mini",
     high_res_ocr=True,
     language="de",
-    api_key="llx-IWbVsP0maYq3OvP4VJg2MjM8jxqciXHA9Gx1SLYRB3O2rr8W",
+    api_key=os.environ.get("LLAMA_CLOUD_API_KEY", ""),
     description="Document-Agent mit GPT-4o (ganzes Dokument-Kontext)"
 )
 
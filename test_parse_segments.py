@@ -0,0 +1,240 @@
+"""Tests für das Parsen von Segmenten (parse_segments.py) mit einem Ersatz für LlamaParse"""
+from types import SimpleNamespace
+import fitz  # PyMuPDF
+import pytest
+import parse_segments
+from result_store import ResultStore
+
+
+class RecordingParser:
+    """Ersatz für LlamaParse: liefert die Textebene jeder Seite und merkt sich die geparsten Seiten"""
+
+    def __init__(self):
+        self.calls = []
+
+    def parse(self, path):
+        with fitz.open(path) as doc:
+            texts = [page.get_text().strip() for page in doc]
+        self.calls.append(texts)
+        return SimpleNamespace(pages=[SimpleNamespace(text=text, md=f"## {text}") for text in texts])
+
+
+def write_pdf(path, texts):
+    with fitz.open() as doc:
+        for text in texts:
+            doc.new_page().insert_text((72, 72), text)
+        doc.save(str(path))
+
+
+@pytest.fixture
+def env(tmp_path):
+    parser = RecordingParser()
+    config = parse_segments.ParseConfig(data_dir=tmp_path, log_dir=tmp_path / "logs", tier="agent",
+                                        optimize_images=False, parser=parser)
+    return SimpleNamespace(config=config, parser=parser, store=ResultStore(tmp_path / "results.sqlite"),
+                           pdf_path=tmp_path / "a.pdf")
+
+
+def parse_document(env, segments):
+    """Parst alle Segmente wie run() und speichert das Ergebnis; gibt die Segmente zurück"""
+    env.parser.calls.clear()
+    previous = parse_segments.load_previous_version(env.store, env.pdf_path, env.config)
+    temp_files = []
+    parsed = [parse_segments.parse_segment(env.config, env.pdf_path, env.pdf_path.name, segment, temp_files,
+                                           previous=previous)
+              for segment in segments]
+    parse_segments.cleanup_temp_files(temp_files)
+    parse_segments.store_document(env.store, env.pdf_path.name, parsed, env.config.data_dir)
+    return parsed
+
+
+def segment(name, category, pages):
+    return {"name": name, "category": category, "pages": pages, "confidence_category": "high"}
+
+
+def test_page_fingerprints_follow_content(tmp_path):
+    write_pdf(tmp_path / "a.pdf", ["Mietvertrag", "Nebenkosten"])
+    write_pdf(tmp_path / "b.pdf", ["Deckblatt", "Mietvertrag", "Nebenkosten geändert"])
+
+    first = parse_segments.page_fingerprints(tmp_path / "a.pdf")
+    second = parse_segments.page_fingerprints(tmp_path / "b.pdf")
+
+    assert len(first) == 2 and len(set(first)) == 2
+    assert second[1] == first[0]
+    assert first[1] not in second
+
+
+def test_only_changed_pages_are_parsed_again(env):
+    segments = [segment("Mietvertrag_1", "Mietvertrag", [1, 2]), segment("Rechnung_1", "Rechnung", [3])]
+    write_pdf(env.pdf_path, ["Mietzins 1850", "Kaution 5550", "Rechnung 220"])
+    parse_document(env, segments)
+    assert env.parser.calls == [["Mietzins 1850", "Kaution 5550"], ["Rechnung 220"]]
+
+    write_pdf(env.pdf_path, ["Mietzins 1850", "Kaution 6000", "Rechnung 220"])
+    contract, invoice = parse_document(env, segments)
+
+    # Nur die geänderte Seite geht an den Parser, die Rechnung wird ganz übernommen
+    assert env.parser.calls == [["Kaution 6000"]]
+    assert contract["parsed"]["text"] == "Mietzins 1850\n\nKaution 6000"
+    assert contract["parsed"]["num_pages_parsed"] == 2
+    assert invoice["parsed"]["text"] == "Rechnung 220"
+    assert [page["text"] for page in env.store.get_pages("a.pdf").values()] == [
+        "Mietzins 1850", "Kaution 6000", "Rechnung 220"
+    ]
+
+
+def test_inserted_page_shifts_segments_without_reparse(env):
+    write_pdf(env.pdf_path, ["Mietzins 1850", "Kaution 5550", "Rechnung 220"])
+    parse_document(env, [segment("Mietvertrag_1", "Mietvertrag", [1, 2]), segment("Rechnung_1", "Rechnung", [3])])
+
+    write_pdf(env.pdf_path, ["Deckblatt", "Mietzins 1850", "Kaution 5550", "Rechnung 220"])
+    cover, contract, invoice = parse_document(env, [
+        segment("Deckblatt_1", "Sonstiges", [1]),
+        segment("Mietvertrag_1", "Mietvertrag", [2, 3]),
+        segment("Rechnung_1", "Rechnung", [4]),
+    ])
+
+    assert env.parser.calls == [["Deckblatt"]]
+    assert cover["parsed"]["text"] == "Deckblatt"
+    assert contract["parsed"]["text"] == "Mietzins 1850\n\nKaution 5550"
+    assert invoice["parsed"]["text"] == "Rechnung 220"
+
+
+def test_moved_segment_boundary_reuses_pages(env):
+    write_pdf(env.pdf_path, ["Mietzins 1850", "Kaution 5550", "Rechnung 220"])
+    parse_document(env, [segment("Mietvertrag_1", "Mietvertrag", [1, 2]), segment("Rechnung_1", "Rechnung", [3])])
+
+    # Neuer Split ordnet Seite 2 der Rechnung zu, keine Seite hat sich geändert
+    contract, invoice = parse_document(env, [
+        segment("Mietvertrag_1", "Mietvertrag", [1]),
+        segment("Rechnung_1", "Rechnung", [2, 3]),
+    ])
+
+    assert env.parser.calls == []
+    assert contract["parsed"]["text"] == "Mietzins 1850"
+    assert invoice["parsed"]["text"] == "Kaution 5550\n\nRechnung 220"
+
+
+
+def test_changed_settings_are_parsed_again(env):
+    segments = [segment("Mietvertrag_1", "Mietvertrag", [1, 2]), segment("Rechnung_1", "Rechnung", [3])]
+    write_pdf(env.pdf_path, ["Mietzins 1850", "Kaution 5550", "Rechnung 220"])
+    [contract, _] = parse_document(env, segments)
+    assert contract["parsed"]["settings"] == parse_segments.parse_settings(env.config)
+
+    # Andere Stufe: kein Segment und keine Seite wird übernommen
+    env.config.tier = "balanced"
+    parse_document(env, segments)
+    assert env.parser.calls == [["Mietzins 1850", "Kaution 5550"], ["Rechnung 220"]]
+
+    # Gleiche Einstellungen wie im letzten Lauf: alles übernommen
+    parse_document(env, segments)
+    assert env.parser.calls == []
+
+    env.config.model = "anderes-modell"
+    parse_document(env, segments[1:])
+    assert env.parser.calls == [["Rechnung 220"]]
+
+
+def test_results_without_settings_are_not_reused(env):
+    segments = [segment("Rechnung_1", "Rechnung", [1])]
+    write_pdf(env.pdf_path, ["Rechnung 220"])
+    [invoice] = parse_document(env, segments)
+    # Ergebnis eines älteren Laufs ohne Einstellungs-Schlüssel
+    del invoice["parsed"]["settings"]
+    parse_segments.store_document(env.store, "a.pdf", [invoice], env.config.data_dir)
+
+    parse_document(env, segments)
+    assert env.parser.calls == [["Rechnung 220"]]
+
+
+def test_force_parses_everything_again(env):
+    segments = [segment("Rechnung_1", "Rechnung", [1])]
+    write_pdf(env.pdf_path, ["Rechnung 220"])
+    parse_document(env, segments)
+
+    env.config.force = True
+    parse_document(env, segments)
+    assert env.parser.calls == [["Rechnung 220"]]
+    # Die Seitenergebnisse werden trotzdem für den nächsten Lauf gespeichert
+    env.config.force = False
+    parse_document(env, segments)
+    assert env.parser.calls == []
+
+
+def traits(pages=1, text_layer=True, tables=False):
+    return {"pages": pages, "text_pages": [text_layer] * pages, "text_layer": text_layer, "tables": tables}
+
+
+def test_route_tier():
+    assert parse_segments.route_tier("Mietvertrag", "high", traits()) == "agent"
+    assert parse_segments.route_tier("Rechnung", "high", traits(pages=2)) == "fast"
+    assert parse_segments.route_tier("Rechnung", "high", traits(text_layer=False)) == "balanced"
+    assert parse_segments.route_tier("Rechnung", "low", traits()) == "agent"
+    assert parse_segments.route_tier("Rechnung", "high", traits(tables=True)) == "agent"
+    assert parse_segments.route_tier("Rechnung", "high", traits(pages=7)) == parse_segments.DEFAULT_TIER
+    assert parse_segments.route_tier("Sonstiges", "medium", traits()) == parse_segments.DEFAULT_TIER
+
+
+class EmptyParser(RecordingParser):
+    """Liefert leere Seiten (wie eine Stufe ohne LLM bei schwierigem Layout)"""
+
+    def parse(self, path):
+        result = super().parse(path)
+        return SimpleNamespace(pages=[SimpleNamespace(text="", md="") for _ in result.pages])
+
+
+@pytest.fixture
+def tier_parsers(env, monkeypatch):
+    parsers = {"fast": EmptyParser(), "balanced": RecordingParser(), "agent": RecordingParser()}
+    monkeypatch.setattr(parse_segments, "get_parser", lambda config, tier="agent": parsers[tier])
+    monkeypatch.setattr(parse_segments, "_tier_stats", {})
+    env.config.tier = "auto"
+    write_pdf(env.pdf_path, ["Rechnung 220"])
+    return parsers
+
+
+def test_empty_output_falls_back_to_heavier_tier(env, tier_parsers):
+    result = parse_segments.parse_with_tier(env.config, env.pdf_path, "Rechnung", "high", "a.pdf")
+
+    assert result["success"] and result["text"] == "Rechnung 220"
+    assert result["tier"] == "agent" and result["fallback_from"] == ["fast"]
+    assert len(tier_parsers["fast"].calls) == 1 and len(tier_parsers["agent"].calls) == 1
+    summary = parse_segments.tier_summary()
+    assert summary["fast"]["fallbacks"] == 1 and summary["agent"]["fallbacks"] == 0
+
+
+def test_usable_output_keeps_routed_tier(env, tier_parsers):
+    tier_parsers["fast"] = RecordingParser()
+
+    result = parse_segments.parse_with_tier(env.config, env.pdf_path, "Rechnung", "high", "a.pdf")
+
+    assert result["tier"] == "fast" and "fallback_from" not in result
+    assert tier_parsers["agent"].calls == []
+
+
+def test_heaviest_tier_error_is_returned(env, tier_parsers):
+    class FailingParser:
+        def parse(self, path):
+            raise RuntimeError("Zeitlimit überschritten")
+
+    tier_parsers["agent"] = FailingParser()
+
+    result = parse_segments.parse_with_tier(env.config, env.pdf_path, "Mietvertrag", "high", "a.pdf")
+
+    assert not result["success"] and result["error"] == "Zeitlimit überschritten"
+    assert result["tier"] == "agent" and "fallback_from" not in result
+
+
+def test_api_key_comes_from_environment(tmp_path, monkeypatch):
+    monkeypatch.setenv("LLAMA_CLOUD_API_KEY", "llx-test")
+    assert parse_segments.ParseConfig().api_key == "llx-test"
+
+    monkeypatch.delenv("LLAMA_CLOUD_API_KEY")
+    config = parse_segments.ParseConfig(data_dir=tmp_path, optimize_images=False)
+    assert config.api_key == "" and "api_key=" not in repr(config)
+    with pytest.raises(RuntimeError, match="LLAMA_CLOUD_API_KEY"):
+        parse_segments.get_parser(config)
+    # Mit eigenem Parser (Tests, Benchmarks) wird kein Schlüssel gebraucht
+    config.parser = RecordingParser()
+    assert parse_segments.get_parser(config) is config.parser
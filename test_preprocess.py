@@ -0,0 +1,117 @@
+"""Tests für die Neukomprimierung von Bildern vor dem Upload (preprocess.py)"""
+import io
+import os
+import threading
+import time
+import fitz  # PyMuPDF
+import pytest
+from PIL import Image
+import preprocess
+
+
+def image_xrefs(pdf_path):
+    with fitz.open(pdf_path) as doc:
+        return [xref for xref in range(1, doc.xref_length()) if doc.xref_get_key(xref, "Subtype")[1] == "/Image"]
+
+
+@pytest.fixture
+def scan_pdf(tmp_path):
+    """Zwei Seiten mit demselben 270-dpi-Scan (JPEG) und einem kleineren zweiten Bild"""
+    def jpeg(size):
+        buffer = io.BytesIO()
+        Image.effect_noise(size, 60).convert("RGB").save(buffer, "JPEG", quality=92)
+        return buffer.getvalue()
+
+    scan, photo = jpeg((2200, 3100)), jpeg((1200, 900))
+    pdf_path = tmp_path / "scan.pdf"
+    with fitz.open() as doc:
+        for _ in range(2):
+            page = doc.new_page(width=595, height=842)
+            page.insert_image(page.rect, stream=scan)
+        page.insert_image(fitz.Rect(50, 50, 200, 162), stream=photo)
+        doc.save(str(pdf_path))
+    return pdf_path
+
+
+def test_images_are_replaced_in_place(scan_pdf, tmp_path):
+    out_path = tmp_path / "optimized.pdf"
+
+    stats = preprocess.optimize_pdf(scan_pdf, out_path)
+
+    assert stats["images_rewritten"] == 2
+    # Ein Bildobjekt pro Eingangsbild, keine zusätzliche Kopie
+    assert len(image_xrefs(out_path)) == len(image_xrefs(scan_pdf)) == 2
+    assert out_path.stat().st_size < scan_pdf.stat().st_size
+    with fitz.open(out_path) as doc:
+        [scan_xref] = [image[0] for image in doc[0].get_images(full=True)]
+        assert doc.xref_get_key(scan_xref, "Filter")[1] == "/DCTDecode"
+        assert doc.xref_get_key(scan_xref, "ColorSpace")[1] == "/DeviceGray"
+        pix = fitz.Pixmap(doc, scan_xref)
+        assert (pix.width, pix.height) == (int(doc.xref_get_key(scan_xref, "Width")[1]),
+                                           int(doc.xref_get_key(scan_xref, "Height")[1]))
+        assert pix.width < 2200
+        # Seiten bleiben darstellbar
+        assert doc[1].get_pixmap(dpi=20).width > 0
+
+
+def test_upload_copy_cache_hit_and_miss(scan_pdf, tmp_path, monkeypatch):
+    optimized_dir = tmp_path / ".optimized"
+    calls = []
+    optimize_pdf = preprocess.optimize_pdf
+    monkeypatch.setattr(preprocess, "optimize_pdf", lambda *args: calls.append(args) or optimize_pdf(*args))
+
+    first = preprocess.upload_copy(scan_pdf, optimized_dir=optimized_dir)
+    assert first != scan_pdf and first.exists()
+    assert preprocess.upload_copy(scan_pdf, optimized_dir=optimized_dir) == first
+    assert len(calls) == 1
+
+    # Andere Einstellungen: neue Kopie, die eben benutzte bleibt für laufende Uploads erhalten
+    second = preprocess.upload_copy(scan_pdf, quality=50, optimized_dir=optimized_dir)
+    assert len(calls) == 2 and second != first
+    assert first.exists()
+
+
+def test_upload_copy_removes_only_unused_copies(scan_pdf, tmp_path):
+    optimized_dir = tmp_path / ".optimized"
+    copy = preprocess.upload_copy(scan_pdf, optimized_dir=optimized_dir)
+    leftover = copy.with_name(f"{copy.name}.999.tmp")
+    leftover.write_bytes(b"abgebrochen")
+    stale = copy.with_name("1_1_200_75.pdf")
+    stale.write_bytes(b"%PDF alte Version")
+    old = time.time() - preprocess.COPY_GRACE_SECONDS - 1
+    os.utime(stale, (old, old))
+
+    new = preprocess.upload_copy(scan_pdf, quality=50, optimized_dir=optimized_dir)
+
+    assert new.exists() and copy.exists()
+    assert not stale.exists() and not leftover.exists()
+
+
+def test_concurrent_workers_share_one_copy(scan_pdf, tmp_path, monkeypatch):
+    calls = []
+    optimize_pdf = preprocess.optimize_pdf
+    monkeypatch.setattr(preprocess, "optimize_pdf", lambda *args: calls.append(args) or optimize_pdf(*args))
+    results = []
+
+    def worker():
+        path = preprocess.upload_copy(scan_pdf, optimized_dir=tmp_path / ".optimized")
+        results.append((path, path.exists()))
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert len({path for path, _ in results}) == 1 and all(exists for _, exists in results)
+
+
+def test_upload_copy_without_savings_returns_original(tmp_path):
+    pdf_path = tmp_path / "text.pdf"
+    with fitz.open() as doc:
+        doc.new_page().insert_text((72, 72), "Mietvertrag")
+        doc.save(str(pdf_path))
+
+    assert preprocess.upload_copy(pdf_path, optimized_dir=tmp_path / ".optimized") == pdf_path
+    assert list((tmp_path / ".optimized").glob("*/*.skip"))
@@ -0,0 +1,84 @@
+"""Tests für den Profiling-Modus (profiling.py)"""
+import json
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from types import SimpleNamespace
+import metrics
+import profiling
+
+
+def test_frame_label_uses_qualified_name():
+    assert profiling._frame_label(sys._getframe()).startswith("test_frame_label_uses_qualified_name (test_profiling.py:")
+
+
+def test_frame_label_without_co_qualname():
+    # Code-Objekte vor Python 3.11 haben nur co_name
+    code = SimpleNamespace(co_name="run", co_filename="/app/parse_segments.py", co_firstlineno=683)
+    assert profiling._frame_label(SimpleNamespace(f_code=code)) == "run (parse_segments.py:683)"
+
+
+def busy(seconds):
+    """CPU-Arbeit, damit der Sampler sie sicher erfasst"""
+    deadline = time.perf_counter() + seconds
+    values = []
+    while time.perf_counter() < deadline:
+        values.append(sum(range(1000)))
+    return values
+
+
+def staged_workload():
+    with metrics.timer("test_split"):
+        busy(0.2)
+        with metrics.timer("test_extract"):
+            busy(0.2)
+    # Schritt in einem zweiten Thread (wie parallel gesplittete Seitenfenster)
+    def window():
+        with metrics.timer("test_window"):
+            busy(0.2)
+    thread = threading.Thread(target=window)
+    thread.start()
+    thread.join()
+
+
+def test_profile_writes_all_outputs(tmp_path):
+    metrics.reset()
+    was_tracing = tracemalloc.is_tracing()
+    try:
+        with profiling.profile(tmp_path, "testlauf") as profiler:
+            staged_workload()
+    finally:
+        metrics.reset()
+    prefix = f"profile_testlauf_{int(profiler.started_at)}"
+
+    # cProfile: mit pstats lesbar und enthält die Arbeit des Hauptthreads
+    stats = pstats.Stats(str(tmp_path / f"{prefix}.pstats"))
+    assert any(function == "busy" for _, _, function in stats.stats)
+
+    # Folded: "stapel anzahl" pro Zeile, äußerste Einträge sind die aktiven Schritte
+    lines = (tmp_path / f"{prefix}.folded").read_text(encoding="utf-8").splitlines()
+    stacks = {}
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        stacks[stack] = int(count)
+    assert all(count > 0 for count in stacks.values())
+    assert any(stack.startswith("stage:test_split;stage:test_extract;") and "busy (test_profiling.py:" in stack
+               for stack in stacks)
+    assert any(stack.startswith("stage:test_split;") and ";stage:" not in stack for stack in stacks)
+    assert any(stack.startswith("stage:test_window;") for stack in stacks)
+    # Der Sampler-Thread erscheint nicht in den eigenen Stichproben
+    assert not any("_sample_loop" in stack for stack in stacks)
+
+    # Speicher: gültiges JSON mit einem Eintrag und einem ladbaren Snapshot pro Schritt
+    memory = json.loads((tmp_path / f"{prefix}_memory.json").read_text(encoding="utf-8"))
+    assert memory["run"] == "testlauf"
+    assert memory["traced_peak_bytes"] >= memory["traced_current_bytes"] >= 0
+    assert set(memory["stages"]) == {"test_split", "test_extract", "test_window"}
+    for stage in memory["stages"].values():
+        assert stage["count"] == 1 and stage["seconds"] >= 0.2
+        assert stage["max_peak_growth_bytes"] >= 0
+        assert all({"location", "size_bytes", "count"} <= set(entry) for entry in stage["top_allocations"])
+        assert tracemalloc.Snapshot.load(str(tmp_path / stage["snapshot"])).traces
+    assert tracemalloc.is_tracing() == was_tracing
@@ -0,0 +1,113 @@
+"""Tests für den Ergebnis-Speicher (result_store.py)"""
+import json
+import pytest
+from result_store import ResultStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ResultStore(tmp_path / "results.sqlite")
+
+
+def parsed(name, text, pages=(1,)):
+    return {"name": name, "category": "Mietvertrag", "pages": list(pages),
+            "parsed": {"text": text, "markdown": f"# {text}"}}
+
+
+def test_every_write_bumps_revision(store):
+    revisions = [store.revision()]
+    store.upsert_split("a.pdf", [{"name": "Mietvertrag_1", "pages": [1]}])
+    revisions.append(store.revision())
+    store.upsert_parsed("a.pdf", [parsed("Mietvertrag_1", "Kaution")])
+    revisions.append(store.revision())
+    store.delete_document("a.pdf")
+    revisions.append(store.revision())
+
+    assert revisions == sorted(set(revisions))
+    assert store.get_split("a.pdf") is None
+    assert store.get_parsed("a.pdf") is None
+    assert store.get_manifest("a.pdf") is None
+
+
+def test_manifest_write_keeps_revision(store):
+    revision = store.revision()
+    store.upsert_manifest("a.pdf", {"version": 1, "page_count": 1})
+    assert store.revision() == revision
+    assert store.get_manifest("a.pdf") == {"version": 1, "page_count": 1}
+
+
+def test_documents_cache_survives_manifest_refresh(tmp_path, monkeypatch):
+    import app as app_module
+    import http_cache
+    import result_store
+    import fitz  # PyMuPDF
+
+    monkeypatch.setattr(app_module, "DATA_DIR", tmp_path)
+    monkeypatch.setattr(result_store, "DB_FILE", tmp_path / "results.sqlite")
+    monkeypatch.setattr(result_store, "_stores", {})
+    monkeypatch.setattr(http_cache, "_cache", {})
+    with fitz.open() as doc:
+        doc.new_page()
+        doc.save(str(tmp_path / "a.pdf"))
+    result_store.get_store().upsert_split("a.pdf", [{"name": "Mietvertrag_1", "pages": [1]}])
+    builds = []
+    build_documents = app_module.build_documents
+    monkeypatch.setattr(app_module, "build_documents", lambda: builds.append(1) or build_documents())
+    client = app_module.app.test_client()
+
+    # Erste Anfrage berechnet das fehlende Manifest, die folgenden kommen aus dem Cache
+    first = client.get("/api/documents")
+    assert first.get_json()[0]["manifest"]["page_count"] == 1
+    assert client.get("/api/documents", headers={"If-None-Match": first.headers["ETag"]}).status_code == 304
+    client.get("/api/documents")
+    assert len(builds) == 1
+
+
+def test_retain_bumps_revision_only_when_something_was_removed(store):
+    store.upsert_split("a.pdf", [])
+    store.upsert_split("b.pdf", [])
+    store.upsert_parsed("a.pdf", [parsed("Mietvertrag_1", "eins")])
+
+    revision = store.revision()
+    store.retain_split(["a.pdf", "b.pdf"])
+    store.retain_parsed(["a.pdf"])
+    assert store.revision() == revision
+
+    store.retain_split(["a.pdf"])
+    assert store.revision() > revision
+    assert list(store.all_split()) == ["a.pdf"]
+
+    revision = store.revision()
+    store.retain_parsed([])
+    assert store.revision() > revision
+    assert not store.has_parsed()
+
+
+def test_parsed_content_is_split_off_and_loaded_lazily(store):
+    store.upsert_parsed("a.pdf", [parsed("Mietvertrag_1", "Kaution"), parsed("Rechnung_1", "Betrag", (2,))])
+
+    [first, second] = store.all_parsed()["a.pdf"]
+    assert first["parsed"]["text"] == "Kaution"
+    assert second["parsed"]["markdown"] == "# Betrag"
+
+    light = store.all_parsed(include_content=False)["a.pdf"]
+    assert "text" not in light[0]["parsed"]
+    assert store.get_segment_content("a.pdf", "Rechnung_1")["text"] == "Betrag"
+
+
+def test_parsed_hash_changes_with_content(store):
+    store.upsert_parsed("a.pdf", [parsed("Mietvertrag_1", "eins")])
+    before = store.parsed_hashes()["a.pdf"]
+    store.upsert_parsed("a.pdf", [parsed("Mietvertrag_1", "eins")])
+    assert store.parsed_hashes()["a.pdf"] == before
+    store.upsert_parsed("a.pdf", [parsed("Mietvertrag_1", "zwei")])
+    assert store.parsed_hashes()["a.pdf"] != before
+
+
+def test_legacy_json_is_imported_on_first_start(tmp_path):
+    with open(tmp_path / "split_results.json", "w", encoding="utf-8") as f:
+        json.dump({"a.pdf": [{"name": "Mietvertrag_1", "pages": [1]}]}, f)
+
+    store = ResultStore(tmp_path / "results.sqlite")
+
+    assert store.get_split("a.pdf") == [{"name": "Mietvertrag_1", "pages": [1]}]
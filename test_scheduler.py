@@ -0,0 +1,90 @@
+"""Tests für die Reihenfolge nach geschätztem Aufwand (scheduler.py)"""
+import os
+import time
+import fitz  # PyMuPDF
+import pytest
+import scheduler
+
+
+def write_pdf(path, pages):
+    with fitz.open() as doc:
+        for _ in range(pages):
+            doc.new_page()
+        doc.save(str(path))
+    return path
+
+
+def test_cost_model():
+    assert scheduler.estimate_cost(0, 0) == scheduler.BASE_COST
+    assert scheduler.estimate_cost(10, 4 * 1024 * 1024) == (
+        scheduler.BASE_COST + 10 * scheduler.PAGE_COST + 4 * scheduler.MB_COST
+    )
+    now = 1_000_000.0
+    assert scheduler.effective_cost(100.0, now - 60, now) == 100.0 - 60 * scheduler.AGING_FACTOR
+    # Zeitstempel in der Zukunft (Uhrzeitsprung) geben keinen Malus
+    assert scheduler.effective_cost(100.0, now + 60, now) == 100.0
+
+
+def test_segment_cost_shares_file_size(tmp_path):
+    pdf_path = write_pdf(tmp_path / "a.pdf", 4)
+    size = pdf_path.stat().st_size
+
+    assert scheduler.segment_cost(pdf_path, [1, 2]) == pytest.approx(scheduler.estimate_cost(2, size / 2))
+    assert scheduler.document_cost(pdf_path) == pytest.approx(scheduler.estimate_cost(4, size))
+
+
+def test_shortest_job_first_with_aging():
+    now = time.time()
+    jobs = {
+        "neu_klein": (scheduler.estimate_cost(1, 0), now),
+        "neu_gross": (scheduler.estimate_cost(800, 0), now),
+        "alt_gross": (scheduler.estimate_cost(800, 0), now - 5 * 3600),
+    }
+
+    ordered = scheduler.order(list(jobs), cost_of=lambda name: jobs[name][0], arrived_of=lambda name: jobs[name][1])
+
+    # Nach 5 Stunden Wartezeit überholt das große Dokument auch einen neuen 1-Seiter
+    assert ordered == ["alt_gross", "neu_klein", "neu_gross"]
+
+
+def test_priority_goes_first_in_marking_order():
+    now = time.time()
+    marked = {"b": now - 10, "c": now - 20}
+
+    ordered = scheduler.order(["a", "b", "c"], cost_of=lambda name: 1, arrived_of=lambda name: now,
+                              priority_of=marked.get)
+
+    assert ordered == ["c", "b", "a"]
+
+
+def test_priority_expires_after_ttl(tmp_path):
+    scheduler.mark_priority("neu.pdf", tmp_path)
+    assert "neu.pdf" in scheduler.priorities(tmp_path)
+
+    # Markierung von vor sechs Stunden ist abgelaufen
+    scheduler._save_priorities({"alt.pdf": time.time() - scheduler.PRIORITY_TTL - 1,
+                                "neu.pdf": time.time()}, tmp_path)
+    assert list(scheduler.priorities(tmp_path)) == ["neu.pdf"]
+
+    scheduler.clear_priority("neu.pdf", tmp_path)
+    assert scheduler.priorities(tmp_path) == {}
+
+
+def test_batch_order_for_split_and_parse(tmp_path):
+    large = write_pdf(tmp_path / "gross.pdf", 30)
+    small = write_pdf(tmp_path / "klein.pdf", 1)
+    marked = write_pdf(tmp_path / "upload.pdf", 60)
+    # Alle gleich lange wartend, damit nur die Kosten zählen
+    for pdf_path in (large, small, marked):
+        os.utime(pdf_path, (time.time(), time.time()))
+    scheduler.mark_priority("upload.pdf", tmp_path)
+
+    ordered = scheduler.order_pdf_files([large, tmp_path / "fehlt.pdf", small, marked], tmp_path)
+    assert [pdf_file.name for pdf_file in ordered] == ["upload.pdf", "klein.pdf", "gross.pdf", "fehlt.pdf"]
+
+    split_results = {
+        "gross.pdf": [{"pages": list(range(1, 31))}],
+        "klein.pdf": [{"pages": [1]}],
+        "upload.pdf": [{"pages": [1]}, {"pages": [2]}],
+    }
+    assert list(scheduler.order_split_results(split_results, tmp_path)) == ["upload.pdf", "klein.pdf", "gross.pdf"]
@@ -0,0 +1,46 @@
+"""Tests für den Volltext-Index (search_index.py)"""
+import pytest
+import search_index
+
+
+@pytest.fixture
+def index_file(tmp_path, monkeypatch):
+    index_file = tmp_path / "search_index.sqlite"
+    monkeypatch.setattr(search_index, "INDEX_FILE", index_file)
+    return index_file
+
+
+def segment(name, content, category="Mietvertrag", pages=(1,)):
+    return {"name": name, "category": category, "pages": list(pages), "parsed": {"markdown": content}}
+
+
+def test_snippet_is_escaped_before_highlighting(index_file):
+    search_index.index_document("a.pdf", [
+        segment("Mietvertrag_1", 'Mietzins <img src=x onerror="alert(1)"> & Kaution'),
+    ])
+
+    [hit] = search_index.search("Kaution")
+
+    assert "<img" not in hit["snippet"]
+    assert "&lt;img src=x onerror=&quot;alert(1)&quot;&gt; &amp;" in hit["snippet"]
+    assert "<mark>Kaution</mark>" in hit["snippet"]
+
+
+def test_search_filters_and_prefix_match(index_file):
+    search_index.index_document("a.pdf", [
+        segment("Mietvertrag_1", "Nebenkosten Heizung Hauswart"),
+        segment("Rechnung_1", "Rechnung Heizöl", category="Rechnung", pages=(3, 4)),
+    ])
+    search_index.index_document("b.pdf", [segment("Mietvertrag_1", "Heizung im Keller")])
+
+    assert {hit["file"] for hit in search_index.search("heiz")} == {"a.pdf", "b.pdf"}
+    [hit] = search_index.search("heiz", category="Rechnung")
+    assert hit["segment"] == "Rechnung_1" and hit["pages"] == [3, 4]
+    assert [hit["file"] for hit in search_index.search("heiz", filename="b.pdf")] == ["b.pdf"]
+    assert search_index.search('"') == []
+
+
+def test_removed_document_is_not_found(index_file):
+    search_index.index_document("a.pdf", [segment("Mietvertrag_1", "Kaution")])
+    search_index.remove_document("a.pdf")
+    assert search_index.search("Kaution") == []
@@ -0,0 +1,72 @@
+"""Tests für das Aufteilen großer Dokumente in Seitenfenster (split_document.py)"""
+import pytest
+import split_document
+from split_document import merge_window_segments, page_windows, window_ownership
+
+WINDOWS = [(1, 100), (91, 190), (181, 250)]
+
+
+def segment(category, first, last, confidence="high"):
+    """Segment mit fensterlokalen Seitennummern first..last"""
+    return {"category": category, "pages": list(range(first, last + 1)), "confidence_category": confidence}
+
+
+def test_page_windows():
+    assert page_windows(250, window_pages=100, overlap=10) == WINDOWS
+    assert page_windows(100, window_pages=100, overlap=10) == [(1, 100)]
+    assert page_windows(1) == [(1, 1)]
+    # Überlappung größer als das Fenster darf nicht endlos laufen
+    assert page_windows(3, window_pages=2, overlap=5) == [(1, 2), (2, 3)]
+
+
+def test_window_ownership_covers_every_page_once():
+    owned = window_ownership(WINDOWS)
+    assert owned == [(1, 95), (96, 185), (186, 250)]
+    pages = [page for start, end in owned for page in range(start, end + 1)]
+    assert pages == list(range(1, 251))
+
+
+def test_segment_across_cut_is_joined():
+    merged = merge_window_segments([
+        [segment("Mietvertrag", 1, 79), segment("Rechnung", 80, 100)],
+        # Fenster 2 beginnt bei Seite 91: Seiten 91-110 sind dieselbe Rechnung
+        [segment("Rechnung", 1, 20, confidence="medium"), segment("Protokoll", 21, 100)],
+        [segment("Protokoll", 1, 70)],
+    ], WINDOWS)
+
+    assert [(s["category"], s["pages"][0], s["pages"][-1]) for s in merged] == [
+        ("Mietvertrag", 1, 79), ("Rechnung", 80, 110), ("Protokoll", 111, 250),
+    ]
+    assert merged[1]["pages"] == list(range(80, 111))
+    # Die tiefere Sicherheit beider Fenster gewinnt
+    assert merged[1]["confidence_category"] == "medium"
+
+
+def test_adjacent_segments_of_same_category_stay_separate():
+    # Zwei Mietverträge, deren Grenze genau auf die Schnittstelle fällt
+    merged = merge_window_segments([
+        [segment("Mietvertrag", 1, 95), segment("Mietvertrag", 96, 100)],
+        [segment("Mietvertrag", 6, 100)],
+    ], WINDOWS[:2])
+
+    assert [(s["pages"][0], s["pages"][-1]) for s in merged] == [(1, 95), (96, 190)]
+
+
+def test_segments_only_in_overlap_are_dropped():
+    merged = merge_window_segments([
+        [segment("Mietvertrag", 1, 100)],
+        # Seiten 91-95 gehören Fenster 1
+        [segment("Anhang", 1, 5), segment("Mietvertrag", 6, 100)],
+    ], WINDOWS[:2])
+
+    assert [s["category"] for s in merged] == ["Mietvertrag"]
+    assert merged[0]["pages"] == list(range(1, 191))
+
+
+def test_session_requires_api_key(monkeypatch):
+    monkeypatch.delenv("LLAMA_CLOUD_API_KEY", raising=False)
+    with pytest.raises(RuntimeError, match="LLAMA_CLOUD_API_KEY"):
+        split_document.create_session(split_document.SplitConfig())
+
+    session = split_document.create_session(split_document.SplitConfig(api_key="llx-test"))
+    assert session.headers["Authorization"] == "Bearer llx-test"
@@ -0,0 +1,81 @@
+"""Tests für den Thumbnail-Cache (thumbnails.py)"""
+import os
+import fitz
+import pytest
+import thumbnails
+
+
+def make_pdf(path, pages=2, text="Seite"):
+    doc = fitz.open()
+    for page_num in range(1, pages + 1):
+        page = doc.new_page(width=595, height=842)
+        page.insert_text((50, 60), f"{text} {page_num}", fontsize=16)
+    doc.save(str(path))
+    doc.close()
+    return path
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(thumbnails, "CACHE_DIR", cache_dir)
+    monkeypatch.setattr(thumbnails, "_cache_size", None)
+    return cache_dir
+
+
+def test_page_image_is_rendered_once_and_cached(tmp_path, cache_dir):
+    pdf_path = make_pdf(tmp_path / "dokument.pdf")
+
+    first = thumbnails.get_page_image(pdf_path, 1, "thumb", "jpeg")
+    modified = first.stat().st_mtime_ns
+    second = thumbnails.get_page_image(pdf_path, 1, "thumb", "jpeg")
+
+    assert first == second
+    assert first.is_relative_to(cache_dir)
+    assert first.read_bytes()[:2] == b"\xff\xd8"
+    # Cache-Treffer rendert nicht neu, sondern aktualisiert nur die Zugriffszeit
+    assert second.stat().st_mtime_ns >= modified
+    assert len(list(cache_dir.rglob("*.jpg"))) == 1
+
+
+def test_replaced_pdf_gets_new_cache_entry(tmp_path, cache_dir):
+    pdf_path = make_pdf(tmp_path / "dokument.pdf")
+    old = thumbnails.get_page_image(pdf_path, 1, "thumb", "webp")
+
+    make_pdf(pdf_path, pages=3, text="Neu")
+    os.utime(pdf_path, ns=(old.stat().st_mtime_ns + 10**9,) * 2)
+    new = thumbnails.get_page_image(pdf_path, 1, "thumb", "webp")
+
+    assert new != old
+
+
+def test_invalid_arguments_raise_value_error(tmp_path, cache_dir):
+    pdf_path = make_pdf(tmp_path / "dokument.pdf")
+    with pytest.raises(ValueError):
+        thumbnails.get_page_image(pdf_path, 3)
+    with pytest.raises(ValueError):
+        thumbnails.get_page_image(pdf_path, 1, size="riesig")
+    with pytest.raises(ValueError):
+        thumbnails.get_page_image(pdf_path, 1, fmt="gif")
+
+
+def test_prerender_and_remove_document(tmp_path, cache_dir):
+    pdf_path = make_pdf(tmp_path / "dokument.pdf", pages=3)
+
+    assert thumbnails.prerender_document(pdf_path, sizes=("thumb", "preview")) == 6
+    assert thumbnails.prerender_document(pdf_path, sizes=("thumb", "preview")) == 0
+
+    thumbnails.remove_document(pdf_path)
+    assert not list(cache_dir.rglob("*.webp"))
+
+
+def test_cache_evicts_least_recently_used(tmp_path, cache_dir, monkeypatch):
+    pdf_path = make_pdf(tmp_path / "dokument.pdf", pages=3)
+    first = thumbnails.get_page_image(pdf_path, 1, "thumb", "jpeg")
+    os.utime(first, (1, 1))
+    monkeypatch.setattr(thumbnails, "CACHE_MAX_BYTES", first.stat().st_size * 2)
+
+    thumbnails.get_page_image(pdf_path, 2, "thumb", "jpeg")
+    thumbnails.get_page_image(pdf_path, 3, "thumb", "jpeg")
+
+    assert not first.exists()
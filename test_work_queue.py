@@ -0,0 +1,121 @@
+"""Tests für die Arbeitswarteschlange (work_queue.py) und den Abschluss von Dokumenten im Parse-Worker"""
+import json
+import time
+import pytest
+import work_queue
+from work_queue import MAX_ATTEMPTS, Heartbeat, WorkQueue, run_worker
+
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(work_queue, "IDLE_POLL_INTERVAL", 0.01)
+    return WorkQueue(tmp_path / "work_queue.sqlite")
+
+
+def test_claim_heartbeat_complete(queue):
+    queue.enqueue("parse", "a.pdf", "Mietvertrag_1", payload={"name": "Mietvertrag_1"})
+
+    task = queue.claim("parse", "worker-1")
+    assert task["status"] == "claimed" and task["attempts"] == 1
+    assert task["payload"] == {"name": "Mietvertrag_1"}
+    assert queue.claim("parse", "worker-2") is None
+
+    assert queue.heartbeat(task)
+    assert queue.complete(task, {"ok": True})
+    # Nach dem Abschluss gilt die Lease nicht mehr
+    assert not queue.heartbeat(task)
+    assert queue.document_tasks("parse", "a.pdf")[0]["result"] == {"ok": True}
+
+
+def test_failures_are_retried_until_max_attempts(queue):
+    queue.enqueue("split", "a.pdf")
+    for attempt in range(1, MAX_ATTEMPTS + 1):
+        task = queue.claim("split", "worker-1")
+        assert task["attempts"] == attempt
+        assert queue.fail(task, f"Fehler {attempt}")
+    assert queue.claim("split", "worker-1") is None
+    [task] = queue.document_tasks("split", "a.pdf")
+    assert task["status"] == "failed" and task["error"] == f"Fehler {MAX_ATTEMPTS}"
+
+
+def test_expired_lease_is_reclaimed_and_finally_failed(queue):
+    queue.enqueue("split", "a.pdf")
+    first = queue.claim("split", "worker-1", lease_seconds=-1)
+
+    second = queue.claim("split", "worker-2", lease_seconds=-1)
+    assert second["id"] == first["id"] and second["attempts"] == 2
+    # Der erste Worker hat seine Lease verloren
+    assert not queue.complete(first, {"ok": True})
+
+    queue.claim("split", "worker-3", lease_seconds=-1)
+    expired = []
+    assert queue.claim("split", "worker-4", expired=expired) is None
+    assert [task["id"] for task in expired] == [first["id"]]
+    assert expired[0]["status"] == "failed" and "Lease abgelaufen" in expired[0]["error"]
+
+
+def test_heartbeat_keeps_lease_alive(queue):
+    queue.enqueue("parse", "a.pdf", "Mietvertrag_1")
+    task = queue.claim("parse", "worker-1", lease_seconds=0.2)
+    with Heartbeat(queue, task, lease_seconds=0.2) as heartbeat:
+        time.sleep(0.5)
+        assert queue.claim("parse", "worker-2", lease_seconds=0.2) is None
+    assert not heartbeat.lost
+    assert queue.complete(task)
+
+
+def test_run_worker_reports_every_terminal_task(queue):
+    queue.enqueue("parse", "a.pdf", "ok")
+    queue.enqueue("parse", "a.pdf", "kaputt")
+    finished = []
+
+    def handler(task):
+        if task["segment"] == "kaputt":
+            raise RuntimeError("kaputt")
+        return {"segment": task["segment"]}
+
+    completed = run_worker(queue, "parse", handler, "worker-1", idle_timeout=0.05,
+                           on_finished=lambda task: finished.append((task["segment"], task["attempts"])))
+
+    assert completed == 1
+    assert sorted(finished) == [("kaputt", MAX_ATTEMPTS), ("ok", 1)]
+
+
+def test_run_worker_reports_tasks_failed_by_lease_expiry(queue):
+    queue.enqueue("parse", "a.pdf", "verwaist")
+    for _ in range(MAX_ATTEMPTS):
+        queue.claim("parse", "abgestürzt", lease_seconds=-1)
+    finished = []
+
+    run_worker(queue, "parse", lambda task: None, "worker-1", idle_timeout=0.05,
+               on_finished=lambda task: finished.append(task["segment"]))
+
+    assert finished == ["verwaist"]
+
+
+def test_document_with_permanently_failing_segment_is_completed(tmp_path, monkeypatch):
+    import parse_segments
+    from result_store import ResultStore
+
+    monkeypatch.setattr(work_queue, "IDLE_POLL_INTERVAL", 0.01)
+    config = parse_segments.ParseConfig(data_dir=tmp_path, log_dir=tmp_path / "logs")
+    store = ResultStore(tmp_path / "results.sqlite")
+    queue = WorkQueue(tmp_path / "work_queue.sqlite")
+    segments = [{"name": "Mietvertrag_1", "category": "Mietvertrag", "pages": [1]},
+                {"name": "Rechnung_1", "category": "Rechnung", "pages": [2]}]
+    queue.replace_document("parse", "a.pdf", [(segment["name"], segment, 1) for segment in segments])
+
+    def handler(task):
+        if task["segment"] == "Rechnung_1":
+            raise RuntimeError("LlamaParse nicht erreichbar")
+        return {**task["payload"], "parsed": {"text": "Mietzins CHF 1'850.00"}}
+
+    run_worker(queue, "parse", handler, "worker-1", idle_timeout=0.05,
+               on_finished=lambda task: parse_segments.finish_document_if_complete(
+                   config, store, queue, task["document"]))
+
+    with open(config.status_file, encoding="utf-8") as f:
+        assert json.load(f)["a.pdf"]["status"] == "completed"
+    [ok, failed] = store.get_parsed("a.pdf")
+    assert ok["parsed"]["text"] == "Mietzins CHF 1'850.00"
+    assert failed["parsed"]["error"] == "LlamaParse nicht erreichbar"
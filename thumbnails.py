@@ -0,0 +1,211 @@
+"""Serverseitige Seiten-Thumbnails und Vorschaubilder mit begrenztem LRU-Cache auf der Festplatte"""
+import hashlib
+import io
+import os
+import queue
+import shutil
+import threading
+from pathlib import Path
+import fitz  # PyMuPDF
+from PIL import Image
+
+# Konfiguration
+DATA_DIR = Path(os.environ.get("FLATSCOUTS_DATA_DIR", Path(__file__).parent / "data"))
+CACHE_DIR = DATA_DIR / ".thumbnail_cache"
+CACHE_MAX_BYTES = 200 * 1024 * 1024  # 200 MB
+
+# Feste Größen: längste Bildkante in Pixel und Kompressionsqualität
+SIZES = {
+    "thumb": {"max_edge": 200, "quality": 70},
+    "preview": {"max_edge": 1000, "quality": 80},
+}
+
+# Unterstützte Ausgabeformate: Name -> (Pillow-Format, MIME-Typ, Dateiendung)
+FORMATS = {
+    "webp": ("WEBP", "image/webp", ".webp"),
+    "jpeg": ("JPEG", "image/jpeg", ".jpg"),
+}
+
+_cache_lock = threading.Lock()
+_cache_size = None  # Wird beim ersten Zugriff aus dem Cache-Verzeichnis berechnet
+
+_prerender_queue = queue.Queue()
+_prerender_thread = None
+_prerender_lock = threading.Lock()
+
+
+def _document_cache_dir(pdf_path: Path) -> Path:
+    """Cache-Unterverzeichnis eines Dokuments (eines pro PDF, damit es beim Löschen entfernt werden kann)"""
+    key = hashlib.sha1(pdf_path.name.encode("utf-8")).hexdigest()[:16]
+    return CACHE_DIR / key
+
+
+def _cache_path(pdf_path: Path, page_num: int, size: str, fmt: str) -> Path:
+    """
+    Pfad eines gecachten Bildes. Änderungszeit und Größe des PDFs sind Teil des Namens,
+    damit ein ersetztes PDF nie veraltete Bilder liefert.
+    """
+    stat = pdf_path.stat()
+    extension = FORMATS[fmt][2]
+    filename = f"{stat.st_mtime_ns}_{stat.st_size}_p{page_num}_{size}{extension}"
+    return _document_cache_dir(pdf_path) / filename
+
+
+def _current_cache_size() -> int:
+    """Berechnet die aktuelle Cache-Größe einmalig aus dem Dateisystem (Aufrufer hält den Lock)"""
+    global _cache_size
+    if _cache_size is None:
+        _cache_size = 0
+        if CACHE_DIR.exists():
+            for cached in CACHE_DIR.rglob("*"):
+                if cached.is_file() and not cached.name.endswith(".tmp"):
+                    _cache_size += cached.stat().st_size
+    return _cache_size
+
+
+def _evict_if_needed():
+    """Entfernt die am längsten nicht genutzten Bilder, bis der Cache wieder unter dem Limit liegt"""
+    global _cache_size
+    with _cache_lock:
+        if _current_cache_size() <= CACHE_MAX_BYTES:
+            return
+        entries = []
+        for cached in CACHE_DIR.rglob("*"):
+            if cached.is_file() and not cached.name.endswith(".tmp"):
+                stat = cached.stat()
+                entries.append((stat.st_mtime, stat.st_size, cached))
+        entries.sort()
+        for _, file_size, cached in entries:
+            if _cache_size <= CACHE_MAX_BYTES:
+                break
+            try:
+                cached.unlink()
+                _cache_size -= file_size
+            except OSError:
+                pass
+
+
+def _render_page(doc, page_num: int, size: str, fmt: str) -> bytes:
+    """Rastert eine Seite (1-basiert) auf die feste Größe und kodiert sie mit Pillow"""
+    page = doc[page_num - 1]
+    max_edge = SIZES[size]["max_edge"]
+    zoom = max_edge / max(page.rect.width, page.rect.height)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), alpha=False)
+    image = Image.frombytes("RGB", (pix.width, pix.height), pix.samples)
+
+    buffer = io.BytesIO()
+    pil_format = FORMATS[fmt][0]
+    image.save(buffer, format=pil_format, quality=SIZES[size]["quality"], optimize=True)
+    return buffer.getvalue()
+
+
+def _store(cache_file: Path, data: bytes):
+    """Schreibt ein Bild atomar in den Cache und aktualisiert die Cache-Größe"""
+    global _cache_size
+    cache_file.parent.mkdir(parents=True, exist_ok=True)
+    temp_file = cache_file.with_name(f"{cache_file.name}.{os.getpid()}_{threading.get_ident()}.tmp")
+    with open(temp_file, "wb") as f:
+        f.write(data)
+    with _cache_lock:
+        # Größe vor dem Einfügen ermitteln, damit die neue Datei nicht doppelt gezählt wird
+        _cache_size = _current_cache_size() + len(data)
+        os.replace(temp_file, cache_file)
+    _evict_if_needed()
+
+
+def get_page_image(pdf_path: Path, page_num: int, size: str = "thumb", fmt: str = "webp") -> Path:
+    """
+    Liefert den Pfad zu einem gecachten Seitenbild und rendert es bei Bedarf.
+
+    Args:
+        pdf_path: Pfad zum PDF
+        page_num: Seitennummer (1-basiert)
+        size: Name der Größe aus SIZES
+        fmt: Name des Formats aus FORMATS
+
+    Returns:
+        Pfad zur Bilddatei im Cache
+
+    Raises:
+        ValueError: Bei unbekannter Größe, unbekanntem Format oder ungültiger Seitennummer
+    """
+    if size not in SIZES:
+        raise ValueError(f"Unbekannte Größe: {size}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unbekanntes Format: {fmt}")
+
+    cache_file = _cache_path(pdf_path, page_num, size, fmt)
+    if cache_file.exists():
+        # Zugriffszeit aktualisieren, damit LRU-Verdrängung aktuelle Bilder behält
+        try:
+            os.utime(cache_file)
+        except OSError:
+            pass
+        return cache_file
+
+    doc = fitz.open(pdf_path)
+    try:
+        if not 1 <= page_num <= len(doc):
+            raise ValueError(f"Ungültige Seite {page_num} (Dokument hat {len(doc)} Seiten)")
+        data = _render_page(doc, page_num, size, fmt)
+    finally:
+        doc.close()
+
+    _store(cache_file, data)
+    return cache_file
+
+
+def prerender_document(pdf_path: Path, sizes=("thumb",), fmt: str = "webp") -> int:
+    """
+    Rendert alle Seiten eines Dokuments in den angegebenen Größen vorab.
+
+    Returns:
+        Anzahl neu gerenderter Bilder
+    """
+    rendered = 0
+    doc = fitz.open(pdf_path)
+    try:
+        for page_num in range(1, len(doc) + 1):
+            for size in sizes:
+                cache_file = _cache_path(pdf_path, page_num, size, fmt)
+                if cache_file.exists():
+                    continue
+                _store(cache_file, _render_page(doc, page_num, size, fmt))
+                rendered += 1
+    finally:
+        doc.close()
+    return rendered
+
+
+def _prerender_worker():
+    """Hintergrund-Thread: arbeitet die Vorab-Render-Warteschlange nacheinander ab"""
+    while True:
+        pdf_path, sizes, fmt = _prerender_queue.get()
+        try:
+            if pdf_path.exists():
+                rendered = prerender_document(pdf_path, sizes, fmt)
+                print(f"Vorschaubilder für {pdf_path.name} erstellt: {rendered} Bild(er)", flush=True)
+        except Exception as e:
+            print(f"Fehler beim Vorab-Rendern von {pdf_path.name}: {e}", flush=True)
+        finally:
+            _prerender_queue.task_done()
+
+
+def start_prerender(pdf_path: Path, sizes=("thumb",), fmt: str = "webp"):
+    """Reiht ein Dokument zum Vorab-Rendern im Hintergrund ein (ein gemeinsamer Worker-Thread)"""
+    global _prerender_thread
+    with _prerender_lock:
+        if _prerender_thread is None or not _prerender_thread.is_alive():
+            _prerender_thread = threading.Thread(target=_prerender_worker, name="thumbnail-prerender", daemon=True)
+            _prerender_thread.start()
+    _prerender_queue.put((Path(pdf_path), tuple(sizes), fmt))
+
+
+def remove_document(pdf_path: Path):
+    """Entfernt alle gecachten Bilder eines Dokuments"""
+    global _cache_size
+    document_dir = _document_cache_dir(Path(pdf_path))
+    if document_dir.exists():
+        shutil.rmtree(document_dir, ignore_errors=True)
+        with _cache_lock:
+            _cache_size = None  # Beim nächsten Zugriff neu berechnen
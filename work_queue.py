@@ -0,0 +1,390 @@
+"""
+Dauerhafte Arbeitswarteschlange (SQLite) für mehrere Worker-Prozesse.
+
+Worker holen sich Aufgaben atomar (claim), halten ihre Lease per Heartbeat am Leben und
+melden das Ergebnis zurück. Abgelaufene Leases (z.B. abgestürzter Worker) werden beim
+nächsten claim wieder freigegeben. Split-Aufgaben gelten pro Dokument, Parse-Aufgaben
+pro Segment. Vergeben wird nach Priorität und geschätzten Kosten mit Aging (siehe
+scheduler.py).
+
+Für mehrere Rechner muss der data-Ordner auf einem gemeinsamen Speicher mit
+funktionierenden Datei-Locks liegen (Voraussetzung von SQLite).
+"""
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+from scheduler import AGING_FACTOR
+
+# Konfiguration
+DATA_DIR = Path(os.environ.get("FLATSCOUTS_DATA_DIR", Path(__file__).parent / "data"))
+DB_FILE = DATA_DIR / "work_queue.sqlite"
+
+LEASE_SECONDS = 300  # Gültigkeit einer Lease ohne Heartbeat
+MAX_ATTEMPTS = 3  # Danach gilt eine Aufgabe als endgültig fehlgeschlagen
+IDLE_POLL_INTERVAL = 2  # Sekunden zwischen zwei Abfragen einer leeren Warteschlange
+
+FINAL_STATUSES = ("done", "failed")
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS tasks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        document TEXT NOT NULL,
+        segment TEXT NOT NULL DEFAULT '',
+        position INTEGER NOT NULL DEFAULT 0,
+        payload TEXT,
+        cost REAL NOT NULL DEFAULT 0,
+        priority REAL,
+        status TEXT NOT NULL DEFAULT 'pending',
+        attempts INTEGER NOT NULL DEFAULT 0,
+        worker TEXT,
+        token TEXT,
+        lease_until REAL,
+        result TEXT,
+        error TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        UNIQUE (kind, document, segment)
+    );
+    CREATE INDEX IF NOT EXISTS tasks_claim ON tasks (kind, status, id);
+"""
+
+# Spalten, die nach der ersten Version hinzugekommen sind
+MIGRATIONS = {
+    "cost": "ALTER TABLE tasks ADD COLUMN cost REAL NOT NULL DEFAULT 0",
+    "priority": "ALTER TABLE tasks ADD COLUMN priority REAL",
+}
+
+
+def is_final_failure(task: dict, retry: bool = True) -> bool:
+    """True, wenn ein Fehlschlag dieser Aufgabe endgültig ist (keine Wiederholung mehr)"""
+    return not retry or task["attempts"] >= MAX_ATTEMPTS
+
+
+def default_worker_id() -> str:
+    """Eindeutige Worker-Kennung aus Rechnername und Prozess-ID"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class WorkQueue:
+    """Warteschlange in einer SQLite-Datei; jede Methode öffnet eine eigene Verbindung"""
+
+    def __init__(self, db_file: Path = None):
+        self.db_file = Path(db_file or DB_FILE)
+        self.db_file.parent.mkdir(parents=True, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(tasks)")}
+            for column, statement in MIGRATIONS.items():
+                if column not in columns:
+                    conn.execute(statement)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit; Transaktionen werden explizit mit BEGIN IMMEDIATE gestartet
+        conn = sqlite3.connect(str(self.db_file), timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @staticmethod
+    def _row_to_task(row) -> dict:
+        task = dict(row)
+        task["payload"] = json.loads(task["payload"]) if task["payload"] else None
+        task["result"] = json.loads(task["result"]) if task["result"] else None
+        return task
+
+    def enqueue(self, kind: str, document: str, segment: str = "", payload=None, position: int = 0,
+                cost: float = 0, priority: float = None):
+        """
+        Legt eine Aufgabe an. Eine vorhandene Aufgabe für dasselbe Dokument/Segment wird
+        zurückgesetzt (eine laufende Lease verliert damit ihre Gültigkeit).
+
+        Args:
+            cost: Geschätzter Aufwand (kleinere Aufgaben werden zuerst vergeben)
+            priority: Markierungszeitpunkt priorisierter Dokumente (werden vor allen anderen vergeben)
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT INTO tasks (kind, document, segment, position, payload, cost, priority, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (kind, document, segment) DO UPDATE SET "
+                "position = excluded.position, payload = excluded.payload, cost = excluded.cost, "
+                "priority = excluded.priority, status = 'pending', attempts = 0, worker = NULL, "
+                "token = NULL, lease_until = NULL, result = NULL, error = NULL, "
+                "updated_at = excluded.updated_at",
+                (kind, document, segment, position, json.dumps(payload, ensure_ascii=False),
+                 cost, priority, now, now)
+            )
+        finally:
+            conn.close()
+
+    def replace_document(self, kind: str, document: str, items: list, priority: float = None):
+        """
+        Ersetzt alle Aufgaben einer Art für ein Dokument (z.B. Parse-Aufgaben nach neuem Split).
+
+        Args:
+            items: Liste von (Segmentname, Payload, Kosten)
+            priority: Markierungszeitpunkt, falls das Dokument priorisiert ist
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM tasks WHERE kind = ? AND document = ?", (kind, document))
+            conn.executemany(
+                "INSERT INTO tasks (kind, document, segment, position, payload, cost, priority, "
+                "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (kind, document, segment, position, json.dumps(payload, ensure_ascii=False),
+                     cost, priority, now, now)
+                    for position, (segment, payload, cost) in enumerate(items)
+                ]
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def claim(self, kind: str, worker: str, lease_seconds: float = LEASE_SECONDS, expired: list = None):
+        """
+        Holt atomar die nächste offene Aufgabe: priorisierte zuerst, sonst die mit den
+        geringsten effektiven Kosten (Kosten minus Wartezeit-Bonus). Abgelaufene Leases
+        werden vorher freigegeben.
+
+        Args:
+            expired: Optionale Liste; erhält die Aufgaben, die wegen abgelaufener Lease nach
+                MAX_ATTEMPTS Versuchen endgültig fehlgeschlagen sind
+
+        Returns:
+            Aufgabe als dict (inkl. token für heartbeat/complete/fail) oder None
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            failed_ids = [row["id"] for row in conn.execute(
+                "SELECT id FROM tasks WHERE kind = ? AND status = 'claimed' AND lease_until < ? AND attempts >= ?",
+                (kind, now, MAX_ATTEMPTS)
+            )]
+            conn.execute(
+                "UPDATE tasks SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+                "error = 'Lease abgelaufen (Worker ' || worker || ')', worker = NULL, token = NULL, "
+                "lease_until = NULL, updated_at = ? "
+                "WHERE kind = ? AND status = 'claimed' AND lease_until < ?",
+                (MAX_ATTEMPTS, now, kind, now)
+            )
+            if expired is not None and failed_ids:
+                expired.extend(
+                    self._row_to_task(failed)
+                    for failed in conn.execute(
+                        f"SELECT * FROM tasks WHERE id IN ({','.join('?' * len(failed_ids))})", failed_ids
+                    )
+                )
+            row = conn.execute(
+                "SELECT id FROM tasks WHERE kind = ? AND status = 'pending' "
+                "ORDER BY priority IS NULL, priority, cost - ? * (? - created_at), id LIMIT 1",
+                (kind, AGING_FACTOR, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE tasks SET status = 'claimed', attempts = attempts + 1, worker = ?, token = ?, "
+                "lease_until = ?, updated_at = ? WHERE id = ?",
+                (worker, uuid.uuid4().hex, now + lease_seconds, now, row["id"])
+            )
+            task = conn.execute("SELECT * FROM tasks WHERE id = ?", (row["id"],)).fetchone()
+            conn.execute("COMMIT")
+            return self._row_to_task(task)
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def _update_claimed(self, task: dict, sql: str, params: tuple) -> bool:
+        """Ändert eine Aufgabe nur, solange die Lease des Aufrufers noch gilt"""
+        conn = self._connect()
+        try:
+            cursor = conn.execute(
+                f"UPDATE tasks SET {sql}, updated_at = ? WHERE id = ? AND token = ? AND status = 'claimed'",
+                params + (time.time(), task["id"], task["token"])
+            )
+            return cursor.rowcount == 1
+        finally:
+            conn.close()
+
+    def heartbeat(self, task: dict, lease_seconds: float = LEASE_SECONDS) -> bool:
+        """Verlängert die Lease. False, wenn sie inzwischen abgelaufen oder ersetzt ist."""
+        return self._update_claimed(task, "lease_until = ?", (time.time() + lease_seconds,))
+
+    def complete(self, task: dict, result=None) -> bool:
+        """Markiert die Aufgabe als erledigt und speichert das Ergebnis"""
+        return self._update_claimed(
+            task,
+            "status = 'done', token = NULL, lease_until = NULL, error = NULL, result = ?",
+            (json.dumps(result, ensure_ascii=False) if result is not None else None,)
+        )
+
+    def fail(self, task: dict, error: str, retry: bool = True) -> bool:
+        """Gibt die Aufgabe zur Wiederholung frei oder markiert sie endgültig als fehlgeschlagen"""
+        status = "failed" if is_final_failure(task, retry) else "pending"
+        return self._update_claimed(
+            task,
+            "status = ?, worker = NULL, token = NULL, lease_until = NULL, error = ?",
+            (status, error)
+        )
+
+    def document_tasks(self, kind: str, document: str) -> list:
+        """Alle Aufgaben einer Art für ein Dokument in Segment-Reihenfolge"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT * FROM tasks WHERE kind = ? AND document = ? ORDER BY position",
+                (kind, document)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [self._row_to_task(row) for row in rows]
+
+    def remove_document(self, document: str):
+        """Entfernt alle Aufgaben eines gelöschten Dokuments"""
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM tasks WHERE document = ?", (document,))
+        finally:
+            conn.close()
+
+    def stats(self) -> dict:
+        """Anzahl Aufgaben pro Art und Status"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT kind, status, COUNT(*) FROM tasks GROUP BY kind, status").fetchall()
+        finally:
+            conn.close()
+        result = {}
+        for kind, status, count in rows:
+            result.setdefault(kind, {})[status] = count
+        return result
+
+
+class Heartbeat:
+    """Verlängert die Lease einer Aufgabe im Hintergrund, solange der Block läuft"""
+
+    def __init__(self, queue: WorkQueue, task: dict, lease_seconds: float = LEASE_SECONDS):
+        self.queue = queue
+        self.task = task
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        interval = max(self.lease_seconds / 3, 0.01)
+        while not self._stop.wait(interval):
+            try:
+                if not self.queue.heartbeat(self.task, self.lease_seconds):
+                    self.lost = True
+                    return
+            except sqlite3.Error as e:
+                # Vorübergehende Sperre: beim nächsten Intervall erneut versuchen
+                print(f"Warnung: Heartbeat fehlgeschlagen: {e}", flush=True)
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{self.task['id']}", daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+def run_worker(queue: WorkQueue, kind: str, handler, worker_id: str = None,
+               lease_seconds: float = LEASE_SECONDS, idle_timeout: float = 0, on_finished=None) -> int:
+    """
+    Arbeitet Aufgaben einer Art ab, bis die Warteschlange idle_timeout Sekunden leer war
+    (0 = endlos).
+
+    Args:
+        handler: Funktion(task) -> Ergebnis (JSON-serialisierbar); Exceptions führen zur Wiederholung
+        on_finished: Optionale Funktion(task), aufgerufen sobald eine Aufgabe endgültig
+            abgeschlossen ist: erledigt, nach MAX_ATTEMPTS fehlgeschlagen oder mit
+            abgelaufener Lease aufgegeben (z.B. um das Dokument abzuschließen)
+
+    Returns:
+        Anzahl erfolgreich erledigter Aufgaben
+    """
+    worker_id = worker_id or default_worker_id()
+    completed = 0
+    idle_since = time.time()
+    print(f"Worker {worker_id} wartet auf {kind}-Aufgaben...", flush=True)
+
+    while True:
+        expired = []
+        task = queue.claim(kind, worker_id, lease_seconds, expired)
+        for failed in expired:
+            failed_label = f"{failed['document']} {failed['segment']}".strip()
+            print(f"Aufgabe {failed_label} endgültig fehlgeschlagen: {failed['error']}", flush=True)
+            if on_finished is not None:
+                on_finished(failed)
+        if task is None:
+            if idle_timeout and time.time() - idle_since >= idle_timeout:
+                break
+            time.sleep(IDLE_POLL_INTERVAL)
+            continue
+
+        label = f"{task['document']} {task['segment']}".strip()
+        try:
+            with Heartbeat(queue, task, lease_seconds) as heartbeat:
+                result = handler(task)
+        except KeyboardInterrupt:
+            queue.fail(task, "Worker beendet")
+            raise
+        except Exception as e:
+            print(f"FEHLER bei {label} (Versuch {task['attempts']}): {e}", flush=True)
+            if queue.fail(task, str(e)) and is_final_failure(task) and on_finished is not None:
+                on_finished(task)
+        else:
+            if heartbeat.lost or not queue.complete(task, result):
+                # Ein anderer Worker hat die Aufgabe inzwischen übernommen
+                print(f"Warnung: Lease für {label} verloren, Ergebnis verworfen", flush=True)
+            else:
+                completed += 1
+                if on_finished is not None:
+                    on_finished(task)
+        idle_since = time.time()
+
+    print(f"Worker {worker_id}: {completed} Aufgabe(n) erledigt", flush=True)
+    return completed
+
+
+_queues = {}
+
+
+def get_queue(data_dir: Path = None) -> WorkQueue:
+    """Gemeinsame Warteschlange für den data-Ordner (oder einen anderen Datenordner)"""
+    db_file = Path(data_dir) / DB_FILE.name if data_dir else DB_FILE
+    queue = _queues.get(db_file)
+    if queue is None:
+        queue = _queues[db_file] = WorkQueue(db_file)
+    return queue
+
+
+if __name__ == "__main__":
+    print(json.dumps(get_queue().stats(), indent=2, ensure_ascii=False))